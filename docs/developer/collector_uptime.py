@@ -30,7 +30,7 @@ from omnistat.collector_base import Collector
 
 
 class NODEUptime(Collector):
-    def __init__(self):
+    def __init__(self, runtimeConfig=None):
         logging.debug("Initializing node uptime event collector")
         self.__metrics = {}  # method storage for Prometheus metrics
         self.__kernelver = None  # method storage for kernel version
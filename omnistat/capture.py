@@ -0,0 +1,212 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Local columnar capture of usermode samples
+
+Writes samples drained from the SampleBuffer to Parquet or Arrow IPC files in
+a local or shared directory, as an alternative to pushing them to a
+VictoriaMetrics server. Every push produces one file per host, partitioned by
+the UTC date and hour of its first sample:
+
+  <output-dir>/date=2025-01-31/hour=13/omnistat-<host>-<first timestamp>.parquet
+
+Files use a long layout with one row per sample and series:
+
+  timestamp   timestamp[ms, UTC]
+  name        dictionary<string>   metric name (e.g. rocm_average_socket_power_watts)
+  labels      dictionary<string>   labels in text format (e.g. card="0",instance="node01")
+  value       double
+
+Files are written to a hidden temporary name and renamed when complete, so readers
+never observe partial files. Requires the optional pyarrow package; captured
+data can be loaded with read() or directly with pandas.read_parquet().
+"""
+
+import os
+import re
+import time
+
+import numpy as np
+
+from omnistat.sample_buffer import SampleBatch
+
+try:
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.dataset
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+PARQUET = "parquet"
+ARROW = "arrow"
+FORMATS = (PARQUET, ARROW)
+COMPRESSION = "zstd"
+
+# pre-formatted lines, e.g. 'omnistat_fom{instance="node01",name="loss"} 0.5 1700000000000'
+LINE_PATTERN = re.compile(r"^([^{\s]+)(?:\{(.*)\})?\s+(\S+)\s+(-?\d+)$")
+
+
+def available():
+    return pyarrow is not None
+
+
+def schema():
+    return pyarrow.schema(
+        [
+            ("timestamp", pyarrow.timestamp("ms", tz="UTC")),
+            ("name", pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+            ("labels", pyarrow.dictionary(pyarrow.int32(), pyarrow.string())),
+            ("value", pyarrow.float64()),
+        ]
+    )
+
+
+def splitKey(key):
+    """Split a series key in text format (e.g. 'name{labels} ') into its name and labels"""
+    key = key.strip()
+    name, brace, labels = key.partition("{")
+    return name, labels[:-1] if brace else ""
+
+
+def batchTable(batch):
+    """Convert a drained batch to a table in long layout, skipping unavailable (NaN) values
+
+    Args:
+        batch (SampleBatch or SpilledBatch): samples to convert; spilled batches only provide
+            text lines, which are parsed.
+
+    Returns:
+        pyarrow.Table: samples ordered by timestamp within every chunk
+    """
+    timestamps = []
+    seriesIds = []
+    values = []
+    if isinstance(batch, SampleBatch):
+        keys = [splitKey(key) for key in batch.keys]
+        for chunkTimestamps, chunkValues in batch.chunks():
+            rows, columns = np.nonzero(~np.isnan(chunkValues))
+            timestamps.append(chunkTimestamps[rows])
+            seriesIds.append(columns.astype(np.int32))
+            values.append(chunkValues[rows, columns])
+        lines = batch.formattedLines
+    else:
+        keys = []
+        lines = batch.lines()
+
+    # pre-formatted or spilled lines are parsed into additional series
+    index = {key: i for i, key in enumerate(keys)}
+    lineTimestamps = []
+    lineIds = []
+    lineValues = []
+    for line in lines:
+        match = LINE_PATTERN.match(line)
+        if match is None:
+            continue
+        key = (match.group(1), match.group(2) or "")
+        seriesId = index.get(key)
+        if seriesId is None:
+            seriesId = index[key] = len(keys)
+            keys.append(key)
+        lineIds.append(seriesId)
+        lineValues.append(float(match.group(3)))
+        lineTimestamps.append(int(match.group(4)))
+    timestamps.append(np.array(lineTimestamps, dtype=np.int64))
+    seriesIds.append(np.array(lineIds, dtype=np.int32))
+    values.append(np.array(lineValues, dtype=np.float64))
+
+    seriesIds = pyarrow.array(np.concatenate(seriesIds), type=pyarrow.int32())
+    names = pyarrow.array([name for name, _ in keys], type=pyarrow.string())
+    labels = pyarrow.array([labels for _, labels in keys], type=pyarrow.string())
+    return pyarrow.Table.from_arrays(
+        [
+            pyarrow.array(np.concatenate(timestamps), type=pyarrow.timestamp("ms", tz="UTC")),
+            pyarrow.DictionaryArray.from_arrays(seriesIds, names),
+            pyarrow.DictionaryArray.from_arrays(seriesIds, labels),
+            pyarrow.array(np.concatenate(values), type=pyarrow.float64()),
+        ],
+        schema=schema(),
+    )
+
+
+class CaptureWriter:
+    def __init__(self, directory, hostname, fmt=PARQUET):
+        """
+        Args:
+            directory (str): output directory, created if necessary
+            hostname (str): host name included in file names
+            fmt (str, optional): file format, one of FORMATS. Defaults to PARQUET.
+        """
+        if pyarrow is None:
+            raise RuntimeError("Local capture requires the pyarrow package (pip install omnistat[capture])")
+        if fmt not in FORMATS:
+            raise ValueError("Unknown capture format (%s), expected one of: %s" % (fmt, ", ".join(FORMATS)))
+        self.__directory = directory
+        self.__hostname = hostname
+        self.__format = fmt
+        self.numFiles = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, timestamp_millisecs):
+        """Return the path of a new file starting at the given timestamp"""
+        start = time.gmtime(timestamp_millisecs // 1000)
+        return os.path.join(
+            self.__directory,
+            time.strftime("date=%Y-%m-%d", start),
+            time.strftime("hour=%H", start),
+            "omnistat-%s-%i.%s" % (self.__hostname, timestamp_millisecs, self.__format),
+        )
+
+    def write(self, batch):
+        """Write a drained batch to a new file
+
+        Returns:
+            int: size of the new file (bytes), or 0 if the batch had no data
+        """
+        table = batchTable(batch)
+        if table.num_rows == 0:
+            return 0
+
+        path = self.path(pyarrow.compute.min(table.column("timestamp")).value)
+        directory, name = os.path.split(path)
+        os.makedirs(directory, exist_ok=True)
+        # hidden until complete: readers ignore files starting with "."
+        partial = os.path.join(directory, ".%s.partial" % name)
+        if self.__format == PARQUET:
+            pyarrow.parquet.write_table(table, partial, compression=COMPRESSION)
+        else:
+            options = pyarrow.ipc.IpcWriteOptions(compression=COMPRESSION)
+            with pyarrow.ipc.new_file(partial, table.schema, options=options) as writer:
+                writer.write_table(table)
+        os.rename(partial, path)
+        self.numFiles += 1
+        return os.path.getsize(path)
+
+
+def read(directory, fmt=PARQUET):
+    """Load all files captured in a directory into a single table (e.g. read(path).to_pandas())"""
+    fileFormat = "ipc" if fmt == ARROW else fmt
+    dataset = pyarrow.dataset.dataset(directory, format=fileFormat, partitioning="hive", ignore_prefixes=[".", "_"])
+    return dataset.to_table()
@@ -32,6 +32,12 @@ from abc import ABC, abstractmethod
 
 
 class Collector(ABC):
+    # Collectors publishing through the series table (see omnistat/series.py) set this to True
+    # and implement updateSeries(values), which writes their latest values directly into the
+    # value array, indexed by series id. They are then sampled through updateSeries() instead of
+    # updateMetrics(), at every polling interval.
+    supportsSeries = False
+
     # Required methods to be implemented by child classes
     @abstractmethod
     def registerMetrics(self):
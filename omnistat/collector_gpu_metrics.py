@@ -0,0 +1,536 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""sysfs gpu_metrics data collector
+
+Samples GPU data directly from the amdgpu driver, without ROCm SMI or AMD SMI:
+the driver exposes a binary table with the latest firmware metrics of every
+GPU in /sys/class/drm/card*/device/gpu_metrics. The table starts with a common
+header (structure size, format and content revisions) followed by a body whose
+layout is defined by the revisions (gpu_metrics_v<format>_<content> in the
+kernel's kgd_pp_interface.h). Supported layouts are described by numpy dtypes
+in GPU_METRICS_LAYOUTS.
+
+Metrics are published with the same names as the SMI collectors:
+
+rocm_temperature_celsius{card="0",location="junction"} 41.0
+rocm_temperature_memory_celsius{card="0",location="vram"} 46.0
+rocm_average_socket_power_watts{card="0"} 135.0
+rocm_sclk_clock_mhz{card="0"} 1502.0
+rocm_mclk_clock_mhz{card="0"} 1200.0
+rocm_vram_busy_percentage{card="0"} 22.0
+rocm_vram_total_bytes{card="0"} 3.4342961152e+010
+rocm_vram_used_percentage{card="0"} 0.0198
+rocm_utilization_percentage{card="0"} 0.0
+
+Files are opened once and re-read in place with pread(), and the table fields
+sampled for each GPU are resolved at registration: a sample reads the table
+into a preallocated buffer and gathers all values with a single numpy index
+operation.
+"""
+
+import logging
+import os
+import platform
+import re
+from pathlib import Path
+
+import numpy as np
+
+from omnistat.collector_base import Collector
+from omnistat.series import SERIES, SeriesGauge
+from omnistat.utils import gpu_index_mapping_based_on_guids, pass_through_indexing
+
+DRM_PATH = "/sys/class/drm"
+KFD_NODES_PATH = "/sys/class/kfd/kfd/topology/nodes"
+
+# fields not supported by a device are set to all ones
+GPU_METRICS_INVALID_16 = 0xFFFF
+
+# bytes read from gpu_metrics: larger than any supported layout
+GPU_METRICS_READ_SIZE = 4096
+
+NUM_HBM_INSTANCES = 4
+NUM_VCN = 4
+NUM_JPEG_ENG = 32
+NUM_XGMI_LINKS = 8
+MAX_GFX_CLKS = 8
+MAX_CLKS = 4
+
+HEADER_DTYPE = np.dtype([("structure_size", "<u2"), ("format_revision", "u1"), ("content_revision", "u1")])
+
+
+def layout(fields):
+    """Return the dtype of a gpu_metrics table, with C struct alignment"""
+    return np.dtype([("common_header", HEADER_DTYPE)] + fields, align=True)
+
+
+# dGPU tables (format 1) up to content revision 3 report the same temperature, activity and clock
+# fields, but revision 0 places system_clock_counter first and has a 32-bit energy_accumulator
+V1_TEMPERATURES = [
+    ("temperature_edge", "<u2"),
+    ("temperature_hotspot", "<u2"),
+    ("temperature_mem", "<u2"),
+    ("temperature_vrgfx", "<u2"),
+    ("temperature_vrsoc", "<u2"),
+    ("temperature_vrmem", "<u2"),
+    ("average_gfx_activity", "<u2"),
+    ("average_umc_activity", "<u2"),
+    ("average_mm_activity", "<u2"),
+    ("average_socket_power", "<u2"),
+]
+
+V1_CLOCKS = [
+    ("average_gfxclk_frequency", "<u2"),
+    ("average_socclk_frequency", "<u2"),
+    ("average_uclk_frequency", "<u2"),
+    ("average_vclk0_frequency", "<u2"),
+    ("average_dclk0_frequency", "<u2"),
+    ("average_vclk1_frequency", "<u2"),
+    ("average_dclk1_frequency", "<u2"),
+    ("current_gfxclk", "<u2"),
+    ("current_socclk", "<u2"),
+    ("current_uclk", "<u2"),
+    ("current_vclk0", "<u2"),
+    ("current_dclk0", "<u2"),
+    ("current_vclk1", "<u2"),
+    ("current_dclk1", "<u2"),
+    ("throttle_status", "<u4"),
+    ("current_fan_speed", "<u2"),
+]
+
+V1_0_FIELDS = (
+    [("system_clock_counter", "<u8")]
+    + V1_TEMPERATURES
+    + [("energy_accumulator", "<u4")]
+    + V1_CLOCKS
+    + [("pcie_link_width", "u1"), ("pcie_link_speed", "u1")]
+)
+
+V1_1_FIELDS = (
+    V1_TEMPERATURES
+    + [("energy_accumulator", "<u8"), ("system_clock_counter", "<u8")]
+    + V1_CLOCKS
+    + [
+        ("pcie_link_width", "<u2"),
+        ("pcie_link_speed", "<u2"),
+        ("padding", "<u2"),
+        ("gfx_activity_acc", "<u4"),
+        ("mem_activity_acc", "<u4"),
+        ("temperature_hbm", "<u2", (NUM_HBM_INSTANCES,)),
+    ]
+)
+
+V1_2_FIELDS = V1_1_FIELDS + [("firmware_timestamp", "<u8")]
+
+V1_3_FIELDS = V1_2_FIELDS + [
+    ("voltage_soc", "<u2"),
+    ("voltage_gfx", "<u2"),
+    ("voltage_mem", "<u2"),
+    ("padding1", "<u2"),
+    ("indep_throttle_status", "<u8"),
+]
+
+# MI300 tables (format 1, content revisions 4 and 5)
+V1_4_TEMPERATURES = [
+    ("temperature_hotspot", "<u2"),
+    ("temperature_mem", "<u2"),
+    ("temperature_vrsoc", "<u2"),
+    ("curr_socket_power", "<u2"),
+    ("average_gfx_activity", "<u2"),
+    ("average_umc_activity", "<u2"),
+    ("vcn_activity", "<u2", (NUM_VCN,)),
+]
+
+V1_4_COUNTERS = [
+    ("energy_accumulator", "<u8"),
+    ("system_clock_counter", "<u8"),
+    ("throttle_status", "<u4"),
+    ("gfxclk_lock_status", "<u4"),
+    ("pcie_link_width", "<u2"),
+    ("pcie_link_speed", "<u2"),
+    ("xgmi_link_width", "<u2"),
+    ("xgmi_link_speed", "<u2"),
+    ("gfx_activity_acc", "<u4"),
+    ("mem_activity_acc", "<u4"),
+    ("pcie_bandwidth_acc", "<u8"),
+    ("pcie_bandwidth_inst", "<u8"),
+    ("pcie_l0_to_recov_count_acc", "<u8"),
+    ("pcie_replay_count_acc", "<u8"),
+    ("pcie_replay_rover_count_acc", "<u8"),
+]
+
+V1_4_CLOCKS = [
+    ("xgmi_read_data_acc", "<u8", (NUM_XGMI_LINKS,)),
+    ("xgmi_write_data_acc", "<u8", (NUM_XGMI_LINKS,)),
+    ("firmware_timestamp", "<u8"),
+    ("current_gfxclk", "<u2", (MAX_GFX_CLKS,)),
+    ("current_socclk", "<u2", (MAX_CLKS,)),
+    ("current_vclk0", "<u2", (MAX_CLKS,)),
+    ("current_dclk0", "<u2", (MAX_CLKS,)),
+    ("current_uclk", "<u2"),
+    ("padding", "<u2"),
+]
+
+# table layouts indexed by (format_revision, content_revision)
+GPU_METRICS_LAYOUTS = {
+    (1, 0): layout(V1_0_FIELDS),
+    (1, 1): layout(V1_1_FIELDS),
+    (1, 2): layout(V1_2_FIELDS),
+    (1, 3): layout(V1_3_FIELDS),
+    (1, 4): layout(V1_4_TEMPERATURES + V1_4_COUNTERS + V1_4_CLOCKS),
+    (1, 5): layout(
+        V1_4_TEMPERATURES
+        + [("jpeg_activity", "<u2", (NUM_JPEG_ENG,))]
+        + V1_4_COUNTERS
+        + [("pcie_nak_sent_count_acc", "<u4"), ("pcie_nak_rcvd_count_acc", "<u4")]
+        + V1_4_CLOCKS
+    ),
+}
+
+# candidate table fields for each metric, in order of preference: (field, element index, location)
+METRIC_FIELDS = {
+    "temperature_celsius": [("temperature_edge", None, "edge"), ("temperature_hotspot", None, "junction")],
+    "temperature_memory_celsius": [("temperature_mem", None, "vram"), ("temperature_hbm", 0, "hbm_0")],
+    # some devices only report the current (not average) socket power
+    "average_socket_power_watts": [("average_socket_power", None, None), ("curr_socket_power", None, None)],
+    # some devices report gfx clocks per instance
+    "sclk_clock_mhz": [("current_gfxclk", 0, None), ("average_gfxclk_frequency", None, None)],
+    "mclk_clock_mhz": [("current_uclk", None, None), ("average_uclk_frequency", None, None)],
+    "vram_busy_percentage": [("average_umc_activity", None, None)],
+    "utilization_percentage": [("average_gfx_activity", None, None)],
+}
+
+# text files in the device directory used for metrics without a supported table field
+TEXT_FALLBACKS = {
+    "utilization_percentage": "gpu_busy_percent",
+    "vram_busy_percentage": "mem_busy_percent",
+}
+
+
+def read_header(data):
+    """Return (structure size, format revision, content revision) of a gpu_metrics table"""
+    header = np.frombuffer(data, dtype=HEADER_DTYPE, count=1)[0]
+    return int(header["structure_size"]), int(header["format_revision"]), int(header["content_revision"])
+
+
+def field_word(dtype, name, index=None):
+    """Return the position of a 16-bit table field in units of 16-bit words, or None if the field
+    is not part of the layout (or is not a 16-bit field)"""
+    if name not in dtype.fields:
+        return None
+    fieldType, offset = dtype.fields[name][:2]
+    if fieldType.subdtype is not None:
+        fieldType, shape = fieldType.subdtype
+        offset += fieldType.itemsize * (index or 0)
+    elif index:
+        return None
+    if fieldType.itemsize != 2:
+        return None
+    return offset // 2
+
+
+def select_fields(data):
+    """Select the table field used to sample each metric, based on the layout of a gpu_metrics table
+    and on the fields supported by the device (i.e. not set to GPU_METRICS_INVALID_16).
+
+    Args:
+        data (bytes): gpu_metrics table read from the device
+
+    Returns:
+        dict: metric suffix -> (field, element index, location). Metrics without a supported
+        field are omitted.
+    """
+    dtype = GPU_METRICS_LAYOUTS[read_header(data)[1:]]
+    words = np.frombuffer(data, dtype="<u2", count=dtype.itemsize // 2)
+    selection = {}
+    for metric, candidates in METRIC_FIELDS.items():
+        for name, index, location in candidates:
+            word = field_word(dtype, name, index)
+            if word is not None and words[word] != GPU_METRICS_INVALID_16:
+                selection[metric] = (name, index, location)
+                break
+    return selection
+
+
+def read_text(path, default=""):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def kfd_gpu_ids(kfdNodesPath=KFD_NODES_PATH):
+    """Return the kfd gpu_id of every GPU, indexed by DRM render minor number"""
+    gpuIds = {}
+    if not os.path.isdir(kfdNodesPath):
+        return gpuIds
+    for node in Path(kfdNodesPath).iterdir():
+        match = re.search(r"^drm_render_minor (\d+)$", read_text(node / "properties"), re.MULTILINE)
+        gpuId = read_text(node / "gpu_id", "0")
+        if match and gpuId != "0":
+            gpuIds[int(match.group(1))] = int(gpuId)
+    return gpuIds
+
+
+def read_counter(fd):
+    """Read an integer from an open sysfs text file"""
+    return int(os.pread(fd, 32, 0))
+
+
+class GPUDevice:
+    """Open files and preallocated buffers used to sample one GPU"""
+
+    def __init__(self, card, path):
+        """
+        Args:
+            card (int): DRM card number
+            path (Path): device directory (e.g. /sys/class/drm/card0/device)
+        """
+        self.card = card
+        self.path = path
+        self.fd = os.open(path / "gpu_metrics", os.O_RDONLY)
+        self.buffer = bytearray(GPU_METRICS_READ_SIZE)
+        self.words = np.frombuffer(self.buffer, dtype="<u2")
+        self.header = None
+        self.size = 0
+        self.series = np.zeros(0, dtype=np.intp)
+        self.fields = np.zeros(0, dtype=np.intp)
+        self.textFiles = []  # (series id, file descriptor)
+        self.vramUsedFd = None
+        self.vramUsedSeries = None
+        self.vramTotal = 0
+
+    def read(self):
+        """Read the latest gpu_metrics table into the device buffer and return the number of bytes read"""
+        return os.preadv(self.fd, [self.buffer], 0)
+
+    def close(self):
+        for fd in [self.fd, self.vramUsedFd] + [fd for _, fd in self.textFiles]:
+            if fd is not None:
+                os.close(fd)
+        self.fd = None
+        self.vramUsedFd = None
+        self.textFiles = []
+
+
+class GPUMetrics(Collector):
+    supportsSeries = True
+
+    def __init__(self, drmPath=DRM_PATH, kfdNodesPath=KFD_NODES_PATH):
+        logging.debug("Initializing sysfs gpu_metrics data collector")
+        self.__prefix = "rocm_"
+        self.__schema = 1.0
+        self.__drmPath = drmPath
+        self.__kfdNodesPath = kfdNodesPath
+        self.__devices = []
+
+    def findDevices(self):
+        """Open gpu_metrics for every DRM card that provides it, ordered by card number"""
+        devices = []
+        if not os.path.isdir(self.__drmPath):
+            return devices
+        for entry in Path(self.__drmPath).iterdir():
+            match = re.match(r"^card(\d+)$", entry.name)
+            if not match or not (entry / "device" / "gpu_metrics").is_file():
+                continue
+            try:
+                devices.append(GPUDevice(int(match.group(1)), entry / "device"))
+            except OSError as e:
+                logging.warning("[WARN]: Unable to open %s/device/gpu_metrics (%s)" % (entry, e))
+        return sorted(devices, key=lambda device: device.card)
+
+    def indexMapping(self, devices):
+        """Map devices to HIP_VISIBLE_DEVICES indices, via the kfd gpu_id of their render node"""
+        gpuIds = kfd_gpu_ids(self.__kfdNodesPath)
+        guidMapping = {}
+        for i, device in enumerate(devices):
+            drmPath = device.path / "drm"
+            minors = []
+            if drmPath.is_dir():
+                minors = [
+                    int(name.removeprefix("renderD")) for name in os.listdir(drmPath) if name.startswith("renderD")
+                ]
+            if not minors or minors[0] not in gpuIds:
+                logging.info("--> unable to determine kfd gpu_id of card%i" % device.card)
+                return pass_through_indexing(len(devices))
+            guidMapping[i] = gpuIds[minors[0]]
+        return gpu_index_mapping_based_on_guids(guidMapping, len(devices))
+
+    def registerMetrics(self):
+        """Open gpu_metrics files, determine table layouts and register metrics of interest"""
+
+        logging.info("collector_gpu_metrics: scanning devices in %s" % self.__drmPath)
+        devices = []
+        for device in self.findDevices():
+            try:
+                size = device.read()
+            except OSError as e:
+                logging.warning("[WARN]: Skipping card%i: unable to read gpu_metrics (%s)" % (device.card, e))
+                device.close()
+                continue
+            structureSize, formatRevision, contentRevision = read_header(device.buffer)
+            revision = (formatRevision, contentRevision)
+            if revision not in GPU_METRICS_LAYOUTS:
+                logging.warning(
+                    "[WARN]: Skipping card%i: unsupported gpu_metrics revision %i.%i" % (device.card, *revision)
+                )
+                device.close()
+                continue
+            device.header = bytes(device.buffer[:4])
+            device.size = GPU_METRICS_LAYOUTS[revision].itemsize
+            if size < device.size or structureSize < device.size:
+                logging.warning(
+                    "[WARN]: Skipping card%i: incomplete gpu_metrics table (%i bytes)" % (device.card, size)
+                )
+                device.close()
+                continue
+            logging.info("--> card%i: gpu_metrics revision %i.%i" % (device.card, *revision))
+            devices.append(device)
+
+        self.__devices = devices
+        self.__num_gpus = len(devices)
+        logging.info("Number of GPU devices = %i" % self.__num_gpus)
+
+        numGPUs_metric = SeriesGauge(self.__prefix + "num_gpus", "# of GPUS available on host")
+        SERIES.values[numGPUs_metric.series()] = self.__num_gpus
+        if self.__num_gpus == 0:
+            return
+
+        self.__indexMapping = self.indexMapping(devices)
+
+        # version info metric
+        version_metric = SeriesGauge(
+            self.__prefix + "version_info",
+            "GPU versioning information",
+            labelnames=["card", "driver_ver", "vbios", "type", "schema"],
+        )
+        driverVer = read_text("/sys/module/amdgpu/version") or platform.release()
+        for i, device in enumerate(devices):
+            seriesId = version_metric.series(
+                card=self.__indexMapping[i],
+                driver_ver=driverVer,
+                vbios=read_text(device.path / "vbios_version"),
+                type=read_text(device.path / "product_name"),
+                schema=self.__schema,
+            )
+            SERIES.values[seriesId] = 1
+
+        # table fields are selected on the first GPU: all GPUs in a node are the same model
+        selection = select_fields(devices[0].buffer)
+        descriptions = {
+            "temperature_celsius": "Temperature (C)",
+            "temperature_memory_celsius": "Memory Temperature (C)",
+            "average_socket_power_watts": "Average Graphics Package Power (W)",
+            "sclk_clock_mhz": "current sclk clock speed (Mhz)",
+            "mclk_clock_mhz": "current mclk clock speed (Mhz)",
+            "vram_busy_percentage": "Memory controller activity (%)",
+            "utilization_percentage": "GPU use (%)",
+        }
+        for metric, description in descriptions.items():
+            if metric in selection:
+                name, index, location = selection[metric]
+                labelExtra = {"location": location} if location else {}
+                series = self.registerGPUMetric(self.__prefix + metric, description, labelExtra)
+                for device, seriesId in zip(devices, series):
+                    dtype = GPU_METRICS_LAYOUTS[read_header(device.header)[1:]]
+                    word = field_word(dtype, name, index)
+                    if word is not None:
+                        device.series = np.append(device.series, seriesId)
+                        device.fields = np.append(device.fields, word)
+                logging.info("--> Sampling %s from gpu_metrics field %s" % (metric, name))
+            elif metric in TEXT_FALLBACKS and (devices[0].path / TEXT_FALLBACKS[metric]).is_file():
+                fds = []
+                try:
+                    for device in devices:
+                        fds.append(os.open(device.path / TEXT_FALLBACKS[metric], os.O_RDONLY))
+                except OSError as e:
+                    logging.warning("[WARN]: Skipping %s: unable to open %s (%s)" % (metric, TEXT_FALLBACKS[metric], e))
+                    for fd in fds:
+                        os.close(fd)
+                    continue
+                series = self.registerGPUMetric(self.__prefix + metric, description)
+                for device, seriesId, fd in zip(devices, series, fds):
+                    device.textFiles.append((seriesId, fd))
+                logging.info("--> Sampling %s from %s" % (metric, TEXT_FALLBACKS[metric]))
+            else:
+                logging.info("--> %s not available" % metric)
+
+        # memory: total VRAM does not change, used VRAM is read from an open file on every sample
+        if (devices[0].path / "mem_info_vram_total").is_file():
+            totalSeries = self.registerGPUMetric(self.__prefix + "vram_total_bytes", "VRAM Total Memory (B)")
+            usedSeries = self.registerGPUMetric(self.__prefix + "vram_used_percentage", "VRAM Memory in Use (%)")
+            for device, totalId, usedId in zip(devices, totalSeries, usedSeries):
+                device.vramTotal = int(read_text(device.path / "mem_info_vram_total", "0"))
+                SERIES.values[totalId] = device.vramTotal
+                if device.vramTotal > 0:
+                    try:
+                        device.vramUsedFd = os.open(device.path / "mem_info_vram_used", os.O_RDONLY)
+                    except OSError as e:
+                        logging.warning(
+                            "[WARN]: Skipping VRAM use of card%i: unable to open mem_info_vram_used (%s)"
+                            % (device.card, e)
+                        )
+                        continue
+                    device.vramUsedSeries = usedId
+
+        return
+
+    def registerGPUMetric(self, metricName, description, labelExtra=None):
+        """Register a per-GPU gauge and return the series id reserved for each GPU
+
+        Args:
+            metricName (str): metric name
+            description (str): metric description
+            labelExtra (dict, optional): additional labels (name -> value) applied to all GPUs
+        """
+        labelExtra = labelExtra or {}
+        gauge = SeriesGauge(metricName, description, labelnames=["card"] + list(labelExtra))
+        logging.info("--> [registered] %s -> %s (gauge)" % (metricName, description))
+        return [gauge.series(card=self.__indexMapping[i], **labelExtra) for i in range(self.__num_gpus)]
+
+    def updateMetrics(self):
+        self.updateSeries(SERIES.values)
+        return
+
+    def updateSeries(self, values):
+        for device in self.__devices:
+            # tables with an unexpected size or revision are skipped, and failed reads retain
+            # previous values
+            try:
+                size = device.read()
+                if size >= device.size and device.buffer[:4] == device.header:
+                    values[device.series] = device.words[device.fields]
+
+                for seriesId, fd in device.textFiles:
+                    values[seriesId] = read_counter(fd)
+
+                if device.vramUsedFd is not None:
+                    vramUsed = read_counter(device.vramUsedFd)
+                    values[device.vramUsedSeries] = round(100.0 * vramUsed / device.vramTotal, 4)
+            except (OSError, ValueError):
+                continue
+
+        return
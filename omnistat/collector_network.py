@@ -25,7 +25,7 @@
 """Network monitoring
 
 Implements a prometheus info metric to track network traffic data for interfaces
-exposed under /sys/class/net and /sys/class/cxi.
+exposed under /sys/class/net, /sys/class/cxi and /sys/class/infiniband.
 """
 
 import json
@@ -36,17 +36,19 @@ import re
 import sys
 from pathlib import Path
 
-from prometheus_client import Gauge
-
 import omnistat.utils as utils
 from omnistat.collector_base import Collector
+from omnistat.series import SERIES, SeriesGauge
 
 
 class NETWORK(Collector):
-    def __init__(self, annotations=False, jobDetection=None):
+    supportsSeries = True
+
+    def __init__(self, annotations=False, jobDetection=None, sysfsPath="/sys/class"):
         logging.debug("Initializing network data collector")
 
         self.__prefix = "omnistat_network_"
+        self.__sysfsPath = Path(sysfsPath)
 
         # Files to check for IP devices.
         self.__net_rx_data_paths = {}
@@ -60,6 +62,13 @@ class NETWORK(Collector):
         self.__ib_rx_data_paths = {}
         self.__ib_tx_data_paths = {}
 
+        # Series ids and data paths sampled at every interval, per device class:
+        #   net and infiniband: (series id, path)
+        #   cxi: (series id, [(bucket min size, path), ...])
+        self.__net_series = []
+        self.__cxi_series = []
+        self.__ib_series = []
+
     def registerMetrics(self):
         """Register metrics of interest"""
 
@@ -69,7 +78,7 @@ class NETWORK(Collector):
         #   __net_rx_data_paths = {
         #       "eth0": "/sys/class/net/eth0/statistics/rx_bytes"
         #   }
-        for nic in Path("/sys/class/net").iterdir():
+        for nic in (self.__sysfsPath / "net").iterdir():
             if not nic.is_dir():
                 continue
 
@@ -98,7 +107,7 @@ class NETWORK(Collector):
         #           8192: "/sys/class/cxi/cx0/device/telemetry/hni_rx_ok_8192_to_max",
         #       }
         #   }
-        cxi_base_path = Path("/sys/class/cxi")
+        cxi_base_path = self.__sysfsPath / "cxi"
         cxi_glob_pattern = "device/telemetry/hni_*_ok*"
         cxi_re_pattern = "hni_(tx|rx)_ok_(\d+)[_to]*(\d+)?"
         cxi_data_paths = {
@@ -135,7 +144,7 @@ class NETWORK(Collector):
         #       "mlx5_1:1": "/sys/class/infiniband/mlx5_1/ports/1/counters/port_rcv_data",
         #       }
         #   }
-        ib_base_path = Path("/sys/class/infiniband")
+        ib_base_path = self.__sysfsPath / "infiniband"
 
         ib_nics = []
         if ib_base_path.is_dir():
@@ -169,7 +178,7 @@ class NETWORK(Collector):
             logging.debug(self.__net_rx_data_paths)
             metric = self.__prefix + "rx_bytes"
             description = "Network received (bytes)"
-            self.__rx_metric = Gauge(metric, description, labelnames=labels)
+            self.__rx_metric = SeriesGauge(metric, description, labelnames=labels)
             logging.info(f"--> [registered] {metric} -> {description} (gauge)")
 
         tx_data_paths = [self.__net_tx_data_paths, self.__cxi_tx_data_paths, self.__ib_tx_data_paths]
@@ -178,62 +187,64 @@ class NETWORK(Collector):
             logging.debug(self.__net_tx_data_paths)
             metric = self.__prefix + "tx_bytes"
             description = "Network transmitted (bytes)"
-            self.__tx_metric = Gauge(metric, description, labelnames=labels)
+            self.__tx_metric = SeriesGauge(metric, description, labelnames=labels)
             logging.info(f"--> [registered] {metric} -> {description} (gauge)")
 
+        # Reserve series for standard IP devices
+        for nic, path in self.__net_rx_data_paths.items():
+            self.__net_series.append((self.__rx_metric.series(device_class="net", interface=nic), path))
+        for nic, path in self.__net_tx_data_paths.items():
+            self.__net_series.append((self.__tx_metric.series(device_class="net", interface=nic), path))
+
+        # Reserve series for Slingshot CXI devices, aggregating all buckets of each interface
+        for nic, buckets in self.__cxi_rx_data_paths.items():
+            series_id = self.__rx_metric.series(device_class="cxi", interface=nic)
+            self.__cxi_series.append((series_id, list(buckets.items())))
+        for nic, buckets in self.__cxi_tx_data_paths.items():
+            series_id = self.__tx_metric.series(device_class="cxi", interface=nic)
+            self.__cxi_series.append((series_id, list(buckets.items())))
+
+        # Reserve series for infiniband devices
+        for nic, path in self.__ib_rx_data_paths.items():
+            self.__ib_series.append((self.__rx_metric.series(device_class="infiniband", interface=nic), path))
+        for nic, path in self.__ib_tx_data_paths.items():
+            self.__ib_series.append((self.__tx_metric.series(device_class="infiniband", interface=nic), path))
+
     def updateMetrics(self):
         """Update registered metrics of interest"""
+        self.updateSeries(SERIES.values)
 
-        net_data = [
-            (self.__net_rx_data_paths, self.__rx_metric),
-            (self.__net_tx_data_paths, self.__tx_metric),
-        ]
-
-        for data_paths, metric in net_data:
-            for nic, path in data_paths.items():
-                try:
-                    with open(path, "r") as f:
-                        data = int(f.read().strip())
-                        metric.labels(device_class="net", interface=nic).set(data)
-                except:
-                    pass
-
-        cxi_data = [
-            (self.__cxi_rx_data_paths, self.__rx_metric),
-            (self.__cxi_tx_data_paths, self.__tx_metric),
-        ]
+    def updateSeries(self, values):
+        """Update registered series of interest"""
+        for series_id, path in self.__net_series:
+            try:
+                with open(path, "r") as f:
+                    values[series_id] = int(f.read().strip())
+            except:
+                pass
 
         # For CXI, estimate lower bound of the total amount of bytes:
         # aggregate values from all buckets using the minimum packet size of
         # each bucket.
-        for data_paths, metric in cxi_data:
-            for nic, buckets in data_paths.items():
-                total = 0
-                for size, path in buckets.items():
-                    try:
-                        with open(path, "r") as f:
-                            data = f.read().strip()
-                            fields = data.split("@")
-                            count = int(fields[0])
-                            total += count * size
-                    except:
-                        pass
-                metric.labels(device_class="cxi", interface=nic).set(total)
-
-        ib_data = [
-            (self.__ib_rx_data_paths, self.__rx_metric),
-            (self.__ib_tx_data_paths, self.__tx_metric),
-        ]
-
-        for data_paths, metric in ib_data:
-            for nic, path in data_paths.items():
+        for series_id, buckets in self.__cxi_series:
+            total = 0
+            for size, path in buckets:
                 try:
                     with open(path, "r") as f:
-                        data = int(f.read().strip())
-                        # Counters for infiniband are reported as "octets divided by 4";
-                        # multiply to collect the expected value in bytes.
-                        metric.labels(device_class="infiniband", interface=nic).set(data * 4)
+                        data = f.read().strip()
+                        fields = data.split("@")
+                        count = int(fields[0])
+                        total += count * size
                 except:
                     pass
-
-        return
+            values[series_id] = total
+
+        for series_id, path in self.__ib_series:
+            try:
+                with open(path, "r") as f:
+                    data = int(f.read().strip())
+                    # Counters for infiniband are reported as "octets divided by 4";
+                    # multiply to collect the expected value in bytes.
+                    values[series_id] = data * 4
+            except:
+                pass
@@ -36,13 +36,14 @@ import re
 import sys
 from pathlib import Path
 
-from prometheus_client import Gauge
-
 import omnistat.utils as utils
 from omnistat.collector_base import Collector
+from omnistat.series import SERIES, SeriesGauge
 
 
 class PM_COUNTERS(Collector):
+    supportsSeries = True
+
     def __init__(self, annotations=False, jobDetection=None):
         logging.debug("Initializing pm_counter data collector")
 
@@ -54,11 +55,11 @@ class PM_COUNTERS(Collector):
         self.__skipnames = ["power_cap", "startup", "freshness", "raw_scan_hz", "version", "generation", "_temp"]
         self.__gpumetrics = ["accel"]
 
-        # metric data structure for host oriented metrics
-        self.__pm_files_gpu = []  # entries: (gauge metric, filepath of source data)
+        # metric data structure for gpu oriented metrics
+        self.__pm_files_gpu = []  # entries: (series id, filepath of source data)
 
-        # metric data structure for gpu oriented
-        self.__pm_files_host = []  # entries: (gauge metric, filepath, gpuindex)
+        # metric data structure for host oriented metrics
+        self.__pm_files_host = []  # entries: (series id, filepath of source data)
 
     def registerMetrics(self):
         """Register metrics of interest"""
@@ -99,48 +100,38 @@ class PM_COUNTERS(Collector):
                             gauge = definedMetrics[metric_name]
                         else:
                             description = f"GPU {match.group(3)} ({units_short})"
-                            gauge = Gauge(self.__prefix + metric_name, description, labelnames=["card", "vendor"])
+                            gauge = SeriesGauge(self.__prefix + metric_name, description, labelnames=["card", "vendor"])
                             definedMetrics[metric_name] = gauge
                             logging.info(
                                 "--> [Registered] %s -> %s (gauge)" % (self.__prefix + metric_name, description)
                             )
 
-                        metric_entry = (gauge, str(file), gpu_id)
+                        metric_entry = (gauge.series(card=gpu_id, vendor=self.__vendor), str(file))
                         self.__pm_files_gpu.append(metric_entry)
 
                     else:
                         metric_name = file.name + f"_{units}"
                         description = f"Node-level {metric_name} ({units_short})"
-                        gauge = Gauge(self.__prefix + metric_name, description, labelnames=["vendor"])
-                        metric_entry = (gauge, str(file))
+                        gauge = SeriesGauge(self.__prefix + metric_name, description, labelnames=["vendor"])
+                        metric_entry = (gauge.series(vendor=self.__vendor), str(file))
                         self.__pm_files_host.append(metric_entry)
                         logging.info("--> [registered] %s -> %s (gauge)" % (self.__prefix + metric_name, description))
 
     def updateMetrics(self):
         """Update registered metrics of interest"""
+        self.updateSeries(SERIES.values)
 
-        # Host-level data...
-        for entry in self.__pm_files_host:
-            gaugeMetric = entry[0]
-            filePath = entry[1]
-            try:
-                with open(filePath, "r") as f:
-                    data = f.readline().strip().split()
-                    gaugeMetric.labels(vendor=self.__vendor).set(float(data[0]))
-            except:
-                pass
-
-        # GPU data...
-        for entry in self.__pm_files_gpu:
-            gaugeMetric = entry[0]
-            filePath = entry[1]
-            gpuIndex = entry[2]
-            try:
-                with open(filePath, "r") as f:
-                    data = f.readline().strip().split()
-                    gaugeMetric.labels(card=gpuIndex, vendor=self.__vendor).set(data[0])
-
-            except:
-                pass
+    def updateSeries(self, values):
+        """Update registered series of interest"""
+
+        # Host-level and GPU data...
+        for pm_files in (self.__pm_files_host, self.__pm_files_gpu):
+            for seriesId, filePath in pm_files:
+                try:
+                    with open(filePath, "r") as f:
+                        data = f.readline().strip().split()
+                        values[seriesId] = float(data[0])
+                except:
+                    pass
 
         return
@@ -179,14 +179,17 @@ class RMSJob(Collector):
             logging.debug("--> Registered RMS metric = %s" % metric)
 
     def updateMetrics(self):
-        self.__RMSMetrics["info"].clear()
-        self.__RMSMetrics["annotations"].clear()
         jobEnabled = False
 
+        # Query before resetting existing labels so previously published values remain visible while
+        # a (potentially slow) squeue query is in flight.
         results = self.querySlurmJob(mode=self.__rmsJobMode)
         if results:
             jobEnabled = True
 
+        self.__RMSMetrics["info"].clear()
+        self.__RMSMetrics["annotations"].clear()
+
         # Case when SLURM job is allocated
         if jobEnabled:
             self.__RMSMetrics["info"].labels(
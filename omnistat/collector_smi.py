@@ -39,8 +39,21 @@ rocm_vram_busy_percentage{card="0"} 22.0
 rocm_vram_total_bytes{card="0"} 3.4342961152e+010
 rocm_vram_used_percentage{card="0"} 0.0198
 rocm_utilization_percentage{card="0"} 0.0
+
+When supported by the library and device, temperature, power, clock and
+activity metrics are decoded from a single rsmi_dev_gpu_metrics_info_get()
+read per GPU and sample, instead of one library call (and sysfs access) per
+metric. Remaining metrics, and all metrics on devices without gpu_metrics
+support, are queried individually.
+
+Library functions are resolved once at initialization (see RSMIBindings), and
+query arguments are preallocated per GPU and reused on every sample (see
+RSMIDevice). Optionally, each GPU is sampled by its own worker thread: ctypes
+releases the GIL during library calls, so the driver latency of all GPUs
+overlaps.
 """
 
+import concurrent.futures
 import ctypes
 import logging
 import os
@@ -48,9 +61,8 @@ import sys
 from enum import IntEnum
 from pathlib import Path
 
-from prometheus_client import CollectorRegistry, Gauge, generate_latest
-
 from omnistat.collector_base import Collector
+from omnistat.series import SERIES, SeriesGauge
 from omnistat.utils import (
     count_compute_units,
     get_occupancy,
@@ -99,6 +111,174 @@ def get_rsmi_frequencies_type(rsmiVersion):
         return rsmi_frequencies_t()
 
 
+RSMI_NUM_HBM_INSTANCES = 4
+RSMI_MAX_NUM_VCNS = 4
+RSMI_MAX_NUM_CLKS = 4
+RSMI_MAX_NUM_XGMI_LINKS = 8
+RSMI_MAX_NUM_GFX_CLKS = 8
+
+# fields not supported by a device are set to all ones
+RSMI_GPU_METRICS_INVALID_16 = 0xFFFF
+
+# size reserved for rsmi_gpu_metrics_t: the library fills its own definition of the struct,
+# which grows with new library versions
+RSMI_GPU_METRICS_BUFFER_SIZE = 4096
+
+
+class metrics_table_header_t(ctypes.Structure):
+    _fields_ = [
+        ("structure_size", ctypes.c_uint16),
+        ("format_revision", ctypes.c_uint8),
+        ("content_revision", ctypes.c_uint8),
+    ]
+
+
+def get_rsmi_gpu_metrics_type(rsmiVersion):
+    """
+    Instantiates and returns a struct for use with rsmi_dev_gpu_metrics_info_get(). This data
+    structure is library version dependent and mimics rsmi_gpu_metrics_t in rocm_smi.h. Library
+    versions >= 7 share the leading fields defined here and append new fields at the end, which
+    are covered by a reserved area.
+
+    Args:
+        rsmiVersion (dict): ROCm SMI library version info
+
+    Returns:
+        C Struct: struct for use with rsmi_dev_gpu_metrics_info_get(), or None if the library
+        version is not supported
+    """
+    if rsmiVersion["major"] < 7:
+        logging.debug("SMI version < 7: gpu_metrics layout not supported")
+        return None
+
+    fields = [
+        ("common_header", metrics_table_header_t),
+        # temperature (C)
+        ("temperature_edge", ctypes.c_uint16),
+        ("temperature_hotspot", ctypes.c_uint16),
+        ("temperature_mem", ctypes.c_uint16),
+        ("temperature_vrgfx", ctypes.c_uint16),
+        ("temperature_vrsoc", ctypes.c_uint16),
+        ("temperature_vrmem", ctypes.c_uint16),
+        # utilization (%)
+        ("average_gfx_activity", ctypes.c_uint16),
+        ("average_umc_activity", ctypes.c_uint16),
+        ("average_mm_activity", ctypes.c_uint16),
+        # power (W) and energy
+        ("average_socket_power", ctypes.c_uint16),
+        ("energy_accumulator", ctypes.c_uint64),
+        ("system_clock_counter", ctypes.c_uint64),
+        # average clocks (MHz)
+        ("average_gfxclk_frequency", ctypes.c_uint16),
+        ("average_socclk_frequency", ctypes.c_uint16),
+        ("average_uclk_frequency", ctypes.c_uint16),
+        ("average_vclk0_frequency", ctypes.c_uint16),
+        ("average_dclk0_frequency", ctypes.c_uint16),
+        ("average_vclk1_frequency", ctypes.c_uint16),
+        ("average_dclk1_frequency", ctypes.c_uint16),
+        # current clocks (MHz)
+        ("current_gfxclk", ctypes.c_uint16),
+        ("current_socclk", ctypes.c_uint16),
+        ("current_uclk", ctypes.c_uint16),
+        ("current_vclk0", ctypes.c_uint16),
+        ("current_dclk0", ctypes.c_uint16),
+        ("current_vclk1", ctypes.c_uint16),
+        ("current_dclk1", ctypes.c_uint16),
+        ("throttle_status", ctypes.c_uint32),
+        ("current_fan_speed", ctypes.c_uint16),
+        ("pcie_link_width", ctypes.c_uint16),
+        ("pcie_link_speed", ctypes.c_uint16),
+        ("padding", ctypes.c_uint16),
+        ("gfx_activity_acc", ctypes.c_uint32),
+        ("mem_activity_acc", ctypes.c_uint32),
+        ("temperature_hbm", ctypes.c_uint16 * RSMI_NUM_HBM_INSTANCES),
+        ("firmware_timestamp", ctypes.c_uint64),
+        # voltage (mV)
+        ("voltage_soc", ctypes.c_uint16),
+        ("voltage_gfx", ctypes.c_uint16),
+        ("voltage_mem", ctypes.c_uint16),
+        ("indep_throttle_status", ctypes.c_uint64),
+        ("current_socket_power", ctypes.c_uint16),
+        ("vcn_activity", ctypes.c_uint16 * RSMI_MAX_NUM_VCNS),
+        ("gfxclk_lock_status", ctypes.c_uint32),
+        ("xgmi_link_width", ctypes.c_uint16),
+        ("xgmi_link_speed", ctypes.c_uint16),
+        ("pcie_bandwidth_acc", ctypes.c_uint64),
+        ("pcie_bandwidth_inst", ctypes.c_uint64),
+        ("pcie_l0_to_recov_count_acc", ctypes.c_uint64),
+        ("pcie_replay_count_acc", ctypes.c_uint64),
+        ("pcie_replay_rover_count_acc", ctypes.c_uint64),
+        ("xgmi_read_data_acc", ctypes.c_uint64 * RSMI_MAX_NUM_XGMI_LINKS),
+        ("xgmi_write_data_acc", ctypes.c_uint64 * RSMI_MAX_NUM_XGMI_LINKS),
+        ("current_gfxclks", ctypes.c_uint16 * RSMI_MAX_NUM_GFX_CLKS),
+        ("current_socclks", ctypes.c_uint16 * RSMI_MAX_NUM_CLKS),
+        ("current_vclk0s", ctypes.c_uint16 * RSMI_MAX_NUM_CLKS),
+        ("current_dclk0s", ctypes.c_uint16 * RSMI_MAX_NUM_CLKS),
+    ]
+
+    class rsmi_gpu_metrics_prefix_t(ctypes.Structure):
+        _fields_ = fields
+
+    reserved = RSMI_GPU_METRICS_BUFFER_SIZE - ctypes.sizeof(rsmi_gpu_metrics_prefix_t)
+
+    class rsmi_gpu_metrics_t(ctypes.Structure):
+        _fields_ = fields + [("reserved", ctypes.c_uint8 * reserved)]
+
+    return rsmi_gpu_metrics_t()
+
+
+def gpu_metrics_decoders(gpu_metrics, temp_location, temp_memory_location):
+    """
+    Select the gpu_metrics fields used to sample each metric, based on the fields supported by
+    a device (i.e. not set to RSMI_GPU_METRICS_INVALID_16).
+
+    Args:
+        gpu_metrics (C Struct): gpu_metrics struct read from the device
+        temp_location (str): primary temperature location (e.g. edge)
+        temp_memory_location (str): memory temperature location (e.g. hbm_0), or None
+
+    Returns:
+        dict: metric suffix -> function decoding its value from a gpu_metrics struct. Metrics
+        without a supported field are omitted.
+    """
+
+    def field(name, index=None):
+        if index is None:
+            return lambda metrics: getattr(metrics, name)
+        return lambda metrics: getattr(metrics, name)[index]
+
+    def temperature_field(location):
+        if location == "edge":
+            return field("temperature_edge")
+        elif location == "junction":
+            return field("temperature_hotspot")
+        elif location == "vram":
+            return field("temperature_mem")
+        elif location.startswith("hbm_"):
+            return field("temperature_hbm", int(location.removeprefix("hbm_")))
+        return None
+
+    candidates = {
+        "temperature_celsius": [temperature_field(temp_location)],
+        "temperature_memory_celsius": [temperature_field(temp_memory_location)] if temp_memory_location else [],
+        # some devices only report the current (not average) socket power
+        "average_socket_power_watts": [field("average_socket_power"), field("current_socket_power")],
+        # some devices report gfx clocks per instance
+        "sclk_clock_mhz": [field("current_gfxclk"), field("current_gfxclks", 0), field("average_gfxclk_frequency")],
+        "mclk_clock_mhz": [field("current_uclk"), field("average_uclk_frequency")],
+        "vram_busy_percentage": [field("average_umc_activity")],
+        "utilization_percentage": [field("average_gfx_activity")],
+    }
+
+    decoders = {}
+    for metric, fields in candidates.items():
+        for decode in fields:
+            if decode is not None and decode(gpu_metrics) != RSMI_GPU_METRICS_INVALID_16:
+                decoders[metric] = decode
+                break
+    return decoders
+
+
 class rsmi_power_type_t(ctypes.c_int):
     RSMI_AVERAGE_POWER = (0,)
     RSMI_CURRENT_POWER = (1,)
@@ -173,10 +353,111 @@ class rsmi_error_count_t(ctypes.Structure):
     _fields_ = [("correctable_err", ctypes.c_uint64), ("uncorrectable_err", ctypes.c_uint64)]
 
 
+rsmi_status_t = ctypes.c_int
+
+# prototypes (argtypes) of the library functions used by the collector, all returning
+# rsmi_status_t; structs whose layout depends on the library version are passed as void *
+RSMI_PROTOTYPES = {
+    "rsmi_init": [ctypes.c_uint64],
+    "rsmi_version_get": [ctypes.POINTER(rsmi_version_t)],
+    "rsmi_version_str_get": [rsmi_sw_component_t, ctypes.c_char_p, ctypes.c_uint32],
+    "rsmi_num_monitor_devices": [ctypes.POINTER(ctypes.c_uint32)],
+    "rsmi_dev_guid_get": [ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint64)],
+    "rsmi_dev_node_id_get": [ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32)],
+    "rsmi_dev_vbios_version_get": [ctypes.c_uint32, ctypes.c_char_p, ctypes.c_uint32],
+    "rsmi_dev_name_get": [ctypes.c_uint32, ctypes.c_char_p, ctypes.c_size_t],
+    "rsmi_dev_temp_metric_get": [ctypes.c_uint32, ctypes.c_uint32, ctypes.c_int, ctypes.POINTER(ctypes.c_int64)],
+    "rsmi_dev_power_ave_get": [ctypes.c_uint32, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint64)],
+    "rsmi_dev_power_get": [ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint64), ctypes.POINTER(rsmi_power_type_t)],
+    "rsmi_dev_power_cap_get": [ctypes.c_uint32, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint64)],
+    "rsmi_dev_gpu_clk_freq_get": [ctypes.c_uint32, ctypes.c_int, ctypes.c_void_p],
+    "rsmi_dev_memory_total_get": [ctypes.c_uint32, ctypes.c_int, ctypes.POINTER(ctypes.c_uint64)],
+    "rsmi_dev_memory_usage_get": [ctypes.c_uint32, ctypes.c_int, ctypes.POINTER(ctypes.c_uint64)],
+    "rsmi_dev_memory_busy_percent_get": [ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32)],
+    "rsmi_dev_busy_percent_get": [ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32)],
+    "rsmi_dev_ecc_status_get": [ctypes.c_uint32, ctypes.c_int, ctypes.POINTER(rsmi_ras_err_state_t)],
+    "rsmi_dev_ecc_count_get": [ctypes.c_uint32, ctypes.c_int, ctypes.POINTER(rsmi_error_count_t)],
+    "rsmi_dev_gpu_metrics_info_get": [ctypes.c_uint32, ctypes.c_void_p],
+}
+
+# constant query arguments
+RSMI_TEMP_CURRENT = ctypes.c_int(0)
+RSMI_CLK_TYPE_SYS = ctypes.c_int(0)
+RSMI_CLK_TYPE_MEM = ctypes.c_int(4)
+RSMI_MEM_TYPE_VRAM = ctypes.c_int(0)
+RSMI_SENSOR_INDEX = ctypes.c_uint32(0)
+
+
+class RSMIBindings:
+    """References to the ROCm SMI library functions in RSMI_PROTOTYPES, resolved once when the
+    library is loaded.
+
+    Checked bindings declare the prototypes, and ctypes validates and converts every argument
+    with the declared types. That conversion calls from_param() per argument and is slower than
+    passing ctypes objects to undeclared functions, so unchecked bindings only declare the return
+    type: they are used in the sampling path, where all arguments are preallocated objects of
+    the exact types in the prototypes (see RSMIDevice).
+    """
+
+    def __init__(self, library, checked=True):
+        """
+        Args:
+            library (ctypes.CDLL): loaded ROCm SMI library
+            checked (bool, optional): declare argument types. Defaults to True.
+        """
+        for name, argtypes in RSMI_PROTOTYPES.items():
+            # new function object, independent of prototypes declared by other bindings
+            function = library[name]
+            if checked:
+                function.argtypes = argtypes
+            function.restype = rsmi_status_t
+            setattr(self, name, function)
+
+
+class RSMIDevice:
+    """Query arguments for one GPU, allocated once and reused on every sample.
+
+    Output arguments are passed to the library through prebuilt pointers, and devices do not
+    share buffers, so each GPU can be queried independently.
+    """
+
+    def __init__(self, index, rsmiVersion):
+        """
+        Args:
+            index (int): SMI library device index
+            rsmiVersion (dict): ROCm SMI library version info
+        """
+        self.index = index
+        self.device = ctypes.c_uint32(index)
+
+        self.temperature = ctypes.c_int64(0)
+        self.temperaturePtr = ctypes.pointer(self.temperature)
+        self.power = ctypes.c_uint64(0)
+        self.powerPtr = ctypes.pointer(self.power)
+        self.powerType = rsmi_power_type_t()
+        self.powerTypePtr = ctypes.pointer(self.powerType)
+        self.vramUsed = ctypes.c_uint64(0)
+        self.vramUsedPtr = ctypes.pointer(self.vramUsed)
+        self.vramBusy = ctypes.c_uint32(0)
+        self.vramBusyPtr = ctypes.pointer(self.vramBusy)
+        self.utilization = ctypes.c_uint32(0)
+        self.utilizationPtr = ctypes.pointer(self.utilization)
+        self.rasCounts = rsmi_error_count_t()
+        self.rasCountsPtr = ctypes.pointer(self.rasCounts)
+        self.frequencies = get_rsmi_frequencies_type(rsmiVersion)
+        self.frequenciesPtr = ctypes.cast(ctypes.pointer(self.frequencies), ctypes.c_void_p)
+        self.gpuMetrics = get_rsmi_gpu_metrics_type(rsmiVersion)
+        self.gpuMetricsPtr = None
+        if self.gpuMetrics is not None:
+            self.gpuMetricsPtr = ctypes.cast(ctypes.pointer(self.gpuMetrics), ctypes.c_void_p)
+
+
 # --
 
 
 class ROCMSMI(Collector):
+    supportsSeries = True
+
     def __init__(self, runtimeConfig=None):
         logging.debug("Initializing ROCm SMI data collector")
         self.__prefix = "rocm_"
@@ -186,6 +467,8 @@ class ROCMSMI(Collector):
         self.__ecc_ras_monitoring = runtimeConfig["collector_ras_ecc"]
         self.__power_cap_monitoring = runtimeConfig["collector_power_capping"]
         self.__cu_occupancy_monitoring = runtimeConfig["collector_cu_occupancy"]
+        self.__gpu_workers = runtimeConfig["collector_gpu_workers"]
+        self.__executor = None
         self.__eccBlocks = {}
 
         rocm_path = runtimeConfig["collector_rocm_path"]
@@ -193,7 +476,9 @@ class ROCMSMI(Collector):
         # load smi runtime
         smi_lib = rocm_path + "/lib/librocm_smi64.so"
         if os.path.isfile(smi_lib):
-            self.__libsmi = ctypes.CDLL(smi_lib)
+            library = ctypes.CDLL(smi_lib)
+            self.__libsmi = RSMIBindings(library)
+            self.__sampling = RSMIBindings(library, checked=False)
             logging.info("Runtime library loaded from %s" % smi_lib)
 
             # initialize smi library
@@ -222,8 +507,6 @@ class ROCMSMI(Collector):
                 logging.error("")
                 sys.exit(4)
 
-            self.__rsmi_frequencies_type = get_rsmi_frequencies_type(self.__smiVersion)
-
             # driver version
             ver_str = ctypes.create_string_buffer(256)
             self.__libsmi.rsmi_version_str_get(rsmi_sw_component_t.RSMI_SW_COMP_DRIVER, ver_str, 256)
@@ -239,6 +522,7 @@ class ROCMSMI(Collector):
             sys.exit(4)
 
         self.__GPUmetrics = {}
+        self.__devices = []
 
     # --------------------------------------------------------------------------------------
     # Required child methods
@@ -252,17 +536,20 @@ class ROCMSMI(Collector):
         logging.info("Number of GPU devices = %i" % numDevices.value)
 
         # register number of GPUs
-        numGPUs_metric = Gauge(self.__prefix + "num_gpus", "# of GPUS available on host")
-        numGPUs_metric.set(numDevices.value)
+        numGPUs_metric = SeriesGauge(self.__prefix + "num_gpus", "# of GPUS available on host")
+        SERIES.values[numGPUs_metric.series()] = numDevices.value
         self.__num_gpus = numDevices.value
 
+        # query arguments reused on every sample
+        self.__devices = [RSMIDevice(i, self.__smiVersion) for i in range(self.__num_gpus)]
+
         # determine GPU index mapping (ie. map kfd indices used by SMI lib to that of HIP_VISIBLE_DEVICES)
         guidMapping = {}
         nodeMapping = {}
-        guid = ctypes.c_int64(0)
-        node = ctypes.c_int32(0)
+        guid = ctypes.c_uint64(0)
+        node = ctypes.c_uint32(0)
         for i in range(self.__num_gpus):
-            device = ctypes.c_uint32(i)
+            device = self.__devices[i].device
 
             ret = self.__libsmi.rsmi_dev_guid_get(device, ctypes.byref(guid))
             assert ret == 0
@@ -276,7 +563,7 @@ class ROCMSMI(Collector):
         self.__indexMapping = gpu_index_mapping_based_on_guids(guidMapping, self.__num_gpus)
 
         # version info metric
-        version_metric = Gauge(
+        version_metric = SeriesGauge(
             self.__prefix + "version_info",
             "GPU versioning information",
             labelnames=["card", "driver_ver", "vbios", "type", "schema"],
@@ -284,7 +571,7 @@ class ROCMSMI(Collector):
         for i in range(self.__num_gpus):
             gpuLabel = self.__indexMapping[i]
             ver_str = ctypes.create_string_buffer(256)
-            device = ctypes.c_uint32(i)
+            device = self.__devices[i].device
 
             self.__libsmi.rsmi_dev_vbios_version_get(device, ver_str, 256)
             vbios = ver_str.value.decode()
@@ -292,9 +579,10 @@ class ROCMSMI(Collector):
             self.__libsmi.rsmi_dev_name_get(device, ver_str, 256)
             devtype = ver_str.value.decode()
 
-            version_metric.labels(
+            seriesId = version_metric.series(
                 card=gpuLabel, driver_ver=self.__gpuDriverVer, vbios=vbios, type=devtype, schema=self.__schema
-            ).set(1)
+            )
+            SERIES.values[seriesId] = 1
 
         # register desired metric names
         self.__GPUmetrics = {}
@@ -305,13 +593,14 @@ class ROCMSMI(Collector):
 
         maxTempLocations = 4
         temperature = ctypes.c_int64(0)
-        temp_metric = ctypes.c_int32(0)  # 0=RSMI_TEMP_CURRENT
-        device = ctypes.c_uint32(0)
+        device = self.__devices[0].device
 
         # primary temperature location
         for temp_type in rsmi_temperature_type_t:
-            temp_location = ctypes.c_int32(temp_type.value)
-            ret = self.__libsmi.rsmi_dev_temp_metric_get(device, temp_location, temp_metric, ctypes.byref(temperature))
+            temp_location = ctypes.c_uint32(temp_type.value)
+            ret = self.__libsmi.rsmi_dev_temp_metric_get(
+                device, temp_location, RSMI_TEMP_CURRENT, ctypes.byref(temperature)
+            )
             if ret == 0 and temperature.value > 0:
                 self.__temp_location_index = temp_location
                 self.__temp_location_name = temp_type.name.removeprefix("RSMI_TEMP_TYPE_").lower()
@@ -320,11 +609,12 @@ class ROCMSMI(Collector):
 
         # Cache valid memory temperature location
         self.__temp_memory_location_index = None
+        self.__temp_memory_location_name = None
         for temp_type in rsmi_temperature_type_t:
-            temp_location = ctypes.c_int32(temp_type.value)
+            temp_location = ctypes.c_uint32(temp_type.value)
             if "HBM" in temp_type.name or "VRAM" in temp_type.name:
                 ret = self.__libsmi.rsmi_dev_temp_metric_get(
-                    device, temp_location, temp_metric, ctypes.byref(temperature)
+                    device, temp_location, RSMI_TEMP_CURRENT, ctypes.byref(temperature)
                 )
                 if ret == 0 and temperature.value > 0:
                     self.__temp_memory_location_index = temp_location
@@ -338,7 +628,7 @@ class ROCMSMI(Collector):
             self.__prefix + "temperature_celsius",
             "gauge",
             "Temperature (C)",
-            labelExtra=["location"],
+            labelExtra={"location": self.__temp_location_name},
         )
 
         if self.__temp_memory_location_index:
@@ -346,7 +636,7 @@ class ROCMSMI(Collector):
                 self.__prefix + "temperature_memory_celsius",
                 "gauge",
                 "Memory Temperature (C)",
-                labelExtra=["location"],
+                labelExtra={"location": self.__temp_memory_location_name},
             )
 
         # power
@@ -374,7 +664,7 @@ class ROCMSMI(Collector):
                     ret = self.__libsmi.rsmi_dev_ecc_count_get(device, block.value, ctypes.byref(ras_counts))
                     if ret == 0:
                         key = block.name.removeprefix("RSMI_GPU_BLOCK_").lower()
-                        self.__eccBlocks[key] = block.value
+                        self.__eccBlocks[key] = ctypes.c_int(block.value)
                         metric = self.__prefix + "ras_%s_correctable_count" % key
                         self.registerGPUMetric(
                             metric, "gauge", "number of correctable RAS events for %s block (count)" % key
@@ -395,150 +685,213 @@ class ROCMSMI(Collector):
             self.registerGPUMetric(self.__prefix + "num_compute_units", "gauge", "Number of compute units")
             self.registerGPUMetric(self.__prefix + "compute_unit_occupancy", "gauge", "Compute unit occupancy")
 
+        # total VRAM does not change: query once
+        vram_total = ctypes.c_uint64(0)
+        self.__vram_total = []
+        for i in range(self.__num_gpus):
+            ret = self.__libsmi.rsmi_dev_memory_total_get(
+                self.__devices[i].device, RSMI_MEM_TYPE_VRAM, ctypes.byref(vram_total)
+            )
+            self.__vram_total.append(vram_total.value)
+
+        # individual library queries for each metric sampled per GPU
+        queries = {
+            self.__prefix + "temperature_celsius": self.queryTemperature,
+            self.__prefix + "temperature_memory_celsius": self.queryMemoryTemperature,
+            self.__prefix + "average_socket_power_watts": self.queryPower,
+            self.__prefix + "sclk_clock_mhz": self.querySystemClock,
+            self.__prefix + "mclk_clock_mhz": self.queryMemoryClock,
+            self.__prefix + "vram_total_bytes": self.queryVRAMTotal,
+            self.__prefix + "vram_used_percentage": self.queryVRAMUsed,
+            self.__prefix + "vram_busy_percentage": self.queryVRAMBusy,
+            self.__prefix + "utilization_percentage": self.queryUtilization,
+            self.__prefix + "power_cap_watts": self.queryPowerCap,
+            self.__prefix + "compute_unit_occupancy": self.queryOccupancy,
+        }
+        self.__queries = {metric: query for metric, query in queries.items() if metric in self.__GPUmetrics}
+        if self.__eccBlocks:
+            self.__queries["ras"] = self.queryRAS
+
+        # metrics decoded from a single gpu_metrics read per GPU, when supported by the device
+        # (supported fields are detected on the first GPU: all GPUs in a node are the same model)
+        self.__decoders = {}
+        gpu = self.__devices[0]
+        if gpu.gpuMetrics is not None:
+            ret = self.__libsmi.rsmi_dev_gpu_metrics_info_get(gpu.device, gpu.gpuMetricsPtr)
+            if ret == 0:
+                decoders = gpu_metrics_decoders(
+                    gpu.gpuMetrics, self.__temp_location_name, self.__temp_memory_location_name
+                )
+                for metric, decode in decoders.items():
+                    if self.__prefix + metric in self.__queries:
+                        self.__decoders[self.__prefix + metric] = decode
+                logging.info("--> Sampling %i metrics from gpu_metrics" % len(self.__decoders))
+            else:
+                logging.info("--> gpu_metrics unavailable (ret=%i): using individual queries" % ret)
+        # remaining metrics are queried individually
+        self.__remainingQueries = [query for metric, query in self.__queries.items() if metric not in self.__decoders]
+        self.__allQueries = list(self.__queries.values())
+
+        # one worker per GPU: devices do not share query arguments, so they can be sampled concurrently
+        if self.__gpu_workers and self.__num_gpus > 1:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.__num_gpus, thread_name_prefix="omnistat-rocm-smi"
+            )
+            logging.info("--> Sampling %i GPUs concurrently" % self.__num_gpus)
+
         return
 
     def updateMetrics(self):
-        self.collect_data_incremental()
+        self.updateSeries(SERIES.values)
+        return
+
+    def updateSeries(self, values):
+        self.collect_data_incremental(values)
         return
 
     # --------------------------------------------------------------------------------------
     # Additional custom methods unique to this collector
 
     def registerGPUMetric(self, metricName, type, description, labelExtra=None):
+        """Register a per-GPU metric and reserve one series per GPU
+
+        Args:
+            metricName (str): metric name
+            type (str): metric type (only "gauge" is supported)
+            description (str): metric description
+            labelExtra (dict, optional): additional labels (name -> value) applied to all GPUs
+        """
         if metricName in self.__GPUmetrics:
             logging.error("Ignoring duplicate metric name addition: %s" % (metricName))
             return
         if type == "gauge":
-            labelnames = ["card"]
-            if labelExtra:
-                for entry in labelExtra:
-                    labelnames.append(entry)
-            self.__GPUmetrics[metricName] = Gauge(metricName, description, labelnames=labelnames)
+            labelExtra = labelExtra or {}
+            labelnames = ["card"] + list(labelExtra)
+            gauge = SeriesGauge(metricName, description, labelnames=labelnames)
+            self.__GPUmetrics[metricName] = [
+                gauge.series(card=self.__indexMapping[i], **labelExtra) for i in range(self.__num_gpus)
+            ]
 
             logging.info("--> [registered] %s -> %s (gauge)" % (metricName, description))
         else:
             logging.error("Ignoring unknown metric type -> %s" % type)
         return
 
-    def collect_data_incremental(self):
+    def collect_data_incremental(self, values):
         # ---
-        # Collect and parse latest GPU metrics from rocm SMI library
+        # Collect and parse latest GPU metrics from rocm SMI library, storing
+        # results in the series table value array. GPUs are sampled one after
+        # the other, or concurrently when per-GPU workers are enabled; in both
+        # cases all GPUs are sampled before returning.
         # ---
 
-        temperature = ctypes.c_int64(0)
-        temp_metric = ctypes.c_int32(0)  # 0=RSMI_TEMP_CURRENT
-        temp_location = ctypes.c_int32(0)  # 0=RSMI_TEMP_TYPE_EDGE
-        power = ctypes.c_uint64(0)
-        power_type = rsmi_power_type_t()
-        freq = self.__rsmi_frequencies_type
-        freq_system_clock = 0  # 0=RSMI_CLK_TYPE_SYS
-        freq_mem_clock = 4  # 4=RSMI_CLK_TYPE_MEM
-        vram_total = ctypes.c_uint64(0)
-        vram_used = ctypes.c_uint64(0)
-        vram_busy = ctypes.c_uint32(0)
-        utilization = ctypes.c_uint32(0)
-        pcie_sent = ctypes.c_uint64(0)
-        pcie_received = ctypes.c_uint64(0)
-        pcie_max_pkt_sz = ctypes.c_uint64(0)
-        ras_counts = rsmi_error_count_t()
+        if self.__executor is None:
+            for gpu in self.__devices:
+                self.sampleGPU(gpu, values)
+        else:
+            for future in [self.__executor.submit(self.sampleGPU, gpu, values) for gpu in self.__devices]:
+                future.result()
 
-        for i in range(self.__num_gpus):
+        return
 
-            device = ctypes.c_uint32(i)
-            guid = self.__guidMapping[i]
-            gpuLabel = self.__indexMapping[i]
+    def sampleGPU(self, gpu, values):
+        """Sample all metrics of one GPU. When supported, most metrics are decoded from a single
+        gpu_metrics read, and only the remaining ones are queried individually.
+
+        Args:
+            gpu (RSMIDevice): query arguments of the GPU
+            values (numpy.ndarray): series table value array
+        """
+        queries = self.__allQueries
+        if self.__decoders:
+            ret = self.__sampling.rsmi_dev_gpu_metrics_info_get(gpu.device, gpu.gpuMetricsPtr)
+            if ret == 0:
+                series = self.__GPUmetrics
+                gpu_metrics = gpu.gpuMetrics
+                for metric, decode in self.__decoders.items():
+                    values[series[metric][gpu.index]] = decode(gpu_metrics)
+                queries = self.__remainingQueries
+
+        for query in queries:
+            query(gpu, values)
+
+    def queryTemperature(self, gpu, values):
+        # temperature [millidegrees Celcius, converted to degrees Celcius]
+        ret = self.__sampling.rsmi_dev_temp_metric_get(
+            gpu.device, self.__temp_location_index, RSMI_TEMP_CURRENT, gpu.temperaturePtr
+        )
+        values[self.__GPUmetrics[self.__prefix + "temperature_celsius"][gpu.index]] = gpu.temperature.value / 1000.0
 
-            # --
-            # temperature [millidegrees Celcius, converted to degrees Celcius]
-            metric = self.__prefix + "temperature_celsius"
-            ret = self.__libsmi.rsmi_dev_temp_metric_get(
-                device, self.__temp_location_index, temp_metric, ctypes.byref(temperature)
-            )
-            self.__GPUmetrics[metric].labels(card=gpuLabel, location=self.__temp_location_name).set(
-                temperature.value / 1000.0
-            )
+    def queryMemoryTemperature(self, gpu, values):
+        # HBM temperature [millidegrees Celcius, converted to degrees Celcius]
+        ret = self.__sampling.rsmi_dev_temp_metric_get(
+            gpu.device, self.__temp_memory_location_index, RSMI_TEMP_CURRENT, gpu.temperaturePtr
+        )
+        metric = self.__prefix + "temperature_memory_celsius"
+        values[self.__GPUmetrics[metric][gpu.index]] = gpu.temperature.value / 1000.0
 
-            # --
-            # HBM temperature [millidegrees Celcius, converted to degrees Celcius]
-            if self.__temp_memory_location_index:
-                metric = self.__prefix + "temperature_memory_celsius"
-                ret = self.__libsmi.rsmi_dev_temp_metric_get(
-                    device, self.__temp_memory_location_index, temp_metric, ctypes.byref(temperature)
-                )
-                self.__GPUmetrics[metric].labels(card=gpuLabel, location=self.__temp_memory_location_name).set(
-                    temperature.value / 1000.0
-                )
+    def queryPower(self, gpu, values):
+        # average socket power [micro Watts, converted to Watts]
+        if self.__smiVersion["major"] < 6:
+            ret = self.__sampling.rsmi_dev_power_ave_get(gpu.device, RSMI_SENSOR_INDEX, gpu.powerPtr)
+        else:
+            ret = self.__sampling.rsmi_dev_power_get(gpu.device, gpu.powerPtr, gpu.powerTypePtr)
+        metric = self.__prefix + "average_socket_power_watts"
+        if ret == 0:
+            values[self.__GPUmetrics[metric][gpu.index]] = gpu.power.value / 1000000.0
+        else:
+            values[self.__GPUmetrics[metric][gpu.index]] = 0.0
+
+    def querySystemClock(self, gpu, values):
+        # clock speeds [Hz, converted to megaHz]
+        freq = gpu.frequencies
+        ret = self.__sampling.rsmi_dev_gpu_clk_freq_get(gpu.device, RSMI_CLK_TYPE_SYS, gpu.frequenciesPtr)
+        values[self.__GPUmetrics[self.__prefix + "sclk_clock_mhz"][gpu.index]] = (
+            freq.frequency[freq.current] / 1000000.0
+        )
 
-            # --
-            # average socket power [micro Watts, converted to Watts]
-            metric = self.__prefix + "average_socket_power_watts"
-            if self.__smiVersion["major"] < 6:
-                ret = self.__libsmi.rsmi_dev_power_ave_get(device, 0, ctypes.byref(power))
-            else:
-                ret = self.__libsmi.rsmi_dev_power_get(device, ctypes.byref(power), ctypes.byref(power_type))
-            if ret == 0:
-                self.__GPUmetrics[metric].labels(card=gpuLabel).set(power.value / 1000000.0)
-            else:
-                self.__GPUmetrics[metric].labels(card=gpuLabel).set(0.0)
-
-            # --
-            # clock speeds [Hz, converted to megaHz]
-            metric = self.__prefix + "sclk_clock_mhz"
-            ret = self.__libsmi.rsmi_dev_gpu_clk_freq_get(device, freq_system_clock, ctypes.byref(freq))
-            self.__GPUmetrics[metric].labels(card=gpuLabel).set(freq.frequency[freq.current] / 1000000.0)
-
-            metric = self.__prefix + "mclk_clock_mhz"
-            ret = self.__libsmi.rsmi_dev_gpu_clk_freq_get(device, freq_mem_clock, ctypes.byref(freq))
-            self.__GPUmetrics[metric].labels(card=gpuLabel).set(freq.frequency[freq.current] / 1000000.0)
-
-            # --
-            # gpu memory [total_vram in bytes]
-            metric = self.__prefix + "vram_total_bytes"
-            ret = self.__libsmi.rsmi_dev_memory_total_get(device, 0x0, ctypes.byref(vram_total))
-            self.__GPUmetrics[metric].labels(card=gpuLabel).set(vram_total.value)
-
-            metric = self.__prefix + "vram_used_percentage"
-            ret = self.__libsmi.rsmi_dev_memory_usage_get(device, 0x0, ctypes.byref(vram_used))
-            percentage = round(100.0 * vram_used.value / vram_total.value, 4)
-            self.__GPUmetrics[metric].labels(card=gpuLabel).set(percentage)
-
-            metric = self.__prefix + "vram_busy_percentage"
-            ret = self.__libsmi.rsmi_dev_memory_busy_percent_get(device, ctypes.byref(vram_busy))
-            self.__GPUmetrics[metric].labels(card=gpuLabel).set(vram_busy.value)
-
-            # --
-            # utilization
-            metric = self.__prefix + "utilization_percentage"
-            ret = self.__libsmi.rsmi_dev_busy_percent_get(device, ctypes.byref(utilization))
-            self.__GPUmetrics[metric].labels(card=gpuLabel).set(utilization.value)
-
-            # --
-            # RAS counts
-            if self.__ecc_ras_monitoring:
-                for key, block in self.__eccBlocks.items():
-                    ret = self.__libsmi.rsmi_dev_ecc_count_get(device, block, ctypes.byref(ras_counts))
-                    self.__GPUmetrics[self.__prefix + "ras_%s_correctable_count" % key].labels(card=gpuLabel).set(
-                        ras_counts.correctable_err
-                    )
-                    self.__GPUmetrics[self.__prefix + "ras_%s_uncorrectable_count" % key].labels(card=gpuLabel).set(
-                        ras_counts.uncorrectable_err
-                    )
-            # --
-            # power cap
-            if self.__power_cap_monitoring:
-                metric = self.__prefix + "power_cap_watts"
-                ret = self.__libsmi.rsmi_dev_power_cap_get(device, 0x0, ctypes.byref(power))
-                # rsmi value in microwatts -> convert to watt
-                self.__GPUmetrics[metric].labels(card=gpuLabel).set(power.value / 1000000)
-
-            # --
-            # CU occupancy
-            if self.__cu_occupancy_monitoring:
-                metric = self.__prefix + "num_compute_units"
-                self.__GPUmetrics[metric].labels(card=gpuLabel).set(self.__num_compute_units[i])
-
-                metric = self.__prefix + "compute_unit_occupancy"
-                cu_occupancy = get_occupancy(guid)
-                self.__GPUmetrics[metric].labels(card=gpuLabel).set(cu_occupancy)
+    def queryMemoryClock(self, gpu, values):
+        freq = gpu.frequencies
+        ret = self.__sampling.rsmi_dev_gpu_clk_freq_get(gpu.device, RSMI_CLK_TYPE_MEM, gpu.frequenciesPtr)
+        values[self.__GPUmetrics[self.__prefix + "mclk_clock_mhz"][gpu.index]] = (
+            freq.frequency[freq.current] / 1000000.0
+        )
 
-        return
+    def queryVRAMTotal(self, gpu, values):
+        # gpu memory [total_vram in bytes], cached at registration
+        values[self.__GPUmetrics[self.__prefix + "vram_total_bytes"][gpu.index]] = self.__vram_total[gpu.index]
+
+    def queryVRAMUsed(self, gpu, values):
+        ret = self.__sampling.rsmi_dev_memory_usage_get(gpu.device, RSMI_MEM_TYPE_VRAM, gpu.vramUsedPtr)
+        percentage = round(100.0 * gpu.vramUsed.value / self.__vram_total[gpu.index], 4)
+        values[self.__GPUmetrics[self.__prefix + "vram_used_percentage"][gpu.index]] = percentage
+
+    def queryVRAMBusy(self, gpu, values):
+        ret = self.__sampling.rsmi_dev_memory_busy_percent_get(gpu.device, gpu.vramBusyPtr)
+        values[self.__GPUmetrics[self.__prefix + "vram_busy_percentage"][gpu.index]] = gpu.vramBusy.value
+
+    def queryUtilization(self, gpu, values):
+        ret = self.__sampling.rsmi_dev_busy_percent_get(gpu.device, gpu.utilizationPtr)
+        values[self.__GPUmetrics[self.__prefix + "utilization_percentage"][gpu.index]] = gpu.utilization.value
+
+    def queryRAS(self, gpu, values):
+        # RAS counts
+        ras_counts = gpu.rasCounts
+        for key, block in self.__eccBlocks.items():
+            ret = self.__sampling.rsmi_dev_ecc_count_get(gpu.device, block, gpu.rasCountsPtr)
+            metric = self.__prefix + "ras_%s_correctable_count" % key
+            values[self.__GPUmetrics[metric][gpu.index]] = ras_counts.correctable_err
+            metric = self.__prefix + "ras_%s_uncorrectable_count" % key
+            values[self.__GPUmetrics[metric][gpu.index]] = ras_counts.uncorrectable_err
+
+    def queryPowerCap(self, gpu, values):
+        ret = self.__sampling.rsmi_dev_power_cap_get(gpu.device, RSMI_SENSOR_INDEX, gpu.powerPtr)
+        # rsmi value in microwatts -> convert to watt
+        values[self.__GPUmetrics[self.__prefix + "power_cap_watts"][gpu.index]] = gpu.power.value / 1000000
+
+    def queryOccupancy(self, gpu, values):
+        # CU occupancy
+        i = gpu.index
+        values[self.__GPUmetrics[self.__prefix + "num_compute_units"][i]] = self.__num_compute_units[i]
+        cu_occupancy = get_occupancy(self.__guidMapping[i])
+        values[self.__GPUmetrics[self.__prefix + "compute_unit_occupancy"][i]] = cu_occupancy
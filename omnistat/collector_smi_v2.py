@@ -41,15 +41,16 @@ rocm_mlck_clock_mhz{card="0"} 1200.0
 rocm_slck_clock_mhz{card="0"} 300.0
 """
 
+import concurrent.futures
 import logging
 import statistics
 import sys
 
 import amdsmi as smi
 import packaging.version
-from prometheus_client import Gauge
 
 from omnistat.collector_base import Collector
+from omnistat.series import SERIES, SeriesGauge
 from omnistat.utils import (
     count_compute_units,
     get_occupancy,
@@ -86,7 +87,38 @@ def is_positive_int(s):
         return False
 
 
+class AMDSMIDevice:
+    """Sampling plan for one GPU, resolved once at registration time.
+
+    Facts that do not change while the collector runs (VRAM size, CU count, metric sources, VCN
+    engines) are looked up when metrics are registered, and only the remaining values are queried
+    on every sample, writing straight into the series ids stored here.
+    """
+
+    def __init__(self, index, handle, guid):
+        """
+        Args:
+            index (int): SMI library device index
+            handle: amdsmi processor handle
+            guid (int): KFD GPU id
+        """
+        self.index = index
+        self.handle = handle
+        self.guid = guid
+        self.vramTotal = None
+        self.gpuMetrics = []
+        self.listMetrics = []
+        self.vramUsedSeries = None
+        self.temperatureSeries = None
+        self.memoryTemperatureSeries = None
+        self.rasSeries = []
+        self.powerCapSeries = None
+        self.occupancySeries = None
+
+
 class AMDSMI(Collector):
+    supportsSeries = True
+
     def __init__(self, runtimeConfig=None):
         logging.debug("Initializing AMD SMI data collector")
         self.__prefix = "rocm_"
@@ -101,65 +133,61 @@ class AMDSMI(Collector):
         self.__power_cap_monitoring = runtimeConfig["collector_power_capping"]
         self.__cu_occupancy_monitoring = runtimeConfig["collector_cu_occupancy"]
         self.__vcn_monitoring = runtimeConfig["collector_vcn"]
+        self.__gpu_workers = runtimeConfig["collector_gpu_workers"]
+        self.__executor = None
         self.__eccBlocks = {}
         # verify minimum version met
         check_min_version("24.7.1")
 
-    def get_gpu_metrics(self, device):
-        """Make GPU metric query and return dict of tracked metrics"""
-        simple_metrics = {}
-        source_metrics = {}
-        list_metrics = {}
-
-        result = smi.amdsmi_get_gpu_metrics_info(device)
-
-        for metricName, smiName in self.__metricMapping.items():
-            simple_metrics[metricName] = result[smiName]
-
-        for metricName, smiName in self.__sourceMetricMapping.items():
-            source_metrics[metricName] = result[smiName]
-
-        for metricName, (smiName, _) in self.__listMetricMapping.items():
-            list_metrics[metricName] = result[smiName]
-
-        return simple_metrics, source_metrics, list_metrics
+    def registerGPUMetric(self, key, metricName, description, labelExtra=None):
+        """Register a per-GPU gauge and reserve one series per GPU
+
+        Args:
+            key (str): index used to track the metric in self.__GPUMetrics
+            metricName (str): metric name
+            description (str): metric description
+            labelExtra (dict, optional): additional labels (name -> value) applied to all GPUs
+        """
+        labelExtra = labelExtra or {}
+        gauge = SeriesGauge(metricName, description, labelnames=["card"] + list(labelExtra))
+        self.__GPUMetrics[key] = [
+            gauge.series(card=self.__indexMapping[idx], **labelExtra) for idx in range(self.__num_gpus)
+        ]
 
     def registerMetrics(self):
         """Query number of devices and register metrics of interest"""
 
-        devices = smi.amdsmi_get_processor_handles()
-        self.__devices = devices
-        self.__num_gpus = len(devices)
+        handles = smi.amdsmi_get_processor_handles()
+        self.__num_gpus = len(handles)
         logging.debug(f"Number of devices = {self.__num_gpus}")
 
         # Register/set metrics that we do not expect to change
 
         # number of GPUs
-        numGPUs_metric = Gauge(
+        numGPUs_metric = SeriesGauge(
             self.__prefix + "num_gpus",
             "# of GPUS available on host",
         )
-        numGPUs_metric.set(self.__num_gpus)
+        SERIES.values[numGPUs_metric.series()] = self.__num_gpus
 
         # determine GPU index mapping (ie. map kfd indices used by SMI lib to that of HIP_VISIBLE_DEVICES)
         guidMapping = {}
         nodeMapping = {}
-        for index, device in enumerate(self.__devices):
+        for index, device in enumerate(handles):
             kfd_info = smi.amdsmi_get_gpu_kfd_info(device)
             guidMapping[index] = kfd_info["kfd_id"]
             nodeMapping[index] = kfd_info["node_id"]
 
-        self.__guidMapping = guidMapping
         self.__indexMapping = gpu_index_mapping_based_on_guids(guidMapping, self.__num_gpus)
 
         # version info metric
-        version_metric = Gauge(
+        version_metric = SeriesGauge(
             self.__prefix + "version_info",
             "GPU versioning information",
             labelnames=["card", "driver_ver", "vbios", "type", "schema"],
         )
 
-        for idx, device in enumerate(self.__devices):
+        for idx, device in enumerate(handles):
             gpuLabel = self.__indexMapping[idx]
             vbios_info = smi.amdsmi_get_gpu_vbios_info(device)
             vbios = vbios_info["part_number"]
@@ -169,17 +197,14 @@ class AMDSMI(Collector):
             driver_info = smi.amdsmi_get_gpu_driver_info(device)
             gpuDriverVer = driver_info["driver_version"]
 
-            version_metric.labels(
+            seriesId = version_metric.series(
                 card=gpuLabel, driver_ver=gpuDriverVer, vbios=vbios, type=devtype, schema=self.__schema
-            ).set(1)
+            )
+            SERIES.values[seriesId] = 1
 
         # Register memory related metrics
-        self.__GPUMetrics["vram_total_bytes"] = Gauge(
-            self.__prefix + "vram_total_bytes", "VRAM Memory in Use (%)", labelnames=["card"]
-        )
-        self.__GPUMetrics["vram_used_percentage"] = Gauge(
-            self.__prefix + "vram_used_percentage", "VRAM Memory in Use (%)", labelnames=["card"]
-        )
+        self.registerGPUMetric("vram_total_bytes", self.__prefix + "vram_total_bytes", "VRAM Memory in Use (%)")
+        self.registerGPUMetric("vram_used_percentage", self.__prefix + "vram_used_percentage", "VRAM Memory in Use (%)")
 
         # Register RAS ECC related metrics
         if self.__ecc_ras_monitoring:
@@ -187,37 +212,37 @@ class AMDSMI(Collector):
                 if block == smi.AmdSmiGpuBlock.INVALID:
                     continue
                 logging.debug("Checking on %s ECC status.." % block)
-                status = smi.amdsmi_get_gpu_ecc_status(self.__devices[0], block)
+                status = smi.amdsmi_get_gpu_ecc_status(handles[0], block)
                 if status == smi.AmdSmiRasErrState.ENABLED:
                     # check if queryable
                     try:
-                        status = smi.amdsmi_get_gpu_ecc_count(self.__devices[0], block)
+                        status = smi.amdsmi_get_gpu_ecc_count(handles[0], block)
                         key = "%s" % block
                         key = key.removeprefix("AmdSmiGpuBlock.").lower()
                         self.__eccBlocks[key] = block
                         metric = "ras_%s_correctable_count" % key
-                        self.__GPUMetrics[metric] = Gauge(
+                        self.registerGPUMetric(
+                            metric,
                             self.__prefix + metric,
                             "number of correctable RAS events for %s block (count)" % key,
-                            labelnames=["card"],
                         )
                         metric = "ras_%s_uncorrectable_count" % key
-                        self.__GPUMetrics[metric] = Gauge(
+                        self.registerGPUMetric(
+                            metric,
                             self.__prefix + metric,
                             "number of uncorrectable RAS events for %s block (count)" % key,
-                            labelnames=["card"],
                         )
                         metric = "ras_%s_deferred_count" % key
-                        self.__GPUMetrics[metric] = Gauge(
+                        self.registerGPUMetric(
+                            metric,
                             self.__prefix + metric,
                             "number of deferred RAS events for %s block (count)" % key,
-                            labelnames=["card"],
                         )
                     except:
                         logging.debug("Skipping RAS definition for %s" % block)
 
         # Cache valid primary temperature location and register with location label
-        dev0 = self.__devices[0]
+        dev0 = handles[0]
         for item in smi.AmdSmiTemperatureType:
             try:
                 temperature = smi.amdsmi_get_temp_metric(dev0, item, smi.AmdSmiTemperatureMetric.CURRENT)
@@ -228,13 +253,16 @@ class AMDSMI(Collector):
                 self.__temp_location_name = item.name.lower()
                 logging.info("--> Using primary temperature location at %s" % self.__temp_location_name)
                 break
-        self.__GPUMetrics["temperature_celsius"] = Gauge(
-            self.__prefix + "temperature_celsius", "Temperature (C)", labelnames=["card", "location"]
+        self.registerGPUMetric(
+            "temperature_celsius",
+            self.__prefix + "temperature_celsius",
+            "Temperature (C)",
+            labelExtra={"location": self.__temp_location_name},
         )
 
         # Cache valid memory temperature location and register with location label
         self.__temp_memory_location_index = None
-        dev0 = self.__devices[0]
+        dev0 = handles[0]
         for item in smi.AmdSmiTemperatureType:
             if "HBM" in item.name or "VRAM" in item.name:
                 try:
@@ -250,8 +278,11 @@ class AMDSMI(Collector):
                 continue
 
         if self.__temp_memory_location_index:
-            self.__GPUMetrics["temperature_memory_celsius"] = Gauge(
-                self.__prefix + "temperature_memory_celsius", "HBM Temperature (C)", labelnames=["card", "location"]
+            self.registerGPUMetric(
+                "temperature_memory_celsius",
+                self.__prefix + "temperature_memory_celsius",
+                "HBM Temperature (C)",
+                labelExtra={"location": self.__temp_memory_location_name},
             )
 
         # Define mapping from omnistat metric to amdsmi variable names, incuding units where appropriate
@@ -271,7 +302,7 @@ class AMDSMI(Collector):
             "mclk_clock_mhz": ["average_uclk_frequency", "current_uclk"],
         }
 
-        dev0 = self.__devices[0]
+        dev0 = handles[0]
         metrics = smi.amdsmi_get_gpu_metrics_info(dev0)
 
         for desired_metric in source_check:
@@ -287,8 +318,11 @@ class AMDSMI(Collector):
                 sys.exit(4)
             else:
                 logging.info("--> Using mapping %s -> %s " % (desired_metric, found))
-                self.__GPUMetrics[self.__prefix + desired_metric] = Gauge(
-                    self.__prefix + desired_metric, f"{desired_metric}", labelnames=["card", "source"]
+                self.registerGPUMetric(
+                    self.__prefix + desired_metric,
+                    self.__prefix + desired_metric,
+                    f"{desired_metric}",
+                    labelExtra={"source": found},
                 )
 
         # Metrics with multiple values: some metrics like vcn_activity return a list of values, one
@@ -314,113 +348,142 @@ class AMDSMI(Collector):
                 logging.info(f"--> Identified {len(vcn_engines)} VCN engines: {vcn_engines}")
                 self.__listMetricMapping[target_metric] = (source_metric, vcn_engines)
                 metric_name = self.__prefix + target_metric
-                self.__GPUMetrics[metric_name] = Gauge(metric_name, target_metric, labelnames=["card"])
+                self.registerGPUMetric(metric_name, metric_name, target_metric)
 
-        # Register remaining metrics of interest available from get_gpu_metrics()
-        for idx, device in enumerate(self.__devices):
-            metrics, _, _ = self.get_gpu_metrics(device)
-            for metric in metrics:
-                metric_name = self.__prefix + metric
-                # add Gauge metric only once
-                if metric_name not in self.__GPUMetrics.keys():
-                    self.__GPUMetrics[metric_name] = Gauge(metric_name, f"{metric}", labelnames=["card"])
+        # Register remaining metrics of interest available from gpu_metrics
+        for metric in self.__metricMapping:
+            metric_name = self.__prefix + metric
+            self.registerGPUMetric(metric_name, metric_name, f"{metric}")
 
         # Register power capping setting
         if self.__power_cap_monitoring:
-            self.__GPUMetrics["power_cap_watts"] = Gauge(
-                self.__prefix + "power_cap_watts", "Max power cap of device (W)", labelnames=["card"]
-            )
+            self.registerGPUMetric("power_cap_watts", self.__prefix + "power_cap_watts", "Max power cap of device (W)")
 
         if self.__cu_occupancy_monitoring:
             # Measure the number CUs in each GPU node ID (KFD internal GPU index),
             # and map it to KFD GPU indices.
             counts = count_compute_units(nodeMapping.values())
             self.__num_compute_units = {i: counts[node] for i, node in nodeMapping.items()}
-            self.__GPUMetrics["num_compute_units"] = Gauge(
-                self.__prefix + "num_compute_units", "Number of compute units", labelnames=["card"]
+            self.registerGPUMetric("num_compute_units", self.__prefix + "num_compute_units", "Number of compute units")
+            self.registerGPUMetric(
+                "compute_unit_occupancy", self.__prefix + "compute_unit_occupancy", "Compute unit occupancy (# of CUs)"
             )
-            self.__GPUMetrics["compute_unit_occupancy"] = Gauge(
-                self.__prefix + "compute_unit_occupancy", "Compute unit occupancy (# of CUs)", labelnames=["card"]
+
+        # Resolve the sampling plan of each GPU: values that do not change are set once here, and
+        # samples only query the remaining ones from precomputed (amdsmi key, series id) pairs
+        series = self.__GPUMetrics
+        gpuMetricsMapping = {**self.__metricMapping, **self.__sourceMetricMapping}
+        for idx, handle in enumerate(handles):
+            gpu = AMDSMIDevice(idx, handle, guidMapping[idx])
+            gpu.gpuMetrics = [
+                (smiName, series[self.__prefix + metric][idx]) for metric, smiName in gpuMetricsMapping.items()
+            ]
+            gpu.listMetrics = [
+                (smiName, engines, series[self.__prefix + metric][idx])
+                for metric, (smiName, engines) in self.__listMetricMapping.items()
+            ]
+
+            gpu.vramTotal = smi.amdsmi_get_gpu_memory_total(handle, smi.AmdSmiMemoryType.VRAM)
+            SERIES.values[series["vram_total_bytes"][idx]] = gpu.vramTotal
+            gpu.vramUsedSeries = series["vram_used_percentage"][idx]
+
+            gpu.temperatureSeries = series["temperature_celsius"][idx]
+            if self.__temp_memory_location_index:
+                gpu.memoryTemperatureSeries = series["temperature_memory_celsius"][idx]
+
+            gpu.rasSeries = [
+                (
+                    block,
+                    series["ras_%s_correctable_count" % key][idx],
+                    series["ras_%s_uncorrectable_count" % key][idx],
+                    series["ras_%s_deferred_count" % key][idx],
+                )
+                for key, block in self.__eccBlocks.items()
+            ]
+
+            if self.__power_cap_monitoring:
+                gpu.powerCapSeries = series["power_cap_watts"][idx]
+
+            if self.__cu_occupancy_monitoring:
+                SERIES.values[series["num_compute_units"][idx]] = self.__num_compute_units[idx]
+                gpu.occupancySeries = series["compute_unit_occupancy"][idx]
+
+            self.__devices.append(gpu)
+
+        # one worker per GPU: library calls release the GIL, so GPUs can be sampled concurrently
+        if self.__gpu_workers and self.__num_gpus > 1:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.__num_gpus, thread_name_prefix="omnistat-amd-smi"
             )
+            logging.info("--> Sampling %i GPUs concurrently" % self.__num_gpus)
 
         return
 
     def updateMetrics(self):
-        self.collect_data_incremental()
+        self.updateSeries(SERIES.values)
         return
 
-    def collect_data_incremental(self):
-        for idx, device in enumerate(self.__devices):
-
-            # map GPU index
-            cardId = self.__indexMapping[idx]
-            guid = self.__guidMapping[idx]
-
-            #  stats available via get_gpu_metrics
-            simple_metrics, source_metrics, list_metrics = self.get_gpu_metrics(device)
-
-            for metricName, value in simple_metrics.items():
-                metric = self.__GPUMetrics[self.__prefix + metricName]
-                metric.labels(card=cardId).set(value)
-
-            for metricName, value in source_metrics.items():
-                metric = self.__GPUMetrics[self.__prefix + metricName]
-                source = self.__sourceMetricMapping[metricName]
-                metric.labels(card=cardId, source=source).set(value)
-
-            for metricName, value in list_metrics.items():
-                metric = self.__GPUMetrics[self.__prefix + metricName]
-                _, value_indices = self.__listMetricMapping[metricName]
-                values = [value[x] for x in value_indices]
-                average = sum(values) / len(values)
-                metric.labels(card=cardId).set(average)
-
-            # additional gpu memory-related stats
-            device_total_vram = smi.amdsmi_get_gpu_memory_total(device, smi.AmdSmiMemoryType.VRAM)
-            self.__GPUMetrics["vram_total_bytes"].labels(card=cardId).set(device_total_vram)
-            vram_used_bytes = smi.amdsmi_get_gpu_memory_usage(device, smi.AmdSmiMemoryType.VRAM)
-            percentage = round(100.0 * vram_used_bytes / device_total_vram, 4)
-            self.__GPUMetrics["vram_used_percentage"].labels(card=cardId).set(percentage)
-
-            # additional temperature-related stats
-            temperature = smi.amdsmi_get_temp_metric(
-                device, self.__temp_location_index, smi.AmdSmiTemperatureMetric.CURRENT
-            )
-            self.__GPUMetrics["temperature_celsius"].labels(card=cardId, location=self.__temp_location_name).set(
-                temperature
-            )
-            if self.__temp_memory_location_index:
-                hbm_temperature = smi.amdsmi_get_temp_metric(
-                    device, self.__temp_memory_location_index, smi.AmdSmiTemperatureMetric.CURRENT
-                )
-                self.__GPUMetrics["temperature_memory_celsius"].labels(
-                    card=cardId, location=self.__temp_memory_location_name
-                ).set(hbm_temperature)
-
-            # RAS counts
-            if self.__ecc_ras_monitoring:
-                for key, block in self.__eccBlocks.items():
-                    ecc_error_counts = smi.amdsmi_get_gpu_ecc_count(device, block)
-                    metric = "ras_%s_correctable_count" % key
-                    self.__GPUMetrics["ras_%s_correctable_count" % key].labels(card=cardId).set(
-                        ecc_error_counts["correctable_count"]
-                    )
-                    self.__GPUMetrics["ras_%s_uncorrectable_count" % key].labels(card=cardId).set(
-                        ecc_error_counts["uncorrectable_count"]
-                    )
-                    self.__GPUMetrics["ras_%s_deferred_count" % key].labels(card=cardId).set(
-                        ecc_error_counts["deferred_count"]
-                    )
-            # power-capping
-            if self.__power_cap_monitoring:
-                power_info = smi.amdsmi_get_power_cap_info(device)
-                self.__GPUMetrics["power_cap_watts"].labels(card=cardId).set(power_info["power_cap"] / 1000000)
+    def updateSeries(self, values):
+        self.collect_data_incremental(values)
+        return
 
-            # CU occupancy
-            if self.__cu_occupancy_monitoring:
-                self.__GPUMetrics["num_compute_units"].labels(card=cardId).set(self.__num_compute_units[idx])
+    def collect_data_incremental(self, values):
+        # sample all GPUs, one after the other or concurrently with per-GPU workers, before returning
+        if self.__executor is None:
+            for gpu in self.__devices:
+                self.sampleGPU(gpu, values)
+        else:
+            for future in [self.__executor.submit(self.sampleGPU, gpu, values) for gpu in self.__devices]:
+                future.result()
 
-                cu_occupancy = get_occupancy(guid)
-                self.__GPUMetrics["compute_unit_occupancy"].labels(card=cardId).set(cu_occupancy)
+        return
+
+    def sampleGPU(self, gpu, values):
+        """Sample all metrics of one GPU
+
+        Args:
+            gpu (AMDSMIDevice): sampling plan of the GPU
+            values (numpy.ndarray): series table value array
+        """
+        handle = gpu.handle
+
+        # stats available via gpu_metrics
+        metrics = smi.amdsmi_get_gpu_metrics_info(handle)
+        for smiName, seriesId in gpu.gpuMetrics:
+            values[seriesId] = metrics[smiName]
+        for smiName, engines, seriesId in gpu.listMetrics:
+            engineValues = metrics[smiName]
+            values[seriesId] = sum(engineValues[x] for x in engines) / len(engines)
+
+        # additional gpu memory-related stats
+        vram_used_bytes = smi.amdsmi_get_gpu_memory_usage(handle, smi.AmdSmiMemoryType.VRAM)
+        values[gpu.vramUsedSeries] = round(100.0 * vram_used_bytes / gpu.vramTotal, 4)
+
+        # additional temperature-related stats
+        temperature = smi.amdsmi_get_temp_metric(
+            handle, self.__temp_location_index, smi.AmdSmiTemperatureMetric.CURRENT
+        )
+        values[gpu.temperatureSeries] = temperature
+        if gpu.memoryTemperatureSeries is not None:
+            hbm_temperature = smi.amdsmi_get_temp_metric(
+                handle, self.__temp_memory_location_index, smi.AmdSmiTemperatureMetric.CURRENT
+            )
+            values[gpu.memoryTemperatureSeries] = hbm_temperature
+
+        # RAS counts
+        for block, correctable, uncorrectable, deferred in gpu.rasSeries:
+            ecc_error_counts = smi.amdsmi_get_gpu_ecc_count(handle, block)
+            values[correctable] = ecc_error_counts["correctable_count"]
+            values[uncorrectable] = ecc_error_counts["uncorrectable_count"]
+            values[deferred] = ecc_error_counts["deferred_count"]
+
+        # power-capping
+        if gpu.powerCapSeries is not None:
+            power_info = smi.amdsmi_get_power_cap_info(handle)
+            values[gpu.powerCapSeries] = power_info["power_cap"] / 1000000
+
+        # CU occupancy
+        if gpu.occupancySeries is not None:
+            values[gpu.occupancySeries] = get_occupancy(gpu.guid)
 
         return
@@ -0,0 +1,288 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Minimal HTTP control server
+
+Serves the small set of control endpoints used in usermode (e.g. shutdown
+requests and figure-of-merit submissions) from an asyncio event loop running
+in a background thread, without the cost of a full web framework. Requests
+are answered with JSON. Connections are persistent unless the client asks to
+close them, so clients submitting data frequently avoid reconnecting.
+
+Endpoints are registered as (method, path) routes. Handlers receive the
+request body and return an HTTP status and a JSON-serializable payload, or
+None for an empty response; they run in a worker thread, so they may block (e.g. waiting for data delivery)
+without stalling other requests.
+
+Besides TCP, the server can optionally listen on a UNIX domain socket, which
+is only accessible to the owner of the socket file and is not subject to IP
+restrictions.
+
+Request bodies are limited to MAX_BODY_BYTES, unless a larger limit is set
+for their path (e.g. relayed pushes, which may merge data from many hosts).
+"""
+
+import asyncio
+import http
+import json
+import logging
+import os
+import threading
+
+MAX_BODY_BYTES = 16 * 1024 * 1024
+REQUEST_TIMEOUT_SECS = 30.0
+IDLE_TIMEOUT_SECS = 300.0
+
+
+class ControlServer:
+    def __init__(self, routes, port, host="0.0.0.0", allowedIPs=("127.0.0.1",), unixSocket=None, bodyLimits=None):
+        """
+        Args:
+            routes (dict): (method, path) -> handler(body) returning (status, payload)
+            port (int): TCP port
+            host (str, optional): TCP listen address. Defaults to 0.0.0.0.
+            allowedIPs (tuple, optional): client addresses accepted over TCP; 0.0.0.0 accepts all.
+            unixSocket (str, optional): path of an additional UNIX domain socket
+            bodyLimits (dict, optional): path -> maximum request body size, when other than MAX_BODY_BYTES
+        """
+        self.__routes = routes
+        self.__paths = {path for _, path in routes}
+        self.__port = int(port)
+        self.__host = host
+        self.__allowAll = "0.0.0.0" in allowedIPs
+        self.__allowedIPs = set(allowedIPs)
+        self.__unixSocket = unixSocket
+        self.__bodyLimits = bodyLimits or {}
+
+        self.__loop = None
+        self.__thread = None
+        self.__servers = []
+        self.__requests = set()
+        self.__connections = set()
+        self.__ready = threading.Event()
+        self.__error = None
+
+    def start(self):
+        """Start serving in a background thread
+
+        Raises:
+            OSError: if a socket cannot be bound
+        """
+        self.__loop = asyncio.new_event_loop()
+        self.__thread = threading.Thread(target=self.run, name="omnistat-control", daemon=True)
+        self.__thread.start()
+        self.__ready.wait()
+        if self.__error:
+            raise self.__error
+        logging.info("Control server listening on port %i" % self.__port)
+        if self.__unixSocket:
+            logging.info("Control server listening on %s" % self.__unixSocket)
+
+    def run(self):
+        asyncio.set_event_loop(self.__loop)
+        try:
+            self.__loop.run_until_complete(self.listen())
+        except OSError as e:
+            self.__error = e
+            self.__ready.set()
+            return
+        self.__ready.set()
+        self.__loop.run_forever()
+
+    async def listen(self):
+        self.__servers.append(await asyncio.start_server(self.handle, self.__host, self.__port))
+        if self.__unixSocket:
+            if os.path.exists(self.__unixSocket):
+                os.remove(self.__unixSocket)
+            self.__servers.append(await asyncio.start_unix_server(self.handle, self.__unixSocket))
+            os.chmod(self.__unixSocket, 0o600)
+
+    @property
+    def port(self):
+        """TCP port the server is bound to"""
+        return self.__servers[0].sockets[0].getsockname()[1]
+
+    def close(self, timeout=1.0):
+        """Stop accepting connections, and wait up to timeout secs for responses in flight"""
+        if self.__loop is None or not self.__loop.is_running():
+            return
+        future = asyncio.run_coroutine_threadsafe(self.shutdown(timeout), self.__loop)
+        try:
+            future.result(timeout + 1.0)
+        except Exception as e:
+            logging.debug("Control server shutdown: %s" % e)
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
+        self.__thread.join(timeout)
+
+    async def shutdown(self, timeout):
+        for server in self.__servers:
+            server.close()
+        if self.__requests:
+            await asyncio.wait(self.__requests, timeout=timeout)
+        # idle persistent connections
+        for writer in list(self.__connections):
+            writer.close()
+        if self.__unixSocket and os.path.exists(self.__unixSocket):
+            os.remove(self.__unixSocket)
+
+    def allowed(self, writer):
+        peer = writer.get_extra_info("peername")
+        if not isinstance(peer, tuple):
+            # UNIX domain socket: access is controlled by file permissions
+            return True
+        return self.__allowAll or peer[0] in self.__allowedIPs
+
+    async def handle(self, reader, writer):
+        """Serve requests from a connection until the client closes it (persistent connections)"""
+        self.__connections.add(writer)
+        try:
+            # close connections from other hosts before reading anything, so they cannot make the
+            # server buffer request bodies
+            if not self.allowed(writer):
+                logging.debug("Control connection from %s refused" % (writer.get_extra_info("peername"),))
+                return
+            keepAlive = True
+            while keepAlive:
+                try:
+                    requestLine = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT_SECS)
+                except asyncio.TimeoutError:
+                    break
+                if not requestLine:
+                    break
+                task = asyncio.ensure_future(self.process(requestLine, reader, writer))
+                self.__requests.add(task)
+                try:
+                    keepAlive = await task
+                finally:
+                    self.__requests.discard(task)
+        except ConnectionError:
+            pass
+        finally:
+            self.__connections.discard(writer)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def process(self, requestLine, reader, writer):
+        """Serve a single request
+
+        Returns:
+            bool: True if the connection remains open for further requests
+        """
+        try:
+            request = await asyncio.wait_for(self.readRequest(requestLine, reader), REQUEST_TIMEOUT_SECS)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return False
+        except ValueError as e:
+            request = None
+            status, payload, keepAlive = http.HTTPStatus.BAD_REQUEST, {"error": str(e)}, False
+
+        if request:
+            method, path, body, keepAlive = request
+            status, payload = await self.respond(method, path, body)
+
+        status = http.HTTPStatus(status)
+        if payload is None:
+            body = b""
+            headers = b"" if status == http.HTTPStatus.NO_CONTENT else b"Content-Length: 0\r\n"
+        else:
+            body = json.dumps(payload).encode()
+            headers = b"Content-Type: application/json\r\nContent-Length: %i\r\n" % len(body)
+        writer.write(
+            b"HTTP/1.1 %i %s\r\n%sConnection: %s\r\n\r\n%s"
+            % (status.value, status.phrase.encode(), headers, b"keep-alive" if keepAlive else b"close", body)
+        )
+        await writer.drain()
+        return keepAlive
+
+    async def readRequest(self, requestLine, reader):
+        """Parse a request
+
+        Returns:
+            tuple: method, path, body, and whether the client keeps the connection open
+        """
+        requestLine = requestLine.decode("latin-1").split()
+        if len(requestLine) != 3:
+            raise ValueError("Malformed request line")
+        method, target, version = requestLine
+        path = target.split("?", 1)[0]
+        maxBytes = self.__bodyLimits.get(path, MAX_BODY_BYTES)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self.readChunked(reader, maxBytes)
+        else:
+            length = int(headers.get("content-length", 0))
+            if length > maxBytes:
+                raise ValueError("Request body too large")
+            body = await reader.readexactly(length) if length > 0 else b""
+
+        connection = headers.get("connection", "").lower()
+        keepAlive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+        return method, path, body, keepAlive
+
+    async def readChunked(self, reader, maxBytes):
+        """Read a request body sent with chunked transfer encoding (e.g. streamed pushes)"""
+        chunks = []
+        size = 0
+        while True:
+            length = int((await reader.readline()).split(b";", 1)[0].strip(), 16)
+            if length == 0:
+                break
+            size += length
+            if size > maxBytes:
+                raise ValueError("Request body too large")
+            chunks.append(await reader.readexactly(length))
+            await reader.readexactly(2)
+        # trailers
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks)
+
+    async def respond(self, method, path, body):
+        """Run the handler of a request
+
+        Returns:
+            tuple: HTTP status and JSON-serializable payload
+        """
+        handler = self.__routes.get((method, path))
+        if handler is None:
+            if path in self.__paths:
+                return http.HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Method not allowed"}
+            return http.HTTPStatus.NOT_FOUND, {"error": "Not found"}
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, handler, body)
+        except Exception as e:
+            logging.error("[ERROR]: Control request %s %s failed: %s" % (method, path, e))
+            return http.HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
@@ -0,0 +1,169 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Exposition format and content-encoding negotiation
+
+Renders the metrics endpoint in either the Prometheus text format or the
+OpenMetrics text format, and compresses responses with gzip or zstd, based on
+the Accept and Accept-Encoding headers sent by the scraper. zstd support
+requires the optional zstandard package.
+
+Note that the Prometheus protobuf exposition format is not supported by the
+Python client library and is therefore never negotiated; scrapers requesting
+it fall back to the text format, as allowed by the Prometheus protocol.
+"""
+
+import gzip
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.openmetrics import exposition as openmetrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TEXT = "text"
+OPENMETRICS = "openmetrics"
+
+CONTENT_TYPES = {
+    TEXT: CONTENT_TYPE_LATEST,
+    OPENMETRICS: openmetrics.CONTENT_TYPE_LATEST,
+}
+
+IDENTITY = "identity"
+GZIP = "gzip"
+ZSTD = "zstd"
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+OPENMETRICS_EOF = b"# EOF\n"
+
+
+def parseQuality(header):
+    """Parse an HTTP header with optional quality values (e.g. "gzip;q=0.5, zstd")
+
+    Returns:
+        dict: lowercase token -> quality value
+    """
+    entries = {}
+    for item in header.split(","):
+        fields = item.strip().split(";")
+        token = fields[0].strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        for param in fields[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        # tokens may be repeated with different parameters (e.g. versions): keep the best quality
+        entries[token] = max(quality, entries.get(token, 0.0))
+    return entries
+
+
+def negotiateFormat(accept):
+    """Select the exposition format from an Accept header
+
+    Args:
+        accept (str): value of the Accept request header
+
+    Returns:
+        str: TEXT or OPENMETRICS
+    """
+    accepted = parseQuality(accept or "")
+    openmetricsQuality = accepted.get("application/openmetrics-text", 0.0)
+    textQuality = accepted.get("text/plain", accepted.get("text/*", accepted.get("*/*", 0.0)))
+    # the highest quality wins, and text is preferred on ties
+    if openmetricsQuality > textQuality:
+        return OPENMETRICS
+    return TEXT
+
+
+def negotiateEncoding(acceptEncoding):
+    """Select the content encoding from an Accept-Encoding header, preferring zstd over gzip
+
+    Args:
+        acceptEncoding (str): value of the Accept-Encoding request header
+
+    Returns:
+        str: ZSTD, GZIP or IDENTITY
+    """
+    accepted = parseQuality(acceptEncoding or "")
+    wildcard = accepted.get("*", 0.0)
+    candidates = [GZIP]
+    if zstandard is not None:
+        candidates.insert(0, ZSTD)
+
+    best = IDENTITY
+    bestQuality = 0.0
+    for encoding in candidates:
+        quality = accepted.get(encoding, wildcard)
+        if quality > bestQuality:
+            best = encoding
+            bestQuality = quality
+    return best
+
+
+class CachedRegistry:
+    """View of the default registry with some metric families replaced by cached copies"""
+
+    def __init__(self, cached):
+        self.cached = cached
+
+    def collect(self):
+        for metric in REGISTRY.collect():
+            yield self.cached.get(metric.name, metric)
+
+
+def render(fmt, table, cached=None):
+    """Render all registered metrics in the requested format
+
+    Args:
+        fmt (str): TEXT or OPENMETRICS
+        table (SeriesTable): series table rendered after the default registry
+        cached (dict, optional): default registry families (name -> Metric) exposed instead of
+            their current values
+
+    Returns:
+        bytes: exposition body
+    """
+    registry = CachedRegistry(cached) if cached else REGISTRY
+    if fmt == OPENMETRICS:
+        body = openmetrics.generate_latest(registry)
+        return body[: -len(OPENMETRICS_EOF)] + table.exposition() + OPENMETRICS_EOF
+    return generate_latest(registry) + table.exposition()
+
+
+def encode(body, encoding):
+    """Compress an exposition body with the given content encoding"""
+    if encoding == GZIP:
+        return gzip.compress(body, compresslevel=GZIP_LEVEL)
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return body
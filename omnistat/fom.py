@@ -0,0 +1,220 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Figure-of-merit (FOM) reporting client
+
+Lightweight client for applications reporting figures of merit (e.g.
+per-iteration throughput) to a usermode Omnistat exporter. Samples are
+timestamped and buffered in process, and a background thread delivers them in
+batches over a persistent connection, so reporting a value does not wait on
+network I/O:
+
+    from omnistat import fom
+
+    for step in range(num_steps):
+        ...
+        fom.report("samples_per_sec", throughput)
+
+The exporter address is taken from the OMNISTAT_FOM_SOCKET (UNIX domain
+socket, see control_socket in the runtime configuration) or OMNISTAT_FOM_URL
+environment variables, and defaults to http://localhost:8001. Only the Python
+standard library is used.
+"""
+
+import atexit
+import collections
+import http.client
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import urllib.parse
+
+DEFAULT_URL = "http://localhost:8001"
+BATCH_PATH = "/fom/batch"
+
+# samples kept in process while the exporter is unavailable; the oldest are dropped beyond it
+MAX_PENDING = 100000
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a UNIX domain socket"""
+
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.__path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.__path)
+
+
+class Reporter:
+    def __init__(self, url=None, socketPath=None, flushInterval=1.0, batchSize=1000, timeout=5.0):
+        """
+        Args:
+            url (str, optional): exporter URL. Defaults to OMNISTAT_FOM_URL or DEFAULT_URL.
+            socketPath (str, optional): exporter UNIX domain socket; takes precedence over url.
+                Defaults to OMNISTAT_FOM_SOCKET.
+            flushInterval (float, optional): maximum delay before buffered samples are sent (secs)
+            batchSize (int, optional): number of buffered samples that triggers an early flush
+            timeout (float, optional): network timeout (secs)
+        """
+        self.__socketPath = socketPath or os.environ.get("OMNISTAT_FOM_SOCKET")
+        self.__url = urllib.parse.urlsplit(url or os.environ.get("OMNISTAT_FOM_URL", DEFAULT_URL))
+        self.__flushInterval = flushInterval
+        self.__batchSize = batchSize
+        self.__timeout = timeout
+        self.__connection = None
+
+        self.__pending = collections.deque(maxlen=MAX_PENDING)
+        self.__retry = []  # oldest samples, from a batch that could not be delivered
+        self.__wakeup = threading.Event()
+        self.__sendLock = threading.Lock()
+        self.__closed = False
+        self.__warned = False
+
+        # accounting of delivered and undeliverable samples
+        self.sent = 0
+        self.failed = 0
+
+        self.__thread = threading.Thread(target=self.run, name="omnistat-fom", daemon=True)
+        self.__thread.start()
+
+    def report(self, name, value, timestamp=None):
+        """Buffer a figure of merit sample; never blocks
+
+        Args:
+            name (str): figure of merit name
+            value (float): sampled value
+            timestamp (float, optional): sample time (secs since the epoch). Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        self.__pending.append((name, value, int(timestamp * 1000)))
+        if len(self.__pending) >= self.__batchSize:
+            self.__wakeup.set()
+
+    def __connect(self):
+        if self.__socketPath:
+            return UnixHTTPConnection(self.__socketPath, timeout=self.__timeout)
+        return http.client.HTTPConnection(self.__url.hostname, self.__url.port or 80, timeout=self.__timeout)
+
+    def flush(self):
+        """Send all buffered samples
+
+        Returns:
+            bool: True if all samples were delivered
+        """
+        with self.__sendLock:
+            while True:
+                batch, self.__retry = self.__retry, []
+                while self.__pending and len(batch) < self.__batchSize:
+                    batch.append(self.__pending.popleft())
+                if not batch:
+                    return True
+                if not self.send(batch):
+                    # keep samples for a later attempt, in order; the oldest are dropped beyond MAX_PENDING
+                    excess = max(0, len(batch) + len(self.__pending) - MAX_PENDING)
+                    self.__retry = batch[excess:]
+                    return False
+
+    def send(self, batch):
+        """Deliver a batch of (name, value, timestamp_msecs) samples over the persistent connection"""
+        names, values, timestamps = zip(*batch)
+        body = json.dumps({"names": names, "values": values, "timestamps_msecs": timestamps})
+        headers = {"Content-Type": "application/json"}
+        # a persistent connection may have been closed by the exporter: retry once on a new one
+        for attempt in range(2):
+            try:
+                if self.__connection is None:
+                    self.__connection = self.__connect()
+                self.__connection.request("POST", BATCH_PATH, body=body, headers=headers)
+                response = self.__connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                if self.__connection is not None:
+                    self.__connection.close()
+                self.__connection = None
+                error = e
+                continue
+
+            if response.status != 200:
+                # rejected data is not retried
+                self.failed += len(batch)
+                logging.warning("Omnistat FOM samples rejected (%i)" % response.status)
+                return True
+            self.sent += len(batch)
+            self.__warned = False
+            return True
+
+        if not self.__warned:
+            logging.warning("Unable to report FOM samples to Omnistat: %s" % error)
+            self.__warned = True
+        return False
+
+    def run(self):
+        while not self.__closed:
+            self.__wakeup.wait(self.__flushInterval)
+            self.__wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """Send remaining samples and stop the background thread"""
+        self.__closed = True
+        self.__wakeup.set()
+        self.__thread.join(self.__timeout)
+        self.flush()
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+
+
+_reporter = None
+_reporterLock = threading.Lock()
+
+
+def reporter():
+    """Return the default reporter, created on first use and flushed at exit"""
+    global _reporter
+    if _reporter is None:
+        with _reporterLock:
+            if _reporter is None:
+                _reporter = Reporter()
+                atexit.register(_reporter.close)
+    return _reporter
+
+
+def report(name, value, timestamp=None):
+    """Buffer a figure of merit sample for the default reporter (see Reporter.report)"""
+    reporter().report(name, value, timestamp)
+
+
+def flush():
+    """Send all samples buffered by the default reporter"""
+    return reporter().flush()
@@ -28,6 +28,7 @@
 # or more custom collector(s).
 # --
 
+import concurrent.futures
 import configparser
 import importlib.resources
 import logging
@@ -35,11 +36,28 @@ import os
 import platform
 import re
 import sys
+import threading
+import time
 from pathlib import Path
 
-from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client import REGISTRY, CollectorRegistry, Gauge
 
-from omnistat import utils
+from omnistat import exposition, plugins, utils
+from omnistat.scheduler import TimerWheel, tickResolution
+from omnistat.self_telemetry import SelfTelemetry
+from omnistat.series import SERIES
+from omnistat.shm_ring import RingWriter
+
+
+class MetricsSnapshot:
+    """Metrics rendered for a single sample, in every exposition format. Snapshots never change
+    once published by the background sampler."""
+
+    __slots__ = ("bodies", "timestamp")
+
+    def __init__(self, bodies):
+        self.bodies = bodies  # format -> exposition body
+        self.timestamp = time.time()
 
 
 class Monitor:
@@ -65,6 +83,9 @@ class Monitor:
         self.runtimeConfig["collector_enable_amd_smi"] = config["omnistat.collectors"].getboolean(
             "enable_amd_smi", False
         )
+        self.runtimeConfig["collector_enable_gpu_metrics"] = config["omnistat.collectors"].getboolean(
+            "enable_gpu_metrics", False
+        )
         self.runtimeConfig["collector_enable_network"] = config["omnistat.collectors"].getboolean(
             "enable_network", True
         )
@@ -72,12 +93,15 @@ class Monitor:
             "enable_vendor_counters", False
         )
 
-        # verify only one SMI collector is enabled
-        if self.runtimeConfig["collector_enable_rocm_smi"] and self.runtimeConfig["collector_enable_amd_smi"]:
+        # verify only one GPU data collector is enabled: all of them publish the same rocm_* metrics
+        gpuCollectors = ["rocm_smi", "amd_smi", "gpu_metrics"]
+        if sum(self.runtimeConfig["collector_enable_%s" % name] for name in gpuCollectors) > 1:
             logging.error("")
             logging.error("[ERROR]: Only one SMI GPU data collector may be configured at a time.")
             logging.error("")
-            logging.error('Please choose either "enable_rocm_smi" or "enable_amd_smi" in runtime config')
+            logging.error(
+                'Please choose either "enable_rocm_smi", "enable_amd_smi" or "enable_gpu_metrics" in runtime config'
+            )
             sys.exit(1)
 
         self.runtimeConfig["collector_enable_amd_smi_process"] = config["omnistat.collectors"].getboolean(
@@ -94,11 +118,82 @@ class Monitor:
             "enable_power_cap", False
         )
         self.runtimeConfig["collector_vcn"] = config["omnistat.collectors"].getboolean("enable_vcn", False)
+        # optional per-GPU worker threads in SMI collectors: all GPUs are sampled concurrently
+        self.runtimeConfig["collector_gpu_workers"] = config["omnistat.collectors"].getboolean(
+            "enable_gpu_workers", False
+        )
 
         self.runtimeConfig["collector_enable_rocprofiler"] = config["omnistat.collectors"].getboolean(
             "enable_rocprofiler", False
         )
 
+        # optional concurrent execution of collectors with per-collector deadlines
+        self.runtimeConfig["collector_parallel"] = config["omnistat.collectors"].getboolean(
+            "enable_parallel_collectors", False
+        )
+        self.runtimeConfig["collector_timeout_secs"] = config["omnistat.collectors"].getfloat(
+            "collector_timeout_secs", 1.0
+        )
+        # per-collector overrides are named after the collector, e.g. "rms_timeout_secs = 2.0"
+        self.runtimeConfig["collector_timeouts"] = {}
+        for key, value in config["omnistat.collectors"].items():
+            if key.endswith("_timeout_secs") and key != "collector_timeout_secs":
+                self.runtimeConfig["collector_timeouts"][key.removesuffix("_timeout_secs")] = float(value)
+
+        self.runtimeConfig["collector_self_telemetry"] = config["omnistat.collectors"].getboolean(
+            "enable_self_telemetry", False
+        )
+
+        # optional background sampling: collectors are updated on a fixed cadence by a dedicated
+        # thread and /metrics serves the latest pre-rendered snapshot
+        self.runtimeConfig["collector_background_sampling"] = config["omnistat.collectors"].getboolean(
+            "enable_background_sampling", False
+        )
+        self.runtimeConfig["collector_background_interval_secs"] = config["omnistat.collectors"].getfloat(
+            "background_interval_secs", 1.0
+        )
+        if self.runtimeConfig["collector_background_interval_secs"] <= 0:
+            logging.error(
+                "[ERROR]: background_interval_secs must be positive (%s)"
+                % self.runtimeConfig["collector_background_interval_secs"]
+            )
+            sys.exit(1)
+
+        # optional shared-memory ring with the latest samples for co-located consumers
+        # (see omnistat/shm_ring.py)
+        self.runtimeConfig["collector_shm_ring"] = config["omnistat.collectors"].getboolean("enable_shm_ring", False)
+        self.runtimeConfig["collector_shm_ring_path"] = config["omnistat.collectors"].get(
+            "shm_ring_path", "/dev/shm/omnistat_metrics"
+        )
+        self.runtimeConfig["collector_shm_ring_samples"] = config["omnistat.collectors"].getint(
+            "shm_ring_samples", 1024
+        )
+        if self.runtimeConfig["collector_shm_ring_samples"] < 1:
+            logging.error(
+                "[ERROR]: shm_ring_samples must be positive (%s)" % self.runtimeConfig["collector_shm_ring_samples"]
+            )
+            sys.exit(1)
+
+        # optional per-collector sampling intervals, e.g. "rms_interval_secs = 30". Collectors
+        # without an interval are updated on every sampling request. background_interval_secs is
+        # the cadence of the background sampler, not a collector interval.
+        self.runtimeConfig["collector_intervals"] = {}
+        for key, value in config["omnistat.collectors"].items():
+            if key.endswith("_interval_secs") and key != "background_interval_secs":
+                interval = float(value)
+                if interval <= 0:
+                    logging.error("[ERROR]: Collector sampling intervals must be positive (%s = %s)" % (key, value))
+                    sys.exit(1)
+                self.runtimeConfig["collector_intervals"][key.removesuffix("_interval_secs")] = interval
+
+        # enable flags for all collectors, including third-party plugins (e.g. "enable_uptime = True")
+        self.runtimeConfig["collector_enable_flags"] = {}
+        for key in config["omnistat.collectors"]:
+            if key.startswith("enable_"):
+                self.runtimeConfig["collector_enable_flags"][key.removeprefix("enable_")] = config[
+                    "omnistat.collectors"
+                ].getboolean(key)
+
         allowed_ips = config["omnistat.collectors"].get("allowed_ips", "127.0.0.1")
         # convert comma-separated string into list
         self.runtimeConfig["collector_allowed_ips"] = re.split(r",\s*", allowed_ips)
@@ -117,6 +212,7 @@ class Monitor:
             self.jobDetection["stepfile"] = config["omnistat.collectors.rms"].get(
                 "step_detection_file", "/tmp/omni_rmsjobinfo_step"
             )
+            self.runtimeConfig["rms_job_detection"] = self.jobDetection
             if config.has_option("omnistat.collectors.rms", "host_skip"):
                 self.runtimeConfig["rms_collector_host_skip"] = config["omnistat.collectors.rms"]["host_skip"]
 
@@ -145,8 +241,39 @@ class Monitor:
         self.__globalMetrics = {}
         self.__registry_global = CollectorRegistry()
 
-        # define desired collectors
-        self.__collectors = []
+        # define desired collectors (indexed by collector name)
+        self.__collectors = {}
+        self.__seriesCollectors = set()
+
+        # metrics owned by each collector, and the time each collector was last read
+        self.__familyOwners = {}
+        self.__seriesRanges = {}
+        self.__readTimes = {}
+
+        # state for concurrent collector execution
+        self.__executor = None
+        self.__pending = {}
+        self.__deadlines = {}
+        self.__lateCollectors = set()
+        self.__staging = {}
+        self.__familyCache = {}
+
+        # state for multi-rate collector scheduling
+        self.__scheduler = None
+        self.__everySample = []
+
+        # exporter self-telemetry (enabled in initMetrics)
+        self.telemetry = None
+
+        # shared-memory ring of samples (enabled in initMetrics)
+        self.__shmRing = None
+
+        # latest snapshot published by the background sampler (see startSampler)
+        self.__snapshot = None
+        self.__encodedLock = threading.Lock()
+        self.__encoded = (None, {})  # latest snapshot encoded, (format, encoding) -> encoded body
+        self.__samplerThread = None
+        self.__samplerStop = threading.Event()
 
         # allow for disablement of resource manager data collector via regex match
         if self.runtimeConfig["collector_enable_rms"]:
@@ -163,65 +290,330 @@ class Monitor:
 
     def initMetrics(self):
 
-        if self.runtimeConfig["collector_enable_vendor_counters"]:
-            from omnistat.collector_pm_counters import PM_COUNTERS
-
-            self.__collectors.append(PM_COUNTERS())
-
-        if self.runtimeConfig["collector_enable_network"]:
-            from omnistat.collector_network import NETWORK
-
-            self.__collectors.append(NETWORK())
-
-        if self.runtimeConfig["collector_enable_rocm_smi"]:
-            from omnistat.collector_smi import ROCMSMI
-
-            self.__collectors.append(ROCMSMI(runtimeConfig=self.runtimeConfig))
-        if self.runtimeConfig["collector_enable_amd_smi"]:
-            from omnistat.collector_smi_v2 import AMDSMI
-
-            self.__collectors.append(AMDSMI(runtimeConfig=self.runtimeConfig))
-        if self.runtimeConfig["collector_enable_amd_smi_process"]:
-            from omnistat.collector_smi_process import AMDSMIProcess
-
-            self.__collectors.append(AMDSMIProcess())
-        if self.runtimeConfig["collector_enable_rms"]:
-            from omnistat.collector_rms import RMSJob
-
-            self.__collectors.append(
-                RMSJob(
-                    annotations=self.runtimeConfig["rms_collector_annotations"],
-                    jobDetection=self.jobDetection,
-                )
-            )
-        if self.runtimeConfig["collector_enable_events"]:
-            from omnistat.collector_events import ROCMEvents
-
-            self.__collectors.append(ROCMEvents())
+        # Instantiate enabled collectors: plugins are only imported when enabled
+        collectors, costs = plugins.loadCollectors(self.runtimeConfig)
+        self.__collectors.update(collectors)
 
-        if self.runtimeConfig["collector_enable_rocprofiler"]:
-            from omnistat.collector_rocprofiler import rocprofiler
+        if self.runtimeConfig["collector_self_telemetry"]:
+            self.telemetry = SelfTelemetry()
 
-            self.__collectors.append(
-                rocprofiler(self.runtimeConfig["collector_rocm_path"], self.runtimeConfig["rocprofiler_metrics"])
-            )
-
-        if self.runtimeConfig["collector_contrib_enable_kmsg"]:
-            from omnistat.contrib.collector_kmsg import KmsgCollector
-
-            min_severity = self.runtimeConfig["kmsg_min_severity"]
-            include_existing = self.runtimeConfig["kmsg_include_existing"]
-            self.__collectors.append(KmsgCollector(min_severity=min_severity, include_existing=include_existing))
-
-        # Initialize all metrics
-        for collector in self.__collectors:
+        # Initialize all metrics, recording the families and series registered by each collector
+        families = self.familyNames()
+        for name, collector in self.__collectors.items():
+            numSeries = len(SERIES)
+            start_time = time.perf_counter()
             collector.registerMetrics()
+            costs.setdefault(name, {})["register"] = time.perf_counter() - start_time
+            self.__seriesRanges[name] = (numSeries, len(SERIES))
+            registered = self.familyNames()
+            for family in registered - families:
+                self.__familyOwners[family] = name
+            families = registered
+        self.startupReport(costs)
+
+        # Collectors publishing through the series table are sampled via updateSeries()
+        for name, collector in self.__collectors.items():
+            if collector.supportsSeries:
+                self.__seriesCollectors.add(name)
+
+        if self.runtimeConfig["collector_shm_ring"]:
+            path = self.runtimeConfig["collector_shm_ring_path"]
+            logging.info("Publishing samples to shared-memory ring %s" % path)
+            self.__shmRing = RingWriter(path, self.runtimeConfig["collector_shm_ring_samples"])
 
         # Gather metrics on startup
-        for collector in self.__collectors:
-            collector.updateMetrics()
+        for name in self.__collectors:
+            self.sampleCollector(name)
+        self.publishSample()
+
+        if self.runtimeConfig["collector_parallel"] and self.__collectors:
+            self.initParallelExecution()
+
+        if self.runtimeConfig["collector_intervals"]:
+            self.initScheduler()
+
+    def startupReport(self, costs):
+        """Log the startup cost of every collector (import, initialization and metric registration)"""
+        logging.info("Collector startup report (secs):")
+        logging.info("--> %-18s %10s %10s %10s" % ("collector", "import", "init", "register"))
+        for name, cost in costs.items():
+            columns = []
+            for key in ("import", "init", "register"):
+                columns.append("%10.4f" % cost[key] if key in cost else "%10s" % "-")
+            logging.info("--> %-18s %s" % (name, " ".join(columns)))
+
+    def initScheduler(self):
+        """Setup timer wheel for collectors with dedicated sampling intervals"""
+        intervals = {}
+        for name, interval in self.runtimeConfig["collector_intervals"].items():
+            if name in self.__collectors:
+                intervals[name] = interval
+                logging.info("--> collector %s sampling interval = %.3f (secs)" % (name, interval))
+            else:
+                logging.warning("[WARN]: Ignoring sampling interval for unknown or disabled collector -> %s" % name)
+
+        self.__everySample = [name for name in self.__collectors if name not in intervals]
+        if not intervals:
+            return
+
+        # collectors were just sampled during initialization, so the first occurrence of each one
+        # is one full interval from now
+        now = time.monotonic()
+        # ticks divide all intervals, so collectors are not rounded to multiples of the shortest one
+        self.__scheduler = TimerWheel(resolution=tickResolution(intervals.values()))
+        for name, interval in intervals.items():
+            self.__scheduler.add(name, interval, now)
+
+    def dueCollectors(self):
+        """Return names of collectors to update in the current sampling request"""
+        if self.__scheduler is None:
+            return list(self.__collectors)
+        due = set(self.__scheduler.advance(time.monotonic()))
+        return [name for name in self.__collectors if name in due or name in self.__everySample]
+
+    def initParallelExecution(self):
+        """Setup thread pool and per-collector deadlines for concurrent collector execution"""
+        defaultTimeout = self.runtimeConfig["collector_timeout_secs"]
+        for name in self.__collectors:
+            self.__deadlines[name] = self.runtimeConfig["collector_timeouts"].get(name, defaultTimeout)
+            logging.info("--> collector %s deadline = %.3f (secs)" % (name, self.__deadlines[name]))
+
+        for name in self.runtimeConfig["collector_timeouts"]:
+            if name not in self.__collectors:
+                logging.warning("[WARN]: Ignoring deadline for unknown or disabled collector -> %s" % name)
+
+        self.__deadlineMetric = Gauge(
+            "omnistat_collector_deadline_exceeded",
+            "Collector missed its deadline and its update is still in flight",
+            labelnames=["collector"],
+        )
+        for name in self.__collectors:
+            self.__deadlineMetric.labels(collector=name).set(0)
+
+        # series collectors write into private copies of their series, published once complete
+        for name in self.__seriesCollectors:
+            start, end = self.__seriesRanges[name]
+            self.__staging[name] = SERIES.values[:end].copy()
+
+        # other collectors write directly into their gauges: keep their last complete families, which
+        # are served while an update is late
+        for name in self.__collectors:
+            if name not in self.__seriesCollectors:
+                self.__familyCache[name] = self.collectFamilies(name)
+
+        self.__executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(self.__collectors), thread_name_prefix="omnistat-collector"
+        )
+        logging.info("Parallel collector execution enabled (%i collectors)" % len(self.__collectors))
+
+    def familyNames(self):
+        return {metric.name for metric in REGISTRY.collect()}
+
+    def collectFamilies(self, name):
+        """Return the current default registry families of a collector, indexed by name"""
+        return {metric.name: metric for metric in REGISTRY.collect() if self.__familyOwners.get(metric.name) == name}
+
+    def collectorFamilies(self):
+        """Return a dict mapping prometheus metric family names to the collector that registered them"""
+        return dict(self.__familyOwners)
+
+    def collectorSeries(self):
+        """Return a dict mapping collector names to the range of series table ids they registered"""
+        return dict(self.__seriesRanges)
+
+    def readTimes(self):
+        """Return a dict with the time each collector last completed an update (secs since the epoch)"""
+        return dict(self.__readTimes)
+
+    def sampleCollector(self, name):
+        """Update metrics for a single collector"""
+        if name in self.__seriesCollectors:
+            staging = self.__staging.get(name)
+            if staging is None:
+                self.__collectors[name].updateSeries(SERIES.values)
+            else:
+                # publish the complete update at once, so a late collector never exposes a partial one
+                start, end = self.__seriesRanges[name]
+                self.__collectors[name].updateSeries(staging)
+                SERIES.values[start:end] = staging[start:end]
+        else:
+            self.__collectors[name].updateMetrics()
+            if name in self.__familyCache:
+                self.__familyCache[name] = self.collectFamilies(name)
+        self.__readTimes[name] = time.time()
+
+    def runCollector(self, name):
+        """Update metrics for a single collector, recording its duration if self-telemetry is enabled"""
+        if self.telemetry:
+            start_time = time.perf_counter()
+            self.sampleCollector(name)
+            self.telemetry.observeCollector(name, time.perf_counter() - start_time)
+        else:
+            self.sampleCollector(name)
+
+    def updateCollectors(self):
+        """Update metrics for all collectors due in the current sampling request"""
+        names = self.dueCollectors()
+        if self.__executor:
+            self.updateCollectorsParallel(names)
+        else:
+            for name in names:
+                self.runCollector(name)
+
+        if self.telemetry:
+            self.telemetry.updateProcessMetrics()
+
+        self.publishSample()
+
+    def publishSample(self):
+        """Write the current values of the series table to the shared-memory ring, if enabled"""
+        if self.__shmRing is None:
+            return
+        # series are only ever appended, so the ring is recreated when their number changes
+        numSeries = len(SERIES)
+        if self.__shmRing.numSeries != numSeries:
+            self.__shmRing.create(SERIES.seriesKeys())
+        self.__shmRing.publish(time.time(), SERIES.values[:numSeries])
+
+    def closeSharedMemory(self):
+        """Remove the shared-memory ring, if enabled"""
+        if self.__shmRing is not None:
+            self.__shmRing.remove()
+            self.__shmRing = None
+
+    def lateFamilies(self):
+        """Return the cached default registry families of collectors with a late update still in
+        flight. These collectors write directly into their gauges, so their last complete update is
+        exposed instead of a partially updated sample."""
+        families = {}
+        for name in self.__lateCollectors:
+            if name in self.__familyCache and not self.__pending[name].done():
+                families.update(self.__familyCache[name])
+        return families
+
+    def renderMetrics(self, fmt=exposition.TEXT):
+        """Render all metrics in the given exposition format (see omnistat/exposition.py)"""
+        cached = self.lateFamilies() if self.__lateCollectors else None
+        if self.telemetry:
+            start_time = time.perf_counter()
+            output = exposition.render(fmt, SERIES, cached)
+            self.telemetry.observeSerialization(time.perf_counter() - start_time)
+            return output
+
+        return exposition.render(fmt, SERIES, cached)
+
+    def updateAllMetrics(self, fmt=exposition.TEXT):
+        """Update metrics for all collectors and return the exposition in the given format"""
+        self.updateCollectors()
+        return self.renderMetrics(fmt)
+
+    def startSampler(self):
+        """Start a background thread that samples all collectors at a fixed cadence.
+
+        Every sample is rendered once and published as an immutable snapshot; the
+        reference swap is atomic, so readers never observe a partially updated sample.
+        """
+        interval = self.runtimeConfig["collector_background_interval_secs"]
+        logging.info("Background sampling enabled (every %.3f secs)" % interval)
+        self.__snapshot = self.sampleSnapshot()
+        self.__samplerThread = threading.Thread(
+            target=self.samplerLoop, args=(interval,), name="omnistat-sampler", daemon=True
+        )
+        self.__samplerThread.start()
+
+    def stopSampler(self):
+        """Stop the background sampling thread"""
+        self.__samplerStop.set()
+        if self.__samplerThread is not None:
+            self.__samplerThread.join()
+            self.__samplerThread = None
+
+    def samplerLoop(self, interval):
+        nextSample = time.monotonic() + interval
+        while not self.__samplerStop.wait(max(0.0, nextSample - time.monotonic())):
+            try:
+                self.__snapshot = self.sampleSnapshot()
+            except Exception as e:
+                logging.error("[ERROR]: Background sampling failed: %s" % e)
+
+            # keep a fixed cadence; if sampling overran the interval, skip missed
+            # samples instead of running back to back
+            nextSample += interval
+            now = time.monotonic()
+            if nextSample < now:
+                nextSample = now + interval
+
+    def sampleSnapshot(self):
+        """Update all collectors and render a new snapshot in every exposition format. Formats are
+        rendered here, on the sampler thread, as the series may only be read between updates."""
+        self.updateCollectors()
+        return MetricsSnapshot({fmt: self.renderMetrics(fmt) for fmt in exposition.CONTENT_TYPES})
+
+    def snapshot(self):
+        """Return the latest snapshot published by the background sampler"""
+        return self.__snapshot
+
+    def snapshotBody(self, fmt=exposition.TEXT, encoding=exposition.IDENTITY):
+        """Return the latest snapshot in the requested format and content encoding. Encoded bodies of
+        the latest snapshot are cached, so concurrent scrapers only pay the compression cost once per
+        sample."""
+        if encoding == exposition.IDENTITY:
+            return self.__snapshot.bodies[fmt]
+
+        key = (fmt, encoding)
+        with self.__encodedLock:
+            snapshot = self.__snapshot
+            encodedSnapshot, bodies = self.__encoded
+            if encodedSnapshot is not snapshot:
+                bodies = {}
+                self.__encoded = (snapshot, bodies)
+            body = bodies.get(key)
+            if body is None:
+                body = exposition.encode(snapshot.bodies[fmt], encoding)
+                bodies[key] = body
+        return body
+
+    def updateCollectorsParallel(self, names):
+        """
+        Run the given collectors concurrently and wait for each one up to its deadline. A collector
+        that misses its deadline is flagged and keeps running in the background, and it is not
+        resubmitted until the outstanding update completes. Meanwhile, series collectors keep
+        their previously published values (updates are staged and published once complete), and
+        the families of other collectors are served from their last complete update.
+        """
+        start_time = time.perf_counter()
+
+        for name in names:
+            future = self.__pending.get(name)
+            if future is None:
+                self.__pending[name] = self.__executor.submit(self.runCollector, name)
+            elif future.done():
+                # report failures from updates that completed after their deadline
+                if name in self.__lateCollectors and future.exception():
+                    logging.error("[ERROR]: Collector %s failed: %s" % (name, future.exception()))
+                self.__pending[name] = self.__executor.submit(self.runCollector, name)
+
+        # wait on collectors submitted in this request, and poll late ones from earlier requests
+        waiting = list(names) + [name for name in self.__lateCollectors if name not in names]
+        for name in waiting:
+            future = self.__pending[name]
+            remaining = 0.0
+            if name in names:
+                remaining = max(start_time + self.__deadlines[name] - time.perf_counter(), 0.0)
+            try:
+                future.result(timeout=remaining)
+            except concurrent.futures.TimeoutError:
+                if name not in self.__lateCollectors:
+                    logging.warning("[WARN]: Collector %s exceeded deadline; update continues in the background" % name)
+                    self.__lateCollectors.add(name)
+                    self.__deadlineMetric.labels(collector=name).set(1)
+                continue
+            except Exception as e:
+                logging.error("[ERROR]: Collector %s failed: %s" % (name, e))
+
+            if name in self.__lateCollectors:
+                logging.info("Collector %s back within deadline" % name)
+                self.__lateCollectors.discard(name)
+                self.__deadlineMetric.labels(collector=name).set(0)
 
-    def updateAllMetrics(self):
-        for collector in self.__collectors:
-            collector.updateMetrics()
-        return generate_latest()
+        return
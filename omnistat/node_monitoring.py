@@ -42,7 +42,7 @@ import sys
 import gunicorn.app.base
 from flask import Flask, abort, jsonify, request
 
-from omnistat import utils
+from omnistat import exposition, utils
 from omnistat.monitor import Monitor
 
 
@@ -51,6 +51,22 @@ def shutdown():
     return jsonify({"message": "Shutting down..."}), 200
 
 
+def metrics(monitor):
+    """Serve metrics in the format and content encoding negotiated with the scraper"""
+    fmt = exposition.negotiateFormat(request.headers.get("Accept"))
+    encoding = exposition.negotiateEncoding(request.headers.get("Accept-Encoding"))
+
+    if monitor.runtimeConfig["collector_background_sampling"]:
+        body = monitor.snapshotBody(fmt, encoding)
+    else:
+        body = exposition.encode(monitor.updateAllMetrics(fmt), encoding)
+
+    headers = {"Content-Type": exposition.CONTENT_TYPES[fmt], "Vary": "Accept, Accept-Encoding"}
+    if encoding != exposition.IDENTITY:
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
 class OmnistatServer(gunicorn.app.base.BaseApplication):
     def __init__(self, app, options=None):
         self.options = options or {}
@@ -93,16 +109,30 @@ def main():
     # preserve the state of the collectors.
     def post_fork(server, worker):
         monitor.initMetrics()
-        app.route("/metrics")(lambda: (monitor.updateAllMetrics(), {"Content-Type": "text/plain; charset=utf-8"}))
+        if monitor.runtimeConfig["collector_background_sampling"]:
+            monitor.startSampler()
+        app.route("/metrics")(lambda: metrics(monitor))
         app.route("/shutdown")(shutdown)
 
+    # Remove the shared-memory ring when the worker exits, so readers do not find a stale ring
+    def worker_exit(server, worker):
+        if monitor.runtimeConfig["collector_background_sampling"]:
+            monitor.stopSampler()
+        monitor.closeSharedMemory()
+
     listenPort = config["omnistat.collectors"].get("port", 8001)
     options = {
         "bind": "%s:%s" % ("0.0.0.0", listenPort),
         "workers": 1,
         "post_fork": post_fork,
+        "worker_exit": worker_exit,
     }
 
+    # Snapshots are served without touching the collectors, so concurrent scrapes can be
+    # handled in parallel
+    if monitor.runtimeConfig["collector_background_sampling"]:
+        options["threads"] = 4
+
     # Launch gunicorn
     OmnistatServer(app, options).run()
 
@@ -27,6 +27,7 @@ import argparse
 import concurrent.futures
 import importlib.resources
 import logging
+import math
 import os
 import platform
 import shutil
@@ -104,8 +105,11 @@ class UserBasedMonitoring:
 
         section = "omnistat.usermode"
 
+        self.__output_dir = self.runtimeConfig[section].get("output_dir", None, vars=os.environ)
         self.__external_victoria = self.runtimeConfig[section].getboolean("external_victoria", False)
-        if self.__external_victoria:
+        if self.__output_dir:
+            logging.info("Local file output requested (%s)" % self.__output_dir)
+        elif self.__external_victoria:
             logging.info("External VictoriaMetrics server requested")
             self.__external_victoria_endpoint = self.runtimeConfig[section].get("external_victoria_endpoint")
             self.__external_victoria_port = self.runtimeConfig[section].get("external_victoria_port")
@@ -172,8 +176,11 @@ class UserBasedMonitoring:
 
         self.victoriaModeSetup()
 
-        # noop if using an external server
-        if self.__external_victoria:
+        # noop if using an external server or writing to local files
+        if self.__output_dir:
+            logging.info("Writing data to local files, no VictoriaMetrics server needed")
+            return
+        elif self.__external_victoria:
             logging.info("Pushing data to external VictoriaMetrics server")
             return
         else:
@@ -214,6 +221,10 @@ class UserBasedMonitoring:
             "-search.maxPointsPerTimeseries=90000",
             "-httpListenAddr=:9090",
         ]
+        # samples of unchanged series are only recorded every heartbeat: avoid gaps between them
+        if self.runtimeConfig[section].getboolean("record_changes_only", False):
+            heartbeat_secs = self.runtimeConfig[section].getfloat("heartbeat_secs", 60.0)
+            command.append("-search.minStalenessInterval=%is" % math.ceil(2 * heartbeat_secs))
         envAddition = {}
         # restrict thread usage
         envAddition["GOMAXPROCS"] = "4"
@@ -333,10 +344,14 @@ class UserBasedMonitoring:
             logging.info("[exporter]: Standalone sampling interval = %s" % self.scrape_interval)
             hostname = platform.node().split(".", 1)[0]
 
-            if self.__external_victoria:
-                cmd = f"nice -n 20 {sys.executable} -m omnistat.standalone --configfile={self.configFile} --interval {self.scrape_interval} --pushinterval {self.push_frequency} --endpoint {self.__external_victoria_endpoint} --port {self.__external_victoria_port} --log exporter.log"
+            base_cmd = f"nice -n 20 {sys.executable} -m omnistat.standalone --configfile={self.configFile} --interval {self.scrape_interval} --pushinterval {self.push_frequency}"
+            if self.__output_dir:
+                target = f"--output-dir {self.__output_dir}"
+            elif self.__external_victoria:
+                target = f"--endpoint {self.__external_victoria_endpoint} --port {self.__external_victoria_port}"
             else:
-                cmd = f"nice -n 20 {sys.executable} -m omnistat.standalone --configfile={self.configFile} --interval {self.scrape_interval} --pushinterval {self.push_frequency} --endpoint {hostname} --log exporter.log"
+                target = f"--endpoint {hostname}"
+            cmd = f"{base_cmd} {target} --log exporter.log"
         else:
             cmd = f"nice -n 20 {sys.executable} -m omnistat.node_monitoring --configfile={self.configFile}"
 
@@ -410,9 +425,24 @@ class UserBasedMonitoring:
             if self.__external_proxy:
                 additional_env = f"http_proxy={self.__external_proxy}"
 
+            # in large jobs, designated hosts relay pushes from their peers to VictoriaMetrics
+            command = f"sh -c 'cd {os.getcwd()} && PYTHONPATH={':'.join(sys.path)} {additional_env} {cmd}'"
+            relays = self.relayAssignments() if victoriaMode and not self.__output_dir else None
+            if relays:
+                relay_port = self.runtimeConfig["omnistat.usermode"].getint("relay_port", 8002)
+                commands = {}
+                for host, relay in relays.items():
+                    if host == relay:
+                        role = f"{target} --relay-port {relay_port}"
+                    else:
+                        role = f"--endpoint {relay} --port {relay_port}"
+                    # substitute the push target for the role of each host
+                    commands[host] = command.replace(f" {target} --log", f" {role} --log")
+                command = commands
+
             # trying local ssh client implementation
             launch_results = utils.execute_ssh_parallel(
-                command=f"sh -c 'cd {os.getcwd()} && PYTHONPATH={':'.join(sys.path)} {additional_env} {cmd}'",
+                command=command,
                 hostnames=self.__hosts,
                 max_concurrent=128,
                 ssh_timeout=100,
@@ -490,6 +520,15 @@ class UserBasedMonitoring:
 
         return t2 - t1
 
+    def relayAssignments(self):
+        """Return the push relay assigned to each host, or None if relays are disabled"""
+        group_size = self.runtimeConfig["omnistat.usermode"].getint("relay_group_size", 0)
+        if group_size < 2 or not self.__hosts or len(self.__hosts) <= group_size:
+            return None
+        relays = utils.relay_assignments(self.__hosts, group_size)
+        logging.info("Relaying pushes through %i hosts (1 per %i hosts)" % (len(set(relays.values())), group_size))
+        return relays
+
     def stopExporters(self, victoriaMode=False):
         self.rmsDetection()
         self.disableProxies()
@@ -498,15 +537,27 @@ class UserBasedMonitoring:
 
         port = self.runtimeConfig["omnistat.collectors"].get("port", "8001")
 
-        with concurrent.futures.ThreadPoolExecutor(max_workers=256) as executor:
-            future_to_host = {
-                executor.submit(
-                    self.stopSingleExporters,
-                    host,
-                    port,
-                ): host
-                for host in self.__hosts
-            }
+        # relays keep running until all their peers delivered their final data
+        relays = self.relayAssignments() if victoriaMode else None
+        if relays:
+            relay_hosts = set(relays.values())
+            phases = [[host for host in self.__hosts if host not in relay_hosts], sorted(relay_hosts)]
+        else:
+            phases = [self.__hosts]
+
+        future_to_host = {}
+        for hosts in phases:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=256) as executor:
+                future_to_host.update(
+                    {
+                        executor.submit(
+                            self.stopSingleExporters,
+                            host,
+                            port,
+                        ): host
+                        for host in hosts
+                    }
+                )
 
         # Collect results as they complete
         min_time = float("inf")
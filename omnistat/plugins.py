@@ -0,0 +1,216 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Collector plugin registry
+
+Collectors are described by plugins that name the callable used to create
+them ("module:attribute") without importing it, so the cost of importing a
+collector (and its dependencies) is only paid when the collector is enabled.
+Built-in and contrib collectors are listed in BUILTIN_PLUGINS; third-party
+collectors are discovered from packages that declare an entry point in the
+"omnistat.collectors" group, e.g. in pyproject.toml:
+
+    [project.entry-points."omnistat.collectors"]
+    uptime = "omnistat_uptime.collector_uptime:NODEUptime"
+
+Third-party collectors are enabled with an "enable_<name>" option in the
+[omnistat.collectors] section of the runtime configuration, and are created
+with the runtime configuration as single keyword argument (runtimeConfig).
+"""
+
+import importlib
+import importlib.metadata
+import logging
+import sys
+import time
+
+ENTRY_POINT_GROUP = "omnistat.collectors"
+
+
+class CollectorPlugin:
+    def __init__(self, name, target, enabled=None, arguments=None):
+        """
+        Args:
+            name (str): collector name
+            target (str): collector class or factory, as "module:attribute"
+            enabled (callable, optional): returns whether the collector is enabled given the runtime
+                configuration. Defaults to checking the "enable_<name>" option.
+            arguments (callable, optional): returns keyword arguments for the factory given the
+                runtime configuration. Defaults to passing the runtime configuration.
+        """
+        self.name = name
+        self.target = target
+        self.__enabled = enabled
+        self.__arguments = arguments
+
+    def isEnabled(self, runtimeConfig):
+        if self.__enabled:
+            return self.__enabled(runtimeConfig)
+        return runtimeConfig["collector_enable_flags"].get(self.name, False)
+
+    def arguments(self, runtimeConfig):
+        if self.__arguments:
+            return self.__arguments(runtimeConfig)
+        return {"runtimeConfig": runtimeConfig}
+
+    def load(self):
+        """Import the plugin module and return the collector factory"""
+        module, _, attribute = self.target.partition(":")
+        return getattr(importlib.import_module(module), attribute)
+
+
+def enabledByKey(key):
+    return lambda runtimeConfig: runtimeConfig[key]
+
+
+def noArguments(runtimeConfig):
+    return {}
+
+
+# Built-in and contrib collectors, in initialization order
+BUILTIN_PLUGINS = [
+    CollectorPlugin(
+        "vendor_counters",
+        "omnistat.collector_pm_counters:PM_COUNTERS",
+        enabledByKey("collector_enable_vendor_counters"),
+        noArguments,
+    ),
+    CollectorPlugin(
+        "network",
+        "omnistat.collector_network:NETWORK",
+        enabledByKey("collector_enable_network"),
+        noArguments,
+    ),
+    CollectorPlugin("rocm_smi", "omnistat.collector_smi:ROCMSMI", enabledByKey("collector_enable_rocm_smi")),
+    CollectorPlugin("amd_smi", "omnistat.collector_smi_v2:AMDSMI", enabledByKey("collector_enable_amd_smi")),
+    CollectorPlugin(
+        "gpu_metrics",
+        "omnistat.collector_gpu_metrics:GPUMetrics",
+        enabledByKey("collector_enable_gpu_metrics"),
+        noArguments,
+    ),
+    CollectorPlugin(
+        "amd_smi_process",
+        "omnistat.collector_smi_process:AMDSMIProcess",
+        enabledByKey("collector_enable_amd_smi_process"),
+        noArguments,
+    ),
+    CollectorPlugin(
+        "rms",
+        "omnistat.collector_rms:RMSJob",
+        enabledByKey("collector_enable_rms"),
+        lambda runtimeConfig: {
+            "annotations": runtimeConfig["rms_collector_annotations"],
+            "jobDetection": runtimeConfig["rms_job_detection"],
+        },
+    ),
+    CollectorPlugin(
+        "events",
+        "omnistat.collector_events:ROCMEvents",
+        enabledByKey("collector_enable_events"),
+        noArguments,
+    ),
+    CollectorPlugin(
+        "rocprofiler",
+        "omnistat.collector_rocprofiler:rocprofiler",
+        enabledByKey("collector_enable_rocprofiler"),
+        lambda runtimeConfig: {
+            "rocm_path": runtimeConfig["collector_rocm_path"],
+            "metric_names": runtimeConfig["rocprofiler_metrics"],
+        },
+    ),
+    CollectorPlugin(
+        "kmsg",
+        "omnistat.contrib.collector_kmsg:KmsgCollector",
+        enabledByKey("collector_contrib_enable_kmsg"),
+        lambda runtimeConfig: {
+            "min_severity": runtimeConfig["kmsg_min_severity"],
+            "include_existing": runtimeConfig["kmsg_include_existing"],
+        },
+    ),
+]
+
+
+def discoverPlugins(group=ENTRY_POINT_GROUP):
+    """Return plugins declared by installed packages through entry points"""
+    entryPoints = importlib.metadata.entry_points()
+    if hasattr(entryPoints, "select"):
+        entryPoints = entryPoints.select(group=group)
+    else:
+        # Python < 3.10 returns a dictionary indexed by group
+        entryPoints = entryPoints.get(group, [])
+    return [CollectorPlugin(entryPoint.name, entryPoint.value) for entryPoint in entryPoints]
+
+
+def enabledPlugins(runtimeConfig):
+    """Return enabled built-in and third-party plugins. Plugins are not imported.
+
+    Returns:
+        list: enabled plugins, built-in collectors first
+    """
+    plugins = [plugin for plugin in BUILTIN_PLUGINS if plugin.isEnabled(runtimeConfig)]
+    builtinNames = {plugin.name for plugin in BUILTIN_PLUGINS}
+
+    for plugin in discoverPlugins():
+        if plugin.name in builtinNames:
+            logging.warning(
+                "[WARN]: Ignoring plugin %s (%s): name used by a built-in collector" % (plugin.name, plugin.target)
+            )
+            continue
+        if plugin.isEnabled(runtimeConfig):
+            plugins.append(plugin)
+
+    return plugins
+
+
+def loadCollectors(runtimeConfig):
+    """Import and instantiate all enabled collectors
+
+    Returns:
+        tuple: collectors indexed by name, and startup cost per collector (name -> dict with
+        "import" and "init" durations in secs)
+    """
+    start_time = time.perf_counter()
+    plugins = enabledPlugins(runtimeConfig)
+    logging.debug("Plugin discovery completed in %.4f secs" % (time.perf_counter() - start_time))
+
+    collectors = {}
+    costs = {}
+    for plugin in plugins:
+        start_time = time.perf_counter()
+        try:
+            factory = plugin.load()
+        except (ImportError, AttributeError) as e:
+            logging.error("")
+            logging.error("[ERROR]: Unable to load collector %s from %s" % (plugin.name, plugin.target))
+            logging.error("--> %s" % e)
+            logging.error("")
+            sys.exit(4)
+        import_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        collectors[plugin.name] = factory(**plugin.arguments(runtimeConfig))
+        costs[plugin.name] = {"import": import_time, "init": time.perf_counter() - start_time}
+
+    return collectors, costs
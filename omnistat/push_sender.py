@@ -0,0 +1,387 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Background delivery of usermode data
+
+Implements a long-lived sender thread that pushes batches of samples drained
+from the sample buffer. Batches are handed over through a bounded queue, so
+the sampling loop never waits on network I/O. When the queue is full (e.g.
+VictoriaMetrics is slow to ingest), the oldest queued batch is evicted and
+one of the following backpressure policies is applied to it:
+
+  * drop-oldest: discard it
+  * spill: write it to the spill log, pushed before newer batches once the
+    sender catches up
+  * downsample: keep every other sample and merge it with the next batch
+
+Evicted batches are handed to the sender thread, which spills or downsamples
+them, so the sampling loop never blocks on disk I/O or re-encoding either.
+
+Batches that fail to push (e.g. VictoriaMetrics is restarting) are written to
+the spill log regardless of the policy. The spill log is an append-only
+sequence of gzip-compressed segment files on node-local storage, capped in
+size by discarding its oldest segments. Segments are replayed in order, with
+jittered exponential backoff while the endpoint remains unavailable, and
+always before any newer batch. When the server asks clients to retry later
+(e.g. 429 or 503 with a Retry-After header), its delay is honored instead.
+Batches rejected permanently by the server (e.g. 400 or 413) are never retried:
+they are discarded and counted, so they cannot hold back newer batches.
+"""
+
+import gzip
+import logging
+import os
+import queue
+import random
+import threading
+
+from omnistat.sample_buffer import SampleBatch
+
+DROP_OLDEST = "drop-oldest"
+SPILL = "spill"
+DOWNSAMPLE = "downsample"
+POLICIES = (DROP_OLDEST, SPILL, DOWNSAMPLE)
+
+# delay between replay attempts while the endpoint is unavailable (secs)
+RETRY_DELAY_MIN = 1.0
+RETRY_DELAY_MAX = 120.0
+
+
+class PushError(Exception):
+    """Raised by push functions when a batch could not be delivered"""
+
+    def __init__(self, message, retryAfter=None, retryable=True):
+        """
+        Args:
+            message (str): error description
+            retryAfter (float, optional): delay requested by the server before retrying (secs)
+            retryable (bool, optional): False if the batch was rejected and retrying it would fail
+                again. Defaults to True.
+        """
+        super().__init__(message)
+        self.retryAfter = retryAfter
+        self.retryable = retryable
+
+
+class SpilledBatch:
+    """Batch of text lines stored in a gzip-compressed segment file"""
+
+    def __init__(self, path, numPoints, numBytes):
+        self.path = path
+        self.numPoints = numPoints
+        self.numBytes = numBytes
+
+    def __len__(self):
+        return self.numPoints
+
+    def lines(self):
+        with gzip.open(self.path, "rt") as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+
+class SpillLog:
+    def __init__(self, directory, maxBytes, prefix="omnistat-spill"):
+        """
+        Args:
+            directory (str): directory for segment files (e.g. /tmp or /dev/shm)
+            maxBytes (int): maximum size of all segments; the oldest segments are discarded beyond it
+            prefix (str, optional): prefix of segment file names. Defaults to omnistat-spill.
+        """
+        self.directory = directory
+        self.__prefix = prefix
+        self.__maxBytes = maxBytes
+        self.__segments = []
+        self.__numSegments = 0
+        self.__lock = threading.Lock()
+        self.numBytes = 0
+
+        # accounting of data discarded to honor the size cap (data points)
+        self.dropped = 0
+
+    def __len__(self):
+        """Number of data points in the log"""
+        with self.__lock:
+            return sum(len(segment) for segment in self.__segments)
+
+    @property
+    def numSegments(self):
+        return len(self.__segments)
+
+    def append(self, batch):
+        """Write a batch to a new segment at the end of the log
+
+        Returns:
+            bool: True if the batch was written
+        """
+        with self.__lock:
+            self.__numSegments += 1
+            path = os.path.join(self.directory, "%s-%i-%06i.gz" % (self.__prefix, os.getpid(), self.__numSegments))
+        # segments are written under a temporary name so only complete segments are replayed
+        partial = path + ".partial"
+        try:
+            with gzip.open(partial, "wt", compresslevel=1) as f:
+                for line in batch.lines():
+                    f.write(line + "\n")
+            os.rename(partial, path)
+            numBytes = os.path.getsize(path)
+        except OSError as e:
+            logging.error("[ERROR]: Unable to write spill log segment %s" % path)
+            logging.error(e)
+            try:
+                os.remove(partial)
+            except OSError:
+                pass
+            return False
+
+        with self.__lock:
+            self.__segments.append(SpilledBatch(path, len(batch), numBytes))
+            self.numBytes += numBytes
+            while self.numBytes > self.__maxBytes and len(self.__segments) > 1:
+                oldest = self.__segments.pop(0)
+                self.numBytes -= oldest.numBytes
+                self.dropped += len(oldest)
+                os.remove(oldest.path)
+                logging.warning(
+                    "[WARN]: Spill log exceeds %i bytes - dropping %i data points" % (self.__maxBytes, len(oldest))
+                )
+        return True
+
+    def oldest(self):
+        """Return the oldest segment, or None if the log is empty"""
+        with self.__lock:
+            return self.__segments[0] if self.__segments else None
+
+    def remove(self, segment):
+        """Remove a segment once delivered"""
+        with self.__lock:
+            if segment in self.__segments:
+                self.__segments.remove(segment)
+                self.numBytes -= segment.numBytes
+                os.remove(segment.path)
+
+
+class PushSender:
+    def __init__(
+        self,
+        push,
+        queueSize=2,
+        policy=DROP_OLDEST,
+        spillDir="/tmp",
+        spillMaxBytes=256 * 1024 * 1024,
+        spillPrefix="omnistat-spill",
+        name="omnistat-sender",
+    ):
+        """
+        Args:
+            push (callable): function used to deliver a batch; raises an exception on failure
+            queueSize (int, optional): maximum number of batches waiting for delivery. Defaults to 2.
+            policy (str, optional): backpressure policy (drop-oldest, spill or downsample)
+            spillDir (str, optional): directory for the spill log. Defaults to /tmp.
+            spillMaxBytes (int, optional): maximum size of the spill log. Defaults to 256 MB.
+            spillPrefix (str, optional): prefix of spill log segment names, unique per sender in a process
+            name (str, optional): name of the sender thread
+        """
+        if policy not in POLICIES:
+            raise ValueError("Unknown backpressure policy: %s" % policy)
+        if queueSize < 1:
+            raise ValueError("Queue size must be >= 1 (%s)" % queueSize)
+
+        self.__push = push
+        self.__policy = policy
+        self.__queue = queue.Queue(maxsize=queueSize)
+        self.__overflow = []
+        self.__overflowLock = threading.Lock()
+        self.__log = SpillLog(spillDir, spillMaxBytes, spillPrefix)
+        self.__retryDelay = RETRY_DELAY_MIN
+        self.__wait = RETRY_DELAY_MIN
+        self.__lastError = None
+        self.__stop = object()
+
+        # accounting of data affected by backpressure and failed pushes (data points)
+        self.dropped = 0
+        self.downsampled = 0
+        self.spilled = 0
+        self.rejected = 0
+
+        self.__thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.__thread.start()
+
+    @property
+    def pending(self):
+        """Number of data points in the spill log waiting to be replayed"""
+        return len(self.__log)
+
+    def submit(self, batch):
+        """Queue a batch for delivery. Never blocks: if the queue is full, its oldest batch is dropped or
+        handed to the sender thread to apply the backpressure policy."""
+        while True:
+            try:
+                self.__queue.put_nowait(batch)
+                return
+            except queue.Full:
+                pass
+
+            # evicted batches are handed over under the lock, so the sender thread always finds
+            # them before the newer batch it dequeued
+            with self.__overflowLock:
+                try:
+                    oldest = self.__queue.get_nowait()
+                except queue.Empty:
+                    # sender dequeued a batch in the meantime
+                    continue
+                if self.__policy != DROP_OLDEST:
+                    self.__overflow.append(oldest)
+                    continue
+
+            self.dropped += len(oldest)
+            logging.warning("[WARN]: Push queue is full - dropping %i buffered data points" % len(oldest))
+
+    def relieve(self):
+        """Apply the backpressure policy to batches evicted from the full queue, oldest first
+
+        Returns:
+            list: batches to deliver before the next queued batch
+        """
+        with self.__overflowLock:
+            overflow, self.__overflow = self.__overflow, []
+        if not overflow:
+            return []
+
+        numPoints = sum(len(batch) for batch in overflow)
+        if self.__policy == SPILL:
+            logging.warning("[WARN]: Push queue is full - spilling %i buffered data points" % numPoints)
+            for batch in overflow:
+                self.spill(batch)
+            return []
+
+        downsampled = SampleBatch.merge([batch.downsample(2) for batch in overflow])
+        self.downsampled += numPoints - len(downsampled)
+        logging.warning("[WARN]: Push queue is full - downsampling %i buffered data points" % numPoints)
+        return [downsampled]
+
+    def spill(self, batch):
+        """Append a batch to the spill log to be pushed later"""
+        dropped = self.__log.dropped
+        if self.__log.append(batch):
+            self.spilled += len(batch)
+        else:
+            self.dropped += len(batch)
+        self.dropped += self.__log.dropped - dropped
+
+    def deliver(self, batch):
+        """Push a batch
+
+        Returns:
+            bool: True if the batch was delivered, or rejected permanently and discarded
+        """
+        try:
+            self.__push(batch)
+        except PushError as e:
+            if e.retryable:
+                return self.failed(batch, e)
+            logging.error("[ERROR]: Push rejected - discarding %i buffered data points" % len(batch))
+            logging.error(e)
+            self.rejected += len(batch)
+        except Exception as e:
+            return self.failed(batch, e)
+        return True
+
+    def failed(self, batch, error):
+        """Record a failed push, to be retried after a backoff
+
+        Returns:
+            bool: False
+        """
+        logging.error("[ERROR]: Unable to push %i buffered data points" % len(batch))
+        logging.error(error)
+        self.__lastError = error
+        return False
+
+    def backoff(self):
+        """Compute the delay before the next attempt after a failed push (secs)"""
+        retryAfter = getattr(self.__lastError, "retryAfter", None)
+        if retryAfter is not None:
+            # jitter keeps throttled clients from retrying in lockstep
+            self.__wait = retryAfter * random.uniform(1.0, 1.25)
+        else:
+            self.__retryDelay = min(2 * self.__retryDelay, RETRY_DELAY_MAX)
+            self.__wait = random.uniform(self.__retryDelay / 2, self.__retryDelay)
+        logging.info("Retrying push in %.1f secs" % self.__wait)
+        return self.__wait
+
+    def replay(self):
+        """Push segments in the spill log, oldest first, until one fails
+
+        Returns:
+            bool: True if the spill log is empty
+        """
+        while True:
+            segment = self.__log.oldest()
+            if segment is None:
+                self.__retryDelay = RETRY_DELAY_MIN
+                return True
+            if not self.deliver(segment):
+                self.backoff()
+                return False
+            self.__log.remove(segment)
+
+    def run(self):
+        while True:
+            # while the spill log holds data, wake up periodically to retry it
+            timeout = self.__wait if self.__log.numSegments else None
+            try:
+                batch = self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                batch = None
+
+            # batches evicted from the queue are older than the dequeued one
+            batches = self.relieve()
+            if batch is not None and batch is not self.__stop:
+                if batches:
+                    batches = [SampleBatch.merge(batches + [batch])]
+                else:
+                    batches = [batch]
+
+            # spilled batches are older than any queued batch, which waits behind them
+            delivered = self.replay()
+            for pending in batches:
+                if not delivered:
+                    self.spill(pending)
+                elif not self.deliver(pending):
+                    self.backoff()
+                    self.spill(pending)
+                    delivered = False
+            if batch is self.__stop:
+                return
+
+    def close(self):
+        """Deliver all queued batches and stop the sender thread"""
+        self.__queue.put(self.__stop)
+        self.__thread.join()
+        if self.__log.numSegments:
+            logging.warning(
+                "[WARN]: %i data points could not be delivered and remain in %i spill log segment(s) in %s"
+                % (len(self.__log), self.__log.numSegments, self.__log.directory)
+            )
@@ -0,0 +1,162 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Push relay for large usermode jobs
+
+In large jobs, every host pushing directly to a single VictoriaMetrics server
+makes the number of connections and ingest bursts grow with the job size. A
+relay is a standalone instance on a designated host (e.g. one per group of
+hosts, assigned by omnistat-usermode) that also accepts pushes from its peers
+through the same import API as VictoriaMetrics, so peers only need to point
+their endpoint to the relay.
+
+Pushed bodies are gzip-compressed. They are validated on arrival and kept
+compressed: a gzip stream made of several members decompresses to the
+concatenation of all members, so bodies from many peers are merged without
+recompressing them and forwarded upstream in a single request. When too much
+data is waiting to be forwarded, peers are asked to retry later (503) and
+keep the data in their own spill logs in the meantime.
+"""
+
+import gzip
+import http
+import logging
+import threading
+import zlib
+
+# size of data waiting to be forwarded above which peers are throttled
+RELAY_MAX_BYTES = 256 * 1024 * 1024
+
+IMPORT_PATH = "/api/v1/import/prometheus"
+
+
+def countLines(body):
+    """Count lines in a gzip-compressed body, verifying it can be decompressed
+
+    Raises:
+        zlib.error: if the body is not valid gzip data
+    """
+    numLines = 0
+    decompressor = zlib.decompressobj(31)
+    data = body
+    while data:
+        numLines += decompressor.decompress(data, 1024 * 1024).count(b"\n")
+        data = decompressor.unconsumed_tail
+        if not data and decompressor.eof and decompressor.unused_data:
+            # next member of a multi-member stream
+            data = decompressor.unused_data
+            decompressor = zlib.decompressobj(31)
+    if not decompressor.eof:
+        raise zlib.error("Truncated gzip data")
+    return numLines
+
+
+class RelayBatch:
+    """Compressed bodies pushed by peers, merged for forwarding"""
+
+    def __init__(self, bodies, numPoints):
+        self.bodies = bodies
+        self.numPoints = numPoints
+
+    def __len__(self):
+        return self.numPoints
+
+    def lines(self):
+        """Generate lines in Prometheus text format (e.g. when spilled to disk)"""
+        for body in self.bodies:
+            yield from gzip.decompress(body).decode().splitlines()
+
+
+class Relay:
+    def __init__(self, maxBytes=RELAY_MAX_BYTES):
+        """
+        Args:
+            maxBytes (int, optional): maximum size of data waiting to be forwarded (compressed)
+        """
+        self.__maxBytes = maxBytes
+        self.__bodies = []
+        self.__numBytes = 0
+        self.__numPoints = 0
+        self.__lock = threading.Lock()
+
+        # accounting of data received from peers
+        self.received = 0
+        self.rejected = 0
+
+    def __len__(self):
+        """Number of data points waiting to be forwarded"""
+        return self.__numPoints
+
+    @property
+    def routes(self):
+        """Control server routes emulating the endpoints used by pushes to VictoriaMetrics"""
+        return {
+            ("POST", IMPORT_PATH): self.accept,
+            ("GET", "/ready"): self.ready,
+            ("GET", "/internal/resetRollupResultCache"): self.ready,
+            ("GET", "/internal/force_flush"): self.ready,
+        }
+
+    @property
+    def bodyLimits(self):
+        """Maximum size of pushed bodies: a peer relaying for others may push more than a single host"""
+        return {IMPORT_PATH: self.__maxBytes}
+
+    def ready(self, body):
+        return http.HTTPStatus.OK, {"status": "ok"}
+
+    def accept(self, body):
+        """Queue data pushed by a peer"""
+        if not body.startswith(b"\x1f\x8b"):
+            body = gzip.compress(body, 1)
+        try:
+            numPoints = countLines(body)
+        except zlib.error as e:
+            return http.HTTPStatus.BAD_REQUEST, {"error": "Invalid gzip data: %s" % e}
+
+        with self.__lock:
+            if self.__numBytes + len(body) > self.__maxBytes:
+                self.rejected += numPoints
+                logging.warning("[WARN]: Relay buffer is full - asking peer to retry later")
+                return http.HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Relay buffer is full"}
+            self.__bodies.append(body)
+            self.__numBytes += len(body)
+            self.__numPoints += numPoints
+            self.received += numPoints
+        return http.HTTPStatus.NO_CONTENT, None
+
+    def drain(self):
+        """Remove and return all data received since the previous call
+
+        Returns:
+            RelayBatch: merged data, or None if no data was received
+        """
+        with self.__lock:
+            if not self.__bodies:
+                return None
+            batch = RelayBatch(self.__bodies, self.__numPoints)
+            self.__bodies = []
+            self.__numBytes = 0
+            self.__numPoints = 0
+        return batch
@@ -0,0 +1,187 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Streaming rollups of usermode samples
+
+Aggregates samples collected at a high rate into coarser windows before they
+reach the sample buffer, so short spikes are retained at a fraction of the
+ingest volume. For every series and window, the selected statistics are
+recorded as separate series named after the original metric, e.g.:
+
+rocm_average_socket_power_watts:max_1s{card="0",...}
+rocm_average_socket_power_watts:mean_1s{card="0",...}
+
+Windows are aligned to multiples of their length in wall-clock time, and
+rollups are timestamped at the end of their window. Samples at time t belong
+to the window (end - length, end], consistent with PromQL range functions such
+as max_over_time(). Series matching one of the raw prefixes are also passed
+through unchanged.
+"""
+
+import numpy as np
+
+STATS = ("min", "max", "mean", "last", "count")
+
+
+def windowSuffix(window_millisecs):
+    """Return the duration suffix used in rollup names (e.g. "1s", "500ms")"""
+    if window_millisecs % 1000 == 0:
+        return "%is" % (window_millisecs // 1000)
+    return "%ims" % window_millisecs
+
+
+def rollupKey(key, stat, suffix):
+    """Return the series prefix of a rollup (e.g. 'name:max_1s{labels} ') from the original series prefix"""
+    name, separator, labels = key.partition("{")
+    if separator:
+        return "%s:%s_%s{%s" % (name, stat, suffix, labels)
+    return "%s:%s_%s " % (name.rstrip(), stat, suffix)
+
+
+class Rollup:
+    def __init__(self, buffer, window_millisecs, stats=STATS, rawPrefixes=()):
+        """
+        Args:
+            buffer (SampleBuffer): buffer receiving rollups (and raw samples)
+            window_millisecs (int): rollup window
+            stats (tuple, optional): statistics recorded per window. Defaults to STATS.
+            rawPrefixes (tuple, optional): metric name prefixes of series also recorded unchanged
+        """
+        for stat in stats:
+            if stat not in STATS:
+                raise ValueError("Unknown rollup statistic: %s" % stat)
+        if window_millisecs <= 0:
+            raise ValueError("Rollup window must be positive (%s)" % window_millisecs)
+
+        self.__buffer = buffer
+        self.__window = window_millisecs
+        self.__suffix = windowSuffix(window_millisecs)
+        self.__stats = tuple(stats)
+        self.__rawPrefixes = tuple(rawPrefixes)
+
+        self.__index = {}  # series prefix -> rollup series id
+        self.__rollupIds = [[] for _ in self.__stats]  # per statistic: rollup series id -> buffer id
+        self.__rawIds = []  # rollup series id -> buffer id of the raw series (-1 if not recorded)
+        self.__current = None  # index of the window being aggregated
+
+        self.__min = np.empty(0)
+        self.__max = np.empty(0)
+        self.__sum = np.empty(0)
+        self.__count = np.empty(0)
+        self.__last = np.empty(0)
+        self.__arrays = None
+
+    def __len__(self):
+        return len(self.__index)
+
+    def seriesId(self, key):
+        """Return the id of a series, registering its rollups if necessary
+
+        Args:
+            key (str): series prefix in text format, including trailing space (e.g. 'name{labels} ')
+        """
+        seriesId = self.__index.get(key)
+        if seriesId is None:
+            seriesId = len(self.__index)
+            self.__index[key] = seriesId
+            for ids, stat in zip(self.__rollupIds, self.__stats):
+                ids.append(self.__buffer.seriesId(rollupKey(key, stat, self.__suffix)))
+            if self.__rawPrefixes and key.startswith(self.__rawPrefixes):
+                self.__rawIds.append(self.__buffer.seriesId(key))
+            else:
+                self.__rawIds.append(-1)
+            self.__arrays = None
+        return seriesId
+
+    def __resize(self):
+        numSeries = len(self.__index)
+        extra = numSeries - len(self.__count)
+        if extra > 0:
+            self.__min = np.concatenate((self.__min, np.full(extra, np.nan)))
+            self.__max = np.concatenate((self.__max, np.full(extra, np.nan)))
+            self.__sum = np.concatenate((self.__sum, np.zeros(extra)))
+            self.__count = np.concatenate((self.__count, np.zeros(extra)))
+            self.__last = np.concatenate((self.__last, np.full(extra, np.nan)))
+        if self.__arrays is None:
+            self.__arrays = (
+                np.array(self.__rollupIds, dtype=np.intp).reshape(len(self.__stats), numSeries),
+                np.array(self.__rawIds, dtype=np.intp),
+            )
+
+    def append(self, timestamp_millisecs, seriesIds, values):
+        """Aggregate a new sample, recording the rollups of the previous window if it ended
+
+        Args:
+            timestamp_millisecs (int): sample timestamp
+            seriesIds (array): series ids of the sampled values
+            values (array): sampled values; NaN values are ignored
+        """
+        window = -(-timestamp_millisecs // self.__window)
+        if window != self.__current:
+            self.flush()
+            self.__current = window
+
+        self.__resize()
+        seriesIds = np.asarray(seriesIds, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        sampled = ~np.isnan(values)
+        self.__min[seriesIds] = np.fmin(self.__min[seriesIds], values)
+        self.__max[seriesIds] = np.fmax(self.__max[seriesIds], values)
+        self.__sum[seriesIds] += np.where(sampled, values, 0.0)
+        self.__count[seriesIds] += sampled
+        self.__last[seriesIds] = np.where(sampled, values, self.__last[seriesIds])
+
+        rawIds = self.__arrays[1][seriesIds]
+        raw = rawIds >= 0
+        if raw.any():
+            self.__buffer.append(timestamp_millisecs, rawIds[raw], values[raw])
+
+    def flush(self):
+        """Record the rollups of the current window in the buffer"""
+        if self.__current is None:
+            return
+        self.__resize()
+        sampled = np.nonzero(self.__count)[0]
+        if len(sampled) > 0:
+            count = self.__count[sampled]
+            results = {
+                "min": self.__min[sampled],
+                "max": self.__max[sampled],
+                "mean": self.__sum[sampled] / count,
+                "last": self.__last[sampled],
+                "count": count,
+            }
+            rollupIds = self.__arrays[0][:, sampled]
+            self.__buffer.append(
+                self.__current * self.__window,
+                rollupIds.ravel(),
+                np.concatenate([results[stat] for stat in self.__stats]),
+            )
+
+        self.__min.fill(np.nan)
+        self.__max.fill(np.nan)
+        self.__sum.fill(0.0)
+        self.__count.fill(0.0)
+        self.__last.fill(np.nan)
+        self.__current = None
@@ -0,0 +1,385 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Columnar sample buffer
+
+Caches samples collected in usermode between pushes to VictoriaMetrics.
+Instead of storing a formatted text line per series and sample, every series
+is identified by an integer id mapped to its text prefix (metric name and
+labels), which is stored once. Samples are appended as rows to a chunk made of
+a shared timestamp array and a two-dimensional value array (one column per
+series). Full chunks are sealed and compressed:
+
+  * timestamps are stored as delta-of-delta values, which are all zero for a
+    regular sampling cadence
+  * values are XOR'ed with the previous sample of the same series, which
+    yields zero bits for unchanged or slowly changing values
+
+Both encodings are then compressed with zlib. Text lines are rendered only at
+push time, so memory use depends on the number of series and how often their
+values change, rather than on the sampling rate.
+
+Optionally, chunks are filtered before sealing to record changes only: a
+sample repeating the previous value of its series is dropped, unless it is
+the first sample in a new heartbeat window. The last sample before a change
+(closing point) and the last sample before shutdown are always kept, so the
+original step function can be reconstructed from the remaining samples.
+"""
+
+import zlib
+
+import numpy as np
+
+CHUNK_SAMPLES = 512
+COMPRESSION_LEVEL = 1
+
+
+class SealedChunk:
+    """Compressed, immutable chunk of samples"""
+
+    __slots__ = ("numSamples", "numSeries", "timestamps", "values")
+
+    def __init__(self, timestamps, values):
+        self.numSamples, self.numSeries = values.shape
+
+        # timestamps: first value, first delta, and delta-of-deltas
+        header = timestamps[:2].copy()
+        if len(timestamps) > 1:
+            header[1] = timestamps[1] - timestamps[0]
+        deltas = np.diff(timestamps, n=2) if len(timestamps) > 2 else np.empty(0, dtype=np.int64)
+        self.timestamps = zlib.compress(header.tobytes() + deltas.tobytes(), COMPRESSION_LEVEL)
+
+        # values: XOR with previous sample of each series, stored column by column
+        bits = values.view(np.uint64)
+        xored = bits.copy()
+        xored[1:] ^= bits[:-1]
+        self.values = zlib.compress(np.ascontiguousarray(xored.T).tobytes(), COMPRESSION_LEVEL)
+
+    def decode(self):
+        """Decompress chunk
+
+        Returns:
+            tuple: timestamps (int64 array) and values (float64 array, one row per sample)
+        """
+        encoded = np.frombuffer(zlib.decompress(self.timestamps), dtype=np.int64)
+        timestamps = np.empty(self.numSamples, dtype=np.int64)
+        timestamps[: len(encoded[:2])] = encoded[:2]
+        if self.numSamples > 1:
+            deltas = np.concatenate((encoded[1:2], encoded[1:2] + np.cumsum(encoded[2:])))
+            timestamps[1:] = encoded[0] + np.cumsum(deltas)
+
+        xored = np.frombuffer(zlib.decompress(self.values), dtype=np.uint64)
+        xored = xored.reshape(self.numSeries, self.numSamples).T
+        values = np.bitwise_xor.accumulate(xored, axis=0).view(np.float64)
+        return timestamps, values
+
+    @property
+    def nbytes(self):
+        return len(self.timestamps) + len(self.values)
+
+
+class ChangeFilter:
+    """Drops samples that repeat the previous value of their series"""
+
+    def __init__(self, heartbeat_millisecs):
+        """
+        Args:
+            heartbeat_millisecs (int): a sample is kept in every heartbeat window even if unchanged
+        """
+        self.__heartbeat = heartbeat_millisecs
+        # per-series state carried across chunks
+        self.__lastValues = np.empty(0)  # last sampled value (NaN if never sampled)
+        self.__lastWindows = np.empty(0, dtype=np.int64)  # heartbeat window of last sample
+        self.__pending = np.empty(0, dtype=np.int64)  # timestamp of last sample if dropped, else -1
+
+    def __resize(self, numSeries):
+        extra = numSeries - len(self.__lastValues)
+        if extra > 0:
+            self.__lastValues = np.concatenate((self.__lastValues, np.full(extra, np.nan)))
+            self.__lastWindows = np.concatenate((self.__lastWindows, np.full(extra, -1, dtype=np.int64)))
+            self.__pending = np.concatenate((self.__pending, np.full(extra, -1, dtype=np.int64)))
+
+    def apply(self, timestamps, values, final=False):
+        """Filter a chunk of samples
+
+        The last sample of each series in the chunk can only be dropped once the next sample is
+        known; it is carried over and, if needed as a closing point, emitted in front of the next
+        chunk.
+
+        Args:
+            timestamps (array): sample timestamps (int64)
+            values (array): sampled values, one row per sample (NaN if not sampled)
+            final (bool, optional): no samples follow this chunk; keep the last sample of every series
+
+        Returns:
+            tuple: filtered timestamps and values (rows without any kept samples are removed)
+        """
+        numSamples, numSeries = values.shape
+        self.__resize(numSeries)
+        lastValues = self.__lastValues[:numSeries]
+        lastWindows = self.__lastWindows[:numSeries]
+        pending = self.__pending[:numSeries].copy()
+
+        if numSamples == 0:
+            closing = (pending >= 0) & final
+            self.__pending[:numSeries] = np.where(closing, -1, pending)
+            return self.__addClosing(timestamps, values, closing, pending, lastValues)
+
+        sampled = ~np.isnan(values)
+        rows = np.arange(numSamples)[:, None]
+        windows = (timestamps // self.__heartbeat)[:, None]
+
+        # previous and next sampled value of each series (forward and backward fill)
+        prevRows = np.maximum.accumulate(np.where(sampled, rows, -1), axis=0)
+        prevRows = np.vstack((np.full((1, numSeries), -1), prevRows[:-1]))
+        columns = np.arange(numSeries)
+        prevValues = np.where(prevRows >= 0, values[prevRows, columns], lastValues)
+        prevWindows = np.where(prevRows >= 0, windows[prevRows, 0], lastWindows)
+        nextRows = np.minimum.accumulate(np.where(sampled, rows, numSamples)[::-1], axis=0)[::-1]
+        nextRows = np.vstack((nextRows[1:], np.full((1, numSeries), numSamples)))
+        last = nextRows == numSamples
+        nextValues = np.where(last, np.nan if final else values, values[np.minimum(nextRows, numSamples - 1), columns])
+
+        with np.errstate(invalid="ignore"):
+            keep = sampled & ((values != prevValues) | (values != nextValues) | (windows != prevWindows))
+
+        # closing points carried over from the previous chunk
+        firstRows = np.argmax(sampled, axis=0)
+        anySampled = sampled.any(axis=0)
+        firstValues = values[firstRows, columns]
+        closing = (pending >= 0) & np.where(anySampled, firstValues != lastValues, final)
+
+        # carry state for the next chunk
+        lastRows = numSamples - 1 - np.argmax(sampled[::-1], axis=0)
+        lastRowKept = keep[lastRows, columns]
+        self.__pending[:numSeries] = np.where(
+            anySampled, np.where(lastRowKept, -1, timestamps[lastRows]), np.where(closing, -1, pending)
+        )
+        closingValues = lastValues.copy()
+        self.__lastValues[:numSeries] = np.where(anySampled, values[lastRows, columns], lastValues)
+        self.__lastWindows[:numSeries] = np.where(anySampled, windows[lastRows, 0], lastWindows)
+
+        filtered = np.where(keep, values, np.nan)
+        keptRows = keep.any(axis=1)
+        return self.__addClosing(timestamps[keptRows], filtered[keptRows], closing, pending, closingValues)
+
+    def __addClosing(self, timestamps, values, closing, pending, closingValues):
+        """Prepend rows with closing points carried over from the previous chunk"""
+        if not closing.any():
+            return timestamps, values
+        closingTimestamps = np.unique(pending[closing])
+        extra = np.full((len(closingTimestamps), values.shape[1]), np.nan)
+        for i, timestamp in enumerate(closingTimestamps):
+            series = closing & (pending == timestamp)
+            extra[i, series] = closingValues[series]
+        return np.concatenate((closingTimestamps, timestamps)), np.vstack((extra, values))
+
+
+class SampleBatch:
+    """Samples drained from a SampleBuffer, rendered to text lines on demand"""
+
+    def __init__(self, keys, chunks, lines, numPoints):
+        self.__keys = keys
+        self.__chunks = chunks
+        self.__lines = lines
+        self.numPoints = numPoints
+
+    def __len__(self):
+        return self.numPoints + len(self.__lines)
+
+    @property
+    def keys(self):
+        return self.__keys
+
+    @property
+    def formattedLines(self):
+        """Pre-formatted lines appended to the buffer (e.g. figure of merit data)"""
+        return self.__lines
+
+    def chunks(self):
+        """Generate decoded chunks as (timestamps, values) tuples"""
+        for chunk in self.__chunks:
+            if isinstance(chunk, SealedChunk):
+                yield chunk.decode()
+            else:
+                yield chunk
+
+    def downsample(self, factor=2):
+        """Return a new batch keeping one out of every factor samples. Pre-formatted lines are kept."""
+        chunks = []
+        numPoints = 0
+        offset = 0
+        for timestamps, values in self.chunks():
+            # keep a regular stride across chunk boundaries
+            start = -offset % factor
+            offset += len(timestamps)
+            timestamps = timestamps[start::factor]
+            values = values[start::factor]
+            if len(timestamps) == 0:
+                continue
+            chunks.append(SealedChunk(timestamps, values))
+            numPoints += int(np.count_nonzero(~np.isnan(values)))
+        return SampleBatch(self.__keys, chunks, self.__lines, numPoints)
+
+    @classmethod
+    def merge(cls, batches):
+        """Merge batches drained from the same SampleBuffer into a single batch"""
+        keys = max((batch.keys for batch in batches), key=len)
+        chunks = []
+        lines = []
+        for batch in batches:
+            chunks.extend(batch.__chunks)
+            lines.extend(batch.__lines)
+        return cls(keys, chunks, lines, sum(batch.numPoints for batch in batches))
+
+    def lines(self):
+        """Generate lines in Prometheus text format with timestamps, one per sample and series"""
+        keys = self.__keys
+        for timestamps, values in self.chunks():
+            # row-major traversal keeps samples ordered by timestamp
+            rows, columns = np.nonzero(~np.isnan(values))
+            timestamps = timestamps.tolist()
+            for row, column, value in zip(rows.tolist(), columns.tolist(), values[rows, columns].tolist()):
+                yield "%s%s %i" % (keys[column], value, timestamps[row])
+        yield from self.__lines
+
+
+class SampleBuffer:
+    def __init__(self, chunkSamples=CHUNK_SAMPLES, heartbeat_millisecs=None):
+        """
+        Args:
+            chunkSamples (int, optional): number of samples per chunk. Defaults to CHUNK_SAMPLES.
+            heartbeat_millisecs (int, optional): record changes only, keeping at least one sample
+                per series in every heartbeat window. Defaults to None (record all samples).
+        """
+        self.__chunkSamples = chunkSamples
+        self.__filter = ChangeFilter(heartbeat_millisecs) if heartbeat_millisecs else None
+        self.__keys = []  # series id -> text prefix (e.g. 'rocm_utilization_percentage{card="0"} ')
+        self.__index = {}  # text prefix -> series id
+        self.__sealed = []
+        self.__lines = []
+        self.__numPoints = 0
+        self.__newChunk(16)
+
+    def __len__(self):
+        """Number of buffered data points"""
+        return self.__numPoints + len(self.__lines)
+
+    def __newChunk(self, numSeries):
+        self.__timestamps = np.empty(self.__chunkSamples, dtype=np.int64)
+        self.__values = np.full((self.__chunkSamples, numSeries), np.nan)
+        self.__numSamples = 0
+
+    def seriesId(self, key):
+        """Return the id of a series, registering it if necessary
+
+        Args:
+            key (str): series prefix in text format, including trailing space (e.g. 'name{labels} ')
+        """
+        seriesId = self.__index.get(key)
+        if seriesId is None:
+            seriesId = len(self.__keys)
+            self.__keys.append(key)
+            self.__index[key] = seriesId
+        return seriesId
+
+    def append(self, timestamp_millisecs, seriesIds, values):
+        """Append a new sample
+
+        Args:
+            timestamp_millisecs (int): sample timestamp
+            seriesIds (array): series ids of the sampled values
+            values (array): sampled values; NaN values are ignored
+        """
+        numSeries = len(self.__keys)
+        if numSeries > self.__values.shape[1]:
+            grown = np.full((self.__chunkSamples, max(numSeries, 2 * self.__values.shape[1])), np.nan)
+            grown[:, : self.__values.shape[1]] = self.__values
+            self.__values = grown
+
+        row = self.__numSamples
+        self.__timestamps[row] = timestamp_millisecs
+        self.__values[row, seriesIds] = values
+        self.__numSamples += 1
+        self.__numPoints += int(np.count_nonzero(~np.isnan(self.__values[row, seriesIds])))
+
+        if self.__numSamples == self.__chunkSamples:
+            self.seal()
+
+    def appendLine(self, line):
+        """Append a pre-formatted line (e.g. figure of merit data)"""
+        self.__lines.append(line)
+
+    def __current(self, final=False):
+        """Return the current chunk as (timestamps, values), filtered when recording changes only"""
+        numSamples = self.__numSamples
+        timestamps = self.__timestamps[:numSamples]
+        values = self.__values[:numSamples, : len(self.__keys)]
+        if self.__filter:
+            numPoints = np.count_nonzero(~np.isnan(values))
+            timestamps, values = self.__filter.apply(timestamps, values, final)
+            self.__numPoints += int(np.count_nonzero(~np.isnan(values))) - numPoints
+        return timestamps, values
+
+    def seal(self):
+        """Compress the current chunk"""
+        if self.__numSamples == 0:
+            return
+        timestamps, values = self.__current()
+        if len(timestamps) > 0:
+            self.__sealed.append(SealedChunk(timestamps, values))
+        self.__newChunk(self.__values.shape[1])
+
+    def drain(self, final=False):
+        """Remove and return all buffered samples
+
+        Args:
+            final (bool, optional): no further samples will be appended. When recording changes
+                only, the latest sample of every series is included. Defaults to False.
+
+        Returns:
+            SampleBatch: buffered samples, rendered to text when iterated
+        """
+        chunks = self.__sealed
+        if self.__numSamples > 0 or (final and self.__filter):
+            timestamps, values = self.__current(final)
+            if len(timestamps) > 0:
+                chunks.append((timestamps, values))
+            self.__newChunk(self.__values.shape[1])
+
+        batch = SampleBatch(list(self.__keys), chunks, self.__lines, self.__numPoints)
+        self.__sealed = []
+        self.__lines = []
+        self.__numPoints = 0
+        return batch
+
+    @property
+    def nbytes(self):
+        """Approximate memory used by buffered samples (bytes)"""
+        return (
+            sum(chunk.nbytes for chunk in self.__sealed)
+            + self.__timestamps.nbytes
+            + self.__values.nbytes
+            + sum(len(line) for line in self.__lines)
+        )
@@ -0,0 +1,217 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Multi-rate collector scheduling
+
+Implements a hashed timer wheel used by the Monitor class to run collectors
+at different sampling intervals. Time is divided into ticks of a fixed
+resolution, and every scheduled entry lives in the slot matching its next due
+tick. Advancing the wheel only visits the slots for ticks that elapsed since
+the previous call, so the cost of a sampling request is independent of the
+number of entries that are not yet due.
+
+Also implements the sampling clock used in usermode: instead of sleeping for
+a relative interval after every sample, which accumulates collection time and
+drifts from node to node, the clock sleeps until absolute deadlines aligned to
+multiples of the sampling interval in wall-clock time. Nodes with synchronized
+clocks therefore sample on the same time grid.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import math
+import time
+
+CLOCK_REALTIME = 0
+TIMER_ABSTIME = 1
+EINTR = 4
+
+
+def tickResolution(intervals):
+    """Return the longest tick that divides all intervals, so every entry of a timer wheel
+    fires at its exact period (e.g. 1 sec for intervals of 2 and 3 secs)
+
+    Intervals are rounded to milliseconds.
+
+    Args:
+        intervals (iterable): sampling intervals (secs)
+    """
+    return math.gcd(*[max(1, round(interval * 1000)) for interval in intervals]) / 1000
+
+
+class TimerWheel:
+    def __init__(self, resolution, numSlots=256):
+        """
+        Args:
+            resolution (float): duration of a single tick (secs)
+            numSlots (int, optional): number of slots in the wheel. Defaults to 256.
+        """
+        if resolution <= 0:
+            raise ValueError("timer wheel resolution must be positive (%s)" % resolution)
+        self.__resolution = resolution
+        self.__numSlots = numSlots
+        self.__slots = [[] for _ in range(numSlots)]
+        self.__periods = {}
+        self.__lastTick = None
+
+    def toTick(self, timestamp):
+        return math.floor(timestamp / self.__resolution)
+
+    def add(self, key, period, start):
+        """Schedule a new entry to fire every period secs, with the first occurrence after start.
+
+        Args:
+            key (str): entry identifier returned by advance() when due
+            period (float): interval between occurrences (secs)
+            start (float): reference timestamp for the first occurrence (secs)
+        """
+        ticks = max(1, round(period / self.__resolution))
+        if not math.isclose(ticks * self.__resolution, period):
+            logging.warning(
+                "[WARN]: timer wheel period %s is not a multiple of the resolution %s - firing every %s secs"
+                % (period, self.__resolution, ticks * self.__resolution)
+            )
+        self.__periods[key] = ticks
+        startTick = self.toTick(start)
+        if self.__lastTick is None:
+            self.__lastTick = startTick
+        self.__insert(key, startTick + ticks)
+
+    def __insert(self, key, dueTick):
+        self.__slots[dueTick % self.__numSlots].append((dueTick, key))
+
+    def advance(self, now):
+        """Advance the wheel and return the keys of all entries due at or before now.
+
+        Entries that missed more than one occurrence (e.g. after a long stall) fire only once and
+        are rescheduled on their original cadence.
+
+        Args:
+            now (float): current timestamp (secs)
+
+        Returns:
+            list: keys of entries that are due
+        """
+        targetTick = self.toTick(now)
+        if self.__lastTick is None:
+            self.__lastTick = targetTick
+            return []
+        if targetTick <= self.__lastTick:
+            return []
+
+        due = []
+        numTicks = min(targetTick - self.__lastTick, self.__numSlots)
+        for tick in range(targetTick - numTicks + 1, targetTick + 1):
+            slot = self.__slots[tick % self.__numSlots]
+            if not slot:
+                continue
+            pending = []
+            for dueTick, key in slot:
+                if dueTick <= targetTick:
+                    due.append((dueTick, key))
+                else:
+                    pending.append((dueTick, key))
+            slot[:] = pending
+
+        self.__lastTick = targetTick
+
+        due.sort()
+        for dueTick, key in due:
+            period = self.__periods[key]
+            nextTick = dueTick + period * ((targetTick - dueTick) // period + 1)
+            self.__insert(key, nextTick)
+
+        return [key for _, key in due]
+
+
+class timespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+
+def loadClockNanosleep():
+    """Return libc's clock_nanosleep(), or None if it is not available"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        clockNanosleep = libc.clock_nanosleep
+    except (OSError, AttributeError):
+        return None
+    clockNanosleep.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.POINTER(timespec), ctypes.POINTER(timespec)]
+    clockNanosleep.restype = ctypes.c_int
+    return clockNanosleep
+
+
+class SamplingClock:
+    def __init__(self, interval):
+        """
+        Args:
+            interval (float): sampling interval (secs)
+        """
+        if interval <= 0:
+            raise ValueError("sampling interval must be positive (%s)" % interval)
+        self.__interval = round(interval * 1e9)
+        self.__next = None
+        self.__clockNanosleep = loadClockNanosleep()
+        if self.__clockNanosleep is None:
+            logging.warning("[WARN]: clock_nanosleep() unavailable, sampling deadlines use time.sleep()")
+        self.deadline = None
+        self.overruns = 0
+
+    def wait(self):
+        """Sleep until the next deadline on the sampling grid.
+
+        Deadlines are multiples of the interval since the epoch. Deadlines that already passed
+        when wait() is called (i.e. the previous sample took longer than the interval) are
+        skipped and counted as overruns; sampling resumes at the next deadline in the future.
+
+        Returns:
+            float: deadline that was waited for (secs since the epoch)
+        """
+        now = time.time_ns()
+        if self.__next is None:
+            self.__next = (now // self.__interval + 1) * self.__interval
+        elif now >= self.__next:
+            missed = (now - self.__next) // self.__interval + 1
+            self.overruns += missed
+            self.__next += missed * self.__interval
+
+        self.sleepUntil(self.__next)
+        self.deadline = self.__next / 1e9
+        self.__next += self.__interval
+        return self.deadline
+
+    def sleepUntil(self, deadline):
+        """Sleep until an absolute wall-clock time
+
+        Args:
+            deadline (int): wake up time (nanosecs since the epoch)
+        """
+        if self.__clockNanosleep is None:
+            time.sleep(max(0, deadline - time.time_ns()) / 1e9)
+            return
+
+        request = timespec(deadline // 1000000000, deadline % 1000000000)
+        # absolute sleeps are restarted as-is after a signal
+        while self.__clockNanosleep(CLOCK_REALTIME, TIMER_ABSTIME, ctypes.byref(request), None) == EINTR:
+            pass
@@ -0,0 +1,101 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+
+"""Exporter self-telemetry
+
+Implements prometheus metrics describing the cost of running Omnistat itself,
+so exporter overhead can be tracked alongside application behavior. All
+metrics use an "omnistat_self" prefix:
+
+omnistat_self_collector_duration_seconds_bucket{collector="rocm_smi",le="0.005"} 120.0
+omnistat_self_serialization_seconds 0.0004
+omnistat_self_push_duration_seconds 0.21
+omnistat_self_push_payload_bytes 1.2582912e+07
+omnistat_self_buffer_samples 36000.0
+omnistat_self_sampling_overruns 0.0
+omnistat_self_resident_memory_bytes 7.4907648e+07
+omnistat_self_cpu_seconds 12.4
+"""
+
+import logging
+import os
+
+from prometheus_client import Gauge, Histogram
+
+# Collector durations range from tens of microseconds (sysfs reads) to seconds
+# (squeue queries).
+DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class SelfTelemetry:
+    def __init__(self):
+        self.__prefix = "omnistat_self_"
+        self.__pageSize = os.sysconf("SC_PAGE_SIZE")
+
+        self.__collectorDuration = Histogram(
+            self.__prefix + "collector_duration_seconds",
+            "Time spent updating metrics per collector (secs)",
+            labelnames=["collector"],
+            buckets=DURATION_BUCKETS,
+        )
+        self.__serialization = Gauge(
+            self.__prefix + "serialization_seconds", "Time spent serializing the latest sample (secs)"
+        )
+        self.__pushDuration = Gauge(self.__prefix + "push_duration_seconds", "Duration of the latest data push (secs)")
+        self.__pushBytes = Gauge(self.__prefix + "push_payload_bytes", "Payload size of the latest data push (B)")
+        self.__bufferDepth = Gauge(self.__prefix + "buffer_samples", "Number of cached entries waiting to be pushed")
+        self.__overruns = Gauge(
+            self.__prefix + "sampling_overruns", "Number of sampling deadlines skipped after a slow sample"
+        )
+        self.__rss = Gauge(self.__prefix + "resident_memory_bytes", "Exporter resident memory (B)")
+        self.__cpu = Gauge(self.__prefix + "cpu_seconds", "Exporter user and system CPU time (secs)")
+
+        logging.info("--> [registered] %s* self-telemetry metrics" % self.__prefix)
+
+    def observeCollector(self, name, duration):
+        self.__collectorDuration.labels(collector=name).observe(duration)
+
+    def observeSerialization(self, duration):
+        self.__serialization.set(duration)
+
+    def observePush(self, duration, numBytes):
+        self.__pushDuration.set(duration)
+        self.__pushBytes.set(numBytes)
+
+    def setBufferDepth(self, depth):
+        self.__bufferDepth.set(depth)
+
+    def setSamplingOverruns(self, count):
+        self.__overruns.set(count)
+
+    def updateProcessMetrics(self):
+        """Refresh resident memory and CPU time of the exporter process"""
+        try:
+            with open("/proc/self/statm", "r") as f:
+                self.__rss.set(int(f.read().split()[1]) * self.__pageSize)
+        except (OSError, IndexError, ValueError):
+            pass
+        times = os.times()
+        self.__cpu.set(times.user + times.system)
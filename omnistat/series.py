@@ -0,0 +1,207 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Array-backed series table
+
+Implements a lightweight alternative to prometheus_client gauges for collectors
+that publish a fixed set of time series at high sampling rates. Each series (a
+metric name plus a fixed set of label values) is reserved once during
+registerMetrics() and identified by an integer index into a shared numpy value
+array. Collectors then write new samples directly into that array, and both
+the Prometheus text exposition and the VictoriaMetrics push are rendered from
+label strings that are built only once, at registration time.
+
+Example usage from a collector:
+
+    family = SeriesGauge("rocm_utilization_percentage", "GPU use (%)", labelnames=["card"])
+    seriesId = family.series(card=0)
+    ...
+    values[seriesId] = 42.0
+
+Series that have not received a value yet hold NaN and are omitted from all
+rendered output, mirroring unset prometheus_client labels.
+"""
+
+import threading
+
+import numpy as np
+from prometheus_client.utils import floatToGoString
+
+
+def escapeLabelValue(value):
+    """Escape a label value following the Prometheus text exposition format"""
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+class SeriesTable:
+    def __init__(self, capacity=256):
+        """
+        Args:
+            capacity (int, optional): initial number of preallocated series. Defaults to 256.
+        """
+        self.values = np.full(max(1, capacity), np.nan)
+        self.__lock = threading.Lock()
+        self.__numSeries = 0
+        self.__families = {}  # metric name -> (documentation, labelnames, [series ids])
+        self.__names = []  # series id -> metric name
+        self.__labels = []  # series id -> pre-rendered label pairs (e.g. 'card="0",location="edge"')
+        self.__importPrefixes = {}  # default labels -> per-series prefixes for VictoriaMetrics lines
+
+    def __len__(self):
+        return self.__numSeries
+
+    def addFamily(self, name, documentation, labelnames=()):
+        """Register a new gauge family. Raises ValueError if the name is already in use."""
+        with self.__lock:
+            if name in self.__families:
+                raise ValueError("Duplicated series family: %s" % name)
+            self.__families[name] = (documentation, tuple(labelnames), [])
+
+    def addSeries(self, name, labels):
+        """Reserve a new series for a registered family.
+
+        Args:
+            name (str): metric family name
+            labels (dict): label values, one per label name of the family
+
+        Returns:
+            int: series id used to index the value array
+        """
+        with self.__lock:
+            _, labelnames, ids = self.__families[name]
+            if set(labels) != set(labelnames):
+                raise ValueError("Incorrect label names for %s: %s" % (name, sorted(labels)))
+
+            seriesId = self.__numSeries
+            if seriesId == len(self.values):
+                grown = np.full(2 * len(self.values), np.nan)
+                grown[:seriesId] = self.values
+                self.values = grown
+
+            self.__numSeries += 1
+            self.__names.append(name)
+            self.__labels.append(",".join('%s="%s"' % (key, escapeLabelValue(labels[key])) for key in labelnames))
+            ids.append(seriesId)
+            self.__importPrefixes.clear()
+            return seriesId
+
+    def families(self):
+        """Return the names of all registered families"""
+        return list(self.__families)
+
+    def seriesNames(self):
+        """Return the metric name of every series, indexed by series id"""
+        return list(self.__names)
+
+    def seriesKeys(self):
+        """Return the name and labels of every series in exposition format (e.g. 'name{card="0"}')"""
+        return ["%s{%s}" % (name, labels) if labels else name for name, labels in zip(self.__names, self.__labels)]
+
+    def exposition(self):
+        """Render all series in the Prometheus text exposition format
+
+        Returns:
+            bytes: encoded exposition, empty if no families are registered
+        """
+        values = self.values[: self.__numSeries].tolist()
+        lines = []
+        for name, (documentation, _, ids) in self.__families.items():
+            lines.append("# HELP %s %s" % (name, documentation.replace("\\", r"\\").replace("\n", r"\n")))
+            lines.append("# TYPE %s gauge" % name)
+            for seriesId in ids:
+                value = values[seriesId]
+                if value != value:
+                    continue
+                labels = self.__labels[seriesId]
+                if labels:
+                    lines.append("%s{%s} %s" % (name, labels, floatToGoString(value)))
+                else:
+                    lines.append("%s %s" % (name, floatToGoString(value)))
+        if not lines:
+            return b""
+        lines.append("")
+        return "\n".join(lines).encode()
+
+    def importPrefixes(self, labelDefaults):
+        """Return the text prefix of every series for VictoriaMetrics import lines (cached)
+
+        Args:
+            labelDefaults (str): pre-rendered labels prepended to every series (e.g. 'instance="node01"')
+
+        Returns:
+            list: one prefix per series id, e.g. 'name{instance="node01",card="0"} '
+        """
+        prefixes = self.__importPrefixes.get(labelDefaults)
+        if prefixes is None:
+            prefixes = []
+            for name, labels in zip(self.__names, self.__labels):
+                labelString = labelDefaults + "," + labels if labels else labelDefaults
+                prefixes.append("%s{%s} " % (name, labelString))
+            self.__importPrefixes[labelDefaults] = prefixes
+        return prefixes
+
+    def importLines(self, labelDefaults, timestamp_millisecs, prefix=None):
+        """Render all series as VictoriaMetrics import lines
+
+        Args:
+            labelDefaults (str): pre-rendered labels prepended to every series (e.g. 'instance="node01"')
+            timestamp_millisecs (int): sample timestamp
+            prefix (str, optional): only include metric names starting with prefix
+
+        Returns:
+            list: one line per series with a value
+        """
+        prefixes = self.importPrefixes(labelDefaults)
+        suffix = " %i" % timestamp_millisecs
+        values = self.values[: self.__numSeries].tolist()
+        if prefix:
+            return [
+                line + str(value) + suffix
+                for name, line, value in zip(self.__names, prefixes, values)
+                if value == value and name.startswith(prefix)
+            ]
+        return [line + str(value) + suffix for line, value in zip(prefixes, values) if value == value]
+
+
+class SeriesGauge:
+    def __init__(self, name, documentation, labelnames=(), table=None):
+        """Gauge family stored in a SeriesTable
+
+        Args:
+            name (str): metric name
+            documentation (str): metric description
+            labelnames (list, optional): label names for series of this family
+            table (SeriesTable, optional): destination table. Defaults to the global SERIES table.
+        """
+        self.__table = SERIES if table is None else table
+        self.__name = name
+        self.__table.addFamily(name, documentation, labelnames)
+
+    def series(self, **labels):
+        """Reserve a series with the given label values and return its id"""
+        return self.__table.addSeries(self.__name, labels)
+
+
+# Default table shared by all collectors, analogous to prometheus_client.REGISTRY
+SERIES = SeriesTable()
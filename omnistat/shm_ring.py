@@ -0,0 +1,251 @@
+# -------------------------------------------------------------------------------
+# MIT License
+#
+# Copyright (c) 2023 - 2025 Advanced Micro Devices, Inc. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# -------------------------------------------------------------------------------
+
+"""Shared-memory ring of live samples
+
+Publishes the latest samples of the series table into a memory-mapped file
+(typically in /dev/shm), so co-located consumers (e.g. applications or
+node-local agents) can read current GPU power or utilization without
+scraping the exporter or querying the GPU driver again. The file has a fixed
+little-endian binary layout:
+
+  header (64 bytes)
+      magic       8s    b"OMNIRING"
+      version     u4    layout version (1)
+      stale       u4    set to 1 when the ring was replaced by a new file
+      numSeries   u4    number of series (values per sample)
+      capacity    u4    number of sample slots
+      keysOffset  u8    offset of the series keys
+      keysSize    u8    size of the series keys
+      dataOffset  u8    offset of the first slot
+      sequence    u8    number of samples written so far
+  series keys       newline-separated series names and labels, in exposition
+                    format (e.g. rocm_average_socket_power_watts{card="0"})
+  slots             capacity x (sequence u8, timestamp f8, values f8[numSeries])
+
+Sample n is stored in slot n % capacity. Each slot is protected by a
+sequence lock: the writer sets its sequence to the odd value 2n+1 before
+updating the slot and to 2n+2 afterwards, so readers can discard slots that
+were modified while being copied. Unavailable values are NaN. When new
+series are registered, a new file replaces the ring and the old one is
+flagged as stale; readers then reopen it.
+"""
+
+import mmap
+import os
+
+import numpy as np
+
+MAGIC = b"OMNIRING"
+VERSION = 1
+
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("version", "<u4"),
+        ("stale", "<u4"),
+        ("numSeries", "<u4"),
+        ("capacity", "<u4"),
+        ("keysOffset", "<u8"),
+        ("keysSize", "<u8"),
+        ("dataOffset", "<u8"),
+        ("sequence", "<u8"),
+    ]
+)
+HEADER_SIZE = 64
+
+
+def slotDtype(numSeries):
+    return np.dtype([("sequence", "<u8"), ("timestamp", "<f8"), ("values", "<f8", (numSeries,))])
+
+
+def mapRing(f, size, access):
+    """Map a ring file, returning the mmap, its header and its slots"""
+    layout = np.frombuffer(
+        os.pread(f.fileno(), HEADER_DTYPE.itemsize, 0).ljust(HEADER_DTYPE.itemsize, b"\0"), HEADER_DTYPE
+    )
+    if layout["magic"][0] != MAGIC or layout["version"][0] != VERSION:
+        raise ValueError("Not an Omnistat shared-memory ring (version %i)" % VERSION)
+    buffer = mmap.mmap(f.fileno(), size, access=access)
+    header = np.frombuffer(buffer, dtype=HEADER_DTYPE, count=1)
+    numSeries = int(header["numSeries"][0])
+    capacity = int(header["capacity"][0])
+    keysOffset = int(header["keysOffset"][0])
+    keys = bytes(buffer[keysOffset : keysOffset + int(header["keysSize"][0])]).decode()
+    slots = np.frombuffer(buffer, dtype=slotDtype(numSeries), count=capacity, offset=int(header["dataOffset"][0]))
+    return buffer, header, keys.split("\n") if keys else [], slots
+
+
+def closeMap(buffer):
+    try:
+        buffer.close()
+    except BufferError:
+        # views handed out to callers are still alive; the mapping is released with them
+        pass
+
+
+class RingWriter:
+    def __init__(self, path, capacity=1024):
+        """
+        Args:
+            path (str): ring file (e.g. /dev/shm/omnistat_metrics)
+            capacity (int, optional): number of samples kept. Defaults to 1024.
+        """
+        if capacity < 1:
+            raise ValueError("Ring capacity must be >= 1 (%s)" % capacity)
+        self.__path = path
+        self.__capacity = capacity
+        self.__keys = None
+        self.__buffer = None
+        self.__header = None
+        self.__slots = None
+        self.__sequence = 0
+
+    def create(self, keys):
+        """Create a new ring for the given series, replacing the current one"""
+        encodedKeys = "\n".join(keys).encode()
+        dataOffset = (HEADER_SIZE + len(encodedKeys) + 7) // 8 * 8
+        size = dataOffset + self.__capacity * slotDtype(len(keys)).itemsize
+
+        header = np.zeros(1, dtype=HEADER_DTYPE)
+        header["magic"] = MAGIC
+        header["version"] = VERSION
+        header["numSeries"] = len(keys)
+        header["capacity"] = self.__capacity
+        header["keysOffset"] = HEADER_SIZE
+        header["keysSize"] = len(encodedKeys)
+        header["dataOffset"] = dataOffset
+
+        # write the new ring next to the current one and swap it in atomically
+        partial = "%s.%i.partial" % (self.__path, os.getpid())
+        with open(partial, "w+b") as f:
+            f.truncate(size)
+            f.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+            f.write(encodedKeys)
+            f.flush()
+            buffer, header, _, slots = mapRing(f, size, mmap.ACCESS_WRITE)
+        os.chmod(partial, 0o644)
+        os.rename(partial, self.__path)
+
+        self.close(stale=True)
+        self.__keys = list(keys)
+        self.__buffer = buffer
+        self.__header = header
+        self.__slots = slots
+        self.__sequence = 0
+
+    @property
+    def numSeries(self):
+        """Number of series in the current ring, or None before the ring is created"""
+        return None if self.__keys is None else len(self.__keys)
+
+    def publish(self, timestamp, values):
+        """Write a new sample
+
+        Args:
+            timestamp (float): sample time (secs since the epoch)
+            values (array): one value per series key, in the order given to create()
+        """
+        n = self.__sequence
+        slot = self.__slots[n % self.__capacity : n % self.__capacity + 1]
+        slot["sequence"] = 2 * n + 1
+        slot["timestamp"] = timestamp
+        slot["values"] = values
+        slot["sequence"] = 2 * n + 2
+        self.__sequence = n + 1
+        self.__header["sequence"] = self.__sequence
+
+    def close(self, stale=False):
+        """Unmap the ring, optionally flagging it as replaced for readers"""
+        if self.__buffer is None:
+            return
+        if stale:
+            self.__header["stale"] = 1
+        self.__header = None
+        self.__slots = None
+        closeMap(self.__buffer)
+        self.__buffer = None
+
+    def remove(self):
+        """Unmap the ring and remove its file"""
+        self.close(stale=True)
+        try:
+            os.remove(self.__path)
+        except FileNotFoundError:
+            pass
+
+
+class RingReader:
+    def __init__(self, path):
+        """
+        Args:
+            path (str): ring file written by an Omnistat exporter (e.g. /dev/shm/omnistat_metrics)
+        """
+        self.__path = path
+        self.__buffer = None
+        self.open()
+
+    def open(self):
+        if self.__buffer is not None:
+            self.close()
+        with open(self.__path, "rb") as f:
+            self.__buffer, self.__header, self.keys, self.__slots = mapRing(
+                f, os.fstat(f.fileno()).st_size, mmap.ACCESS_READ
+            )
+        self.__index = {key: i for i, key in enumerate(self.keys)}
+        self.__capacity = len(self.__slots)
+
+    def close(self):
+        self.__header = None
+        self.__slots = None
+        closeMap(self.__buffer)
+        self.__buffer = None
+
+    def index(self, key):
+        """Return the column of a series in the values returned by latest() (e.g. 'name{card="0"}')"""
+        return self.__index[key]
+
+    @property
+    def slots(self):
+        """Zero-copy view of all slots (sequence, timestamp and values); may change while being read"""
+        return self.__slots
+
+    def latest(self, n=1):
+        """Return a consistent copy of the latest n samples, oldest first
+
+        Slots overwritten while being copied are omitted, so fewer than n samples may be returned.
+
+        Returns:
+            tuple: timestamps (array) and values (array with one row per sample, one column per series)
+        """
+        if self.__header["stale"][0]:
+            self.open()
+        sequence = int(self.__header["sequence"][0])
+        first = max(sequence - min(n, self.__capacity), 0)
+        numbers = np.arange(first, sequence, dtype=np.uint64)
+        slots = self.__slots[numbers % self.__capacity].copy()
+        # after the copy: discard slots rewritten in the meantime
+        expected = 2 * numbers + 2
+        valid = (slots["sequence"] == expected) & (self.__slots["sequence"][numbers % self.__capacity] == expected)
+        return slots["timestamp"][valid], slots["values"][valid]
@@ -25,11 +25,13 @@
 #
 # Standalone data collector for HPC systems.
 # --> intended for user-mode data collection to run within a job
-# --> provides a flask endpoint to terminate data collection (http://host:port/shutdown)
+# --> provides a control endpoint to terminate data collection (http://host:port/shutdown)
 
 import argparse
-import ctypes
+import email.utils
+import json
 import logging
+import math
 import os
 import platform
 import pwd
@@ -38,16 +40,23 @@ import sys
 import threading
 import time
 import warnings
+import zlib
 from datetime import datetime, timezone
 
+import numpy as np
 import requests
-from flask import Flask, abort, jsonify, request
 from prometheus_client import REGISTRY, Gauge
 
-from omnistat import utils
+from omnistat import capture, utils
+from omnistat.control_server import ControlServer
 from omnistat.monitor import Monitor
+from omnistat.push_sender import POLICIES, RETRY_DELAY_MIN, SPILL, PushError, PushSender
+from omnistat.relay import Relay, RelayBatch
+from omnistat.rollup import STATS, Rollup
+from omnistat.sample_buffer import SampleBuffer
+from omnistat.scheduler import SamplingClock
+from omnistat.series import SERIES, escapeLabelValue
 
-app = Flask(__name__)
 terminateFlagEvent = threading.Event()
 dataDeliveredEvent = threading.Event()
 
@@ -55,15 +64,143 @@ fomData = []
 fomLock = threading.Lock()
 
 
-def push_to_victoria_metrics(metrics_data_list, victoria_url):
+PUSH_CHUNK_BYTES = 256 * 1024
+PUSH_GZIP_LEVEL = 6
+
+# maximum time a shutdown request waits for the final data push (secs)
+SHUTDOWN_TIMEOUT_SECS = 60.0
+
+
+def gzip_lines(lines, stats):
+    """Generate a gzip-compressed stream from text lines
+
+    Lines are encoded and compressed in chunks of about PUSH_CHUNK_BYTES, so the
+    uncompressed body is never materialized in full.
+
+    Args:
+        lines (iterable): lines in prometheus text format
+        stats (dict): updated with the number of "raw" and "compressed" bytes generated
+    """
+    compressor = zlib.compressobj(PUSH_GZIP_LEVEL, zlib.DEFLATED, 31)
+    pending = []
+    size = 0
+    for line in lines:
+        pending.append(line)
+        size += len(line) + 1
+        if size >= PUSH_CHUNK_BYTES:
+            data = ("\n".join(pending) + "\n").encode()
+            stats["raw"] += len(data)
+            compressed = compressor.compress(data)
+            pending = []
+            size = 0
+            if compressed:
+                stats["compressed"] += len(compressed)
+                yield compressed
+
+    if pending:
+        data = ("\n".join(pending) + "\n").encode()
+        stats["raw"] += len(data)
+        compressed = compressor.compress(data)
+        if compressed:
+            stats["compressed"] += len(compressed)
+            yield compressed
+
+    compressed = compressor.flush()
+    stats["compressed"] += len(compressed)
+    yield compressed
+
+
+def new_session():
+    """Return a pooled HTTP session for communication with VictoriaMetrics"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def push_phase(hostname, period_secs):
+    """Offset of a host's pushes within the push period, derived from its hostname
+
+    Spreads pushes from all hosts in a job uniformly across the push period instead of bursting
+    at the same time.
+
+    Args:
+        hostname (string): host name
+        period_secs (float): push period (secs)
+
+    Returns:
+        float: offset in [0, period_secs) (secs)
+    """
+    return zlib.crc32(hostname.encode()) / 2**32 * period_secs
+
+
+def next_push_time(now, period_secs, offset_secs):
+    """Return the first push time after now, for pushes every period_secs at the given offset (secs)"""
+    return (math.floor((now - offset_secs) / period_secs) + 1) * period_secs + offset_secs
+
+
+def retry_after(response):
+    """Parse the Retry-After header of a response (delay in secs or HTTP date)
+
+    Returns:
+        float: requested delay (secs), or None if missing or invalid
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def push_to_victoria_metrics(metrics_data_list, victoria_url, session=None, bodies=None):
+    """Push cached metrics to a VictoriaMetrics endpoint
+
+    The request body is streamed and gzip-compressed on the fly.
+
+    Args:
+        metrics_data_list (iterable): metrics in prometheus text format (one entry per line)
+        victoria_url (string): base URL of the VictoriaMetrics server
+        session (requests.Session, optional): persistent session used for all requests. A
+            temporary session is used if not provided.
+        bodies (list, optional): gzip-compressed bodies (e.g. merged by a relay), sent as-is
+            instead of metrics_data_list
+
+    Returns:
+        int: number of bytes pushed (compressed), or None if the push failed
+
+    Raises:
+        PushError: if the server is overloaded (429 or 503) and asks to retry later, or if it
+            rejects the data (other 4xx responses), in which case the push is not retried
+    """
+    if session is None:
+        with new_session() as session:
+            return push_to_victoria_metrics(metrics_data_list, victoria_url, session, bodies)
+
     logging.info("Pushing local node telemetry to VictoriaMetrics endpoint -> %s" % victoria_url)
     headers = {
         "Content-Type": "text/plain",
+        "Content-Encoding": "gzip",
     }
 
-    metrics_data = "\n".join(metrics_data_list)
+    stats = {"raw": 0, "compressed": 0}
+    if bodies is None:
+        data = gzip_lines(metrics_data_list, stats)
+    else:
+        # gzip members can be concatenated: the server decompresses them as a single stream
+        data = b"".join(bodies)
+        stats["compressed"] = len(data)
     try:
-        response = requests.post(victoria_url + "/api/v1/import/prometheus", data=metrics_data, headers=headers)
+        response = session.post(victoria_url + "/api/v1/import/prometheus", data=data, headers=headers)
     except requests.ConnectionError:
         logging.error("")
         logging.error(
@@ -76,35 +213,50 @@ def push_to_victoria_metrics(metrics_data_list, victoria_url):
         logging.error(e)
         return
 
-    if response.status_code != 204:
+    if response.status_code in (429, 503):
+        delay = retry_after(response)
+        logging.warning("[WARN]: VictoriaMetrics is overloaded (%i) - deferring push" % response.status_code)
+        raise PushError("VictoriaMetrics overloaded (%i)" % response.status_code, max(delay or 0.0, RETRY_DELAY_MIN))
+    elif 400 <= response.status_code < 500:
+        # the request itself is invalid (e.g. malformed or too large): retrying would fail again
+        raise PushError(
+            "VictoriaMetrics rejected push (%i): %s" % (response.status_code, response.text), retryable=False
+        )
+    elif response.status_code != 204:
         logging.error("")
         logging.error(f"[FAILED] Unable to push metrics: {response.status_code}, {response.text}")
         return
+    elif bodies is not None:
+        logging.info("Relayed metrics pushed successfully! (%i bytes)" % stats["compressed"])
     else:
-        logging.info("Metrics pushed successfully!")
+        logging.info("Metrics pushed successfully! (%i bytes, %i uncompressed)" % (stats["compressed"], stats["raw"]))
 
     # notify on backfill event
     endpoints = ["/internal/resetRollupResultCache", "/internal/force_flush"]
     for endpoint in endpoints:
         try:
-            response = requests.get(victoria_url + endpoint)
+            response = session.get(victoria_url + endpoint)
             logging.debug("--> Response from victoria endpoint %s = %s" % (endpoint, response.status_code))
         except Exception as e:
             logging.error("")
             logging.error("[FAILED]: Unable to GET Victoria endpoint -> %s" % endpoint)
             logging.error(e)
-            return
+            return stats["compressed"]
 
         if response.status_code != 200:
             logging.warning(f"[WARN] Unexpected return code from VM endpoint: {endpoint} = {response.status_code}")
 
-    return
+    return stats["compressed"]
 
 
 class Standalone:
     def __init__(self, args, config):
         logging.basicConfig(format="%(message)s", level=logging.ERROR, stream=sys.stdout, flush=True)
-        self.__dataVM = []
+        self.__registryIds = {}  # (sample name, labels) -> buffer series id
+        self.__tableIds = {}  # metric prefix filter -> (table series ids, buffer series ids)
+        self.__familyOwners = {}  # metric family name -> owning collector
+        self.__seriesRanges = {}  # collector -> range of owned series table ids
+        self.__readTimes = {}  # collector -> read time of the values last cached
         self.__hostname = platform.node().split(".", 1)[0]
         self.__instanceLabel = 'instance="%s"' % self.__hostname
 
@@ -124,6 +276,7 @@ class Standalone:
         self.__userLabel = 'user="%s"' % pwd.getpwuid(uid).pw_name
 
         self.__victoriaURL = f"http://{args.endpoint}:{args.port}"
+        self.__session = new_session()
 
         self.__fomCheckFrequencySecs = config["omnistat.usermode"].getint("fom_check_frequency_secs", 10)
         if self.__fomCheckFrequencySecs < 5:
@@ -133,20 +286,128 @@ class Standalone:
             )
             sys.exit(1)
 
-        logflask = logging.getLogger("werkzeug")
-        logflask.setLevel(logging.ERROR)
+        # delivery of cached data: bounded queue of pending pushes and policy applied when full
+        self.__pushQueueSize = config["omnistat.usermode"].getint("push_queue_size", 2)
+        if self.__pushQueueSize < 1:
+            logging.error("")
+            logging.error("[ERROR]: Please set push_queue_size >= 1 (%s)" % self.__pushQueueSize)
+            sys.exit(1)
+        self.__pushBackpressure = config["omnistat.usermode"].get("push_backpressure", "drop-oldest")
+        if self.__pushBackpressure not in POLICIES:
+            logging.error("")
+            logging.error(
+                "[ERROR]: Unknown push_backpressure policy (%s), expected one of: %s"
+                % (self.__pushBackpressure, ", ".join(POLICIES))
+            )
+            sys.exit(1)
+        self.__pushSpillDir = config["omnistat.usermode"].get("push_spill_dir", "/tmp")
+        self.__pushSpillMaxMB = config["omnistat.usermode"].getint("push_spill_max_mb", 256)
+        if self.__pushSpillMaxMB < 1:
+            logging.error("")
+            logging.error("[ERROR]: Please set push_spill_max_mb >= 1 (%s)" % self.__pushSpillMaxMB)
+            sys.exit(1)
+
+        # optionally write data to local columnar files instead of pushing to VictoriaMetrics
+        self.__capture = None
+        self.__captureFormat = config["omnistat.usermode"].get("output_format", capture.PARQUET)
+        if args.output_dir:
+            if not capture.available():
+                logging.error("")
+                logging.error("[ERROR]: --output-dir requires the pyarrow package (pip install omnistat[capture])")
+                sys.exit(1)
+            if self.__captureFormat not in capture.FORMATS:
+                logging.error("")
+                logging.error(
+                    "[ERROR]: Unknown output_format (%s), expected one of: %s"
+                    % (self.__captureFormat, ", ".join(capture.FORMATS))
+                )
+                sys.exit(1)
+            try:
+                self.__capture = capture.CaptureWriter(args.output_dir, self.__hostname, self.__captureFormat)
+            except OSError as e:
+                logging.error("")
+                logging.error("[ERROR]: Unable to create output directory (%s): %s" % (args.output_dir, e))
+                sys.exit(1)
+
+        # optionally relay pushes from peers to the upstream endpoint (see omnistat/relay.py)
+        self.__relay = None
+        self.__relayServer = None
+        self.__relayPort = args.relay_port
+        if self.__relayPort:
+            self.__relayForwardSecs = config["omnistat.usermode"].getfloat("relay_forward_secs", 60.0)
+            if self.__relayForwardSecs < args.interval:
+                logging.error("")
+                logging.error(
+                    "[ERROR]: Please set relay_forward_secs >= sampling interval (%s)" % self.__relayForwardSecs
+                )
+                sys.exit(1)
+            relayMaxMB = config["omnistat.usermode"].getint("relay_max_mb", 256)
+            if relayMaxMB < 1:
+                logging.error("")
+                logging.error("[ERROR]: Please set relay_max_mb >= 1 (%s)" % relayMaxMB)
+                sys.exit(1)
+            self.__relay = Relay(relayMaxMB * 1024 * 1024)
+
+        # optionally record changed values only, re-emitting unchanged series every heartbeat
+        heartbeat_millisecs = None
+        if config["omnistat.usermode"].getboolean("record_changes_only", False):
+            heartbeat_secs = config["omnistat.usermode"].getfloat("heartbeat_secs", 60.0)
+            if heartbeat_secs < args.interval:
+                logging.error("")
+                logging.error("[ERROR]: Please set heartbeat_secs >= sampling interval (%s)" % heartbeat_secs)
+                sys.exit(1)
+            heartbeat_millisecs = round(heartbeat_secs * 1000)
+            logging.info("Recording changed values only (heartbeat = %.1f secs)" % heartbeat_secs)
+        self.__buffer = SampleBuffer(heartbeat_millisecs=heartbeat_millisecs)
+
+        # optionally aggregate samples into coarser rollups before they reach the buffer
+        self.__rollup = None
+        self.__sink = self.__buffer
+        rollup_window_secs = config["omnistat.usermode"].getfloat("rollup_window_secs", 0.0)
+        if rollup_window_secs > 0:
+            if rollup_window_secs < args.interval:
+                logging.error("")
+                logging.error("[ERROR]: Please set rollup_window_secs >= sampling interval (%s)" % rollup_window_secs)
+                sys.exit(1)
+            stats = config["omnistat.usermode"].get("rollup_stats", ",".join(STATS))
+            stats = [stat.strip() for stat in stats.split(",") if stat.strip()]
+            for stat in stats:
+                if stat not in STATS:
+                    logging.error("")
+                    logging.error(
+                        "[ERROR]: Unknown rollup statistic (%s), expected one of: %s" % (stat, ", ".join(STATS))
+                    )
+                    sys.exit(1)
+            rawPrefixes = config["omnistat.usermode"].get("rollup_raw_metrics", "rmsjob_")
+            rawPrefixes = [prefix.strip() for prefix in rawPrefixes.split(",") if prefix.strip()]
+            self.__rollup = Rollup(self.__buffer, round(rollup_window_secs * 1000), stats, rawPrefixes)
+            self.__sink = self.__rollup
+            logging.info(
+                "Recording %s rollups every %.3f secs (raw metrics: %s)"
+                % (",".join(stats), rollup_window_secs, ",".join(rawPrefixes) or "none")
+            )
 
         # default labels applied to all metrics from this host
         self.__labelDefaults = self.__instanceLabel + "," + self.__userLabel
         logging.debug("Default metric labels = %s" % self.__labelDefaults)
 
-        # verify victoriaURL is operational and ready to receive queries (poll for a bit if necessary)
+        if self.__capture:
+            logging.info("Data will be written to %s (%s files)" % (args.output_dir, self.__captureFormat))
+        else:
+            self.checkVictoriaEndpoint(args)
+
+        logging.info("Telemetry data will be sampled every %.3f seconds" % args.interval)
+        logging.info("Cached data will be pushed every %.1f minute(s)" % self.__pushFrequencyMins)
+        logging.info("Figure-of-merit (FOM) data will be checked for every %i seconds" % self.__fomCheckFrequencySecs)
+
+    def checkVictoriaEndpoint(self, args):
+        """Verify victoriaURL is operational and ready to receive queries (poll for a bit if necessary)"""
         failed = True
         delay_start = 0.05
         testURL = f"http://{args.endpoint}:{args.port}/ready"
         for iter in range(1, 25):
             try:
-                response = requests.get(testURL)
+                response = self.__session.get(testURL)
                 logging.debug("VM ready response = %s" % response)
                 if response.status_code != 200:
                     failed = True
@@ -165,15 +426,30 @@ class Standalone:
             logging.warning("[WARN]: Unable to access VictoriaMetrics server endpoint (%s)" % self.__victoriaURL)
             logging.warning("[WARN]: Please verify server is running and accessible from this host.")
 
-        logging.info("Telemetry data will be sampled every %.3f seconds" % args.interval)
-        logging.info("Cached data will be pushed every %.1f minute(s)" % self.__pushFrequencyMins)
-        logging.info("Figure-of-merit (FOM) data will be checked for every %i seconds" % self.__fomCheckFrequencySecs)
+    def startRelay(self):
+        """Accept pushes from peers in the background, if this host is a relay
 
-        # Init glibc for usleep access
-        self.__libc = ctypes.CDLL("libc.so.6")
+        Raises:
+            OSError: if the relay port cannot be bound
+        """
+        if self.__relay is None:
+            return
+        # peers are other hosts in the job: accept pushes from any address, as VictoriaMetrics does
+        self.__relayServer = ControlServer(
+            self.__relay.routes, port=self.__relayPort, allowedIPs=("0.0.0.0",), bodyLimits=self.__relay.bodyLimits
+        )
+        self.__relayServer.start()
+        logging.info("Relaying pushes from peers every %.1f secs" % self.__relayForwardSecs)
 
-    def sleep_microsecs(self, microsecs):
-        self.__libc.usleep(microsecs)
+    def setCollectorOwners(self, families, seriesRanges):
+        """Record which collector owns each metric family and series table id range
+
+        Args:
+            families (dict): metric family name -> collector name
+            seriesRanges (dict): collector name -> (first, last + 1) series table ids
+        """
+        self.__familyOwners = families
+        self.__seriesRanges = seriesRanges
 
     def tokenizeMetricName(self, name, labels):
         token = name
@@ -181,70 +457,190 @@ class Standalone:
             token = "card%s_" % labels["card"] + name
         return token
 
-    def getMetrics(self, timestamp_millisecs, prefix=None):
-        """Cache current metrics from latest query"""
+    def getMetrics(self, timestamp_millisecs, prefix=None, readTimes=None):
+        """Cache current metrics from latest query
+
+        Args:
+            timestamp_millisecs (int): sample timestamp, shared by the values of all collectors
+            prefix (str, optional): only cache metrics whose name starts with prefix
+            readTimes (dict, optional): time each collector was last read; values from collectors
+                that were not read since the previous call are not cached again
+        """
+        # collectors running at a slower interval, or still running past their deadline, would
+        # only repeat stale values under a new timestamp
+        stale = set()
+        if readTimes:
+            stale = {name for name, readTime in readTimes.items() if self.__readTimes.get(name) == readTime}
+            self.__readTimes.update(readTimes)
+
+        seriesIds = []
+        values = []
         for metric in REGISTRY.collect():
-            if metric.type == "gauge":
+            if metric.type == "gauge" or metric.type == "histogram":
                 if prefix and not metric.name.startswith(prefix):
                     continue
+                if stale and self.__familyOwners.get(metric.name) in stale:
+                    continue
                 for sample in metric.samples:
-                    if sample.name == "rmsjob_info":
-                        labels = self.__instanceLabel
-                    else:
-                        labels = self.__labelDefaults
-                    if sample.labels:
-                        for key, value in sample.labels.items():
-                            labels += ',%s="%s"' % (key, value)
-                    entry = "%s{%s} %s %i" % (sample.name, labels, sample.value, timestamp_millisecs)
-                    self.__dataVM.append(entry)
-
-    def polling(self, monitor, interval_secs):
+                    if sample.name.endswith("_created"):
+                        continue
+                    key = (sample.name, tuple(sample.labels.items()))
+                    seriesId = self.__registryIds.get(key)
+                    if seriesId is None:
+                        if sample.name == "rmsjob_info":
+                            labels = self.__instanceLabel
+                        else:
+                            labels = self.__labelDefaults
+                        for name, value in sample.labels.items():
+                            labels += ',%s="%s"' % (name, value)
+                        seriesId = self.__sink.seriesId("%s{%s} " % (sample.name, labels))
+                        self.__registryIds[key] = seriesId
+                    seriesIds.append(seriesId)
+                    values.append(sample.value)
+
+        # series published through the series table use pre-rendered label strings
+        tableIds, bufferIds = self.tableSeriesIds(prefix)
+        if stale:
+            keep = np.ones(len(tableIds), dtype=bool)
+            for name in stale:
+                first, last = self.__seriesRanges.get(name, (0, 0))
+                keep &= (tableIds < first) | (tableIds >= last)
+            tableIds = tableIds[keep]
+            bufferIds = bufferIds[keep]
+        if seriesIds:
+            bufferIds = np.concatenate((np.array(seriesIds, dtype=np.intp), bufferIds))
+            tableValues = np.concatenate((np.array(values, dtype=np.float64), SERIES.values[tableIds]))
+        else:
+            tableValues = SERIES.values[tableIds]
+        self.__sink.append(timestamp_millisecs, bufferIds, tableValues)
+
+    def tableSeriesIds(self, prefix=None):
+        """Map series table ids to sample buffer ids (cached until new series are registered)"""
+        numSeries = len(SERIES)
+        cached = self.__tableIds.get(prefix)
+        if cached is None or cached[2] != numSeries:
+            tableIds = []
+            bufferIds = []
+            names = SERIES.seriesNames()
+            for tableId, key in enumerate(SERIES.importPrefixes(self.__labelDefaults)):
+                if prefix and not names[tableId].startswith(prefix):
+                    continue
+                tableIds.append(tableId)
+                bufferIds.append(self.__sink.seriesId(key))
+            cached = (np.array(tableIds, dtype=np.intp), np.array(bufferIds, dtype=np.intp), numSeries)
+            self.__tableIds[prefix] = cached
+        return cached[0], cached[1]
+
+    def pushMetrics(self, batch, telemetry=None):
+        """Push cached data to VictoriaMetrics, or write it to a local file with --output-dir,
+        recording push cost if self-telemetry is enabled
+
+        Raises:
+            PushError: if the data could not be delivered
+        """
+        start_time = time.perf_counter()
+        if self.__capture:
+            try:
+                numBytes = self.__capture.write(batch)
+            except OSError as e:
+                raise PushError("Unable to write captured data: %s" % e)
+        elif isinstance(batch, RelayBatch):
+            numBytes = push_to_victoria_metrics(None, self.__victoriaURL, self.__session, bodies=batch.bodies)
+            if numBytes is None:
+                raise PushError("VictoriaMetrics endpoint unavailable (%s)" % self.__victoriaURL)
+        else:
+            numBytes = push_to_victoria_metrics(batch.lines(), self.__victoriaURL, self.__session)
+            if numBytes is None:
+                raise PushError("VictoriaMetrics endpoint unavailable (%s)" % self.__victoriaURL)
+        if telemetry:
+            telemetry.observePush(time.perf_counter() - start_time, numBytes)
+
+    def polling(self, monitor, interval_secs, control=None):
         """main polling function"""
 
         num_samples = 0
         num_fom_samples = 0
         sample_duration = 0
         num_pushes = 0
-        push_check_duration = 0.0
         push_frequency_secs = self.__pushFrequencyMins * 60
         push_time_accumulation = 0.0
-        interval_microsecs = int(interval_secs * 1000000)
         mem_mb_base = utils.getMemoryUsageMB()
         base_start_time = time.perf_counter()
-        push_thread = None
         fom_check_duration = 0.0
+        sender = PushSender(
+            lambda batch: self.pushMetrics(batch, monitor.telemetry),
+            queueSize=self.__pushQueueSize,
+            policy=self.__pushBackpressure,
+            spillDir=self.__pushSpillDir,
+            spillMaxBytes=self.__pushSpillMaxMB * 1024 * 1024,
+        )
+        self.setCollectorOwners(monitor.collectorFamilies(), monitor.collectorSeries())
+
+        # data relayed from peers is forwarded by its own sender, and spilled when it falls behind
+        relay_sender = None
+        if self.__relay:
+            relay_sender = PushSender(
+                lambda batch: self.pushMetrics(batch, monitor.telemetry),
+                queueSize=self.__pushQueueSize,
+                policy=SPILL,
+                spillDir=self.__pushSpillDir,
+                spillMaxBytes=self.__pushSpillMaxMB * 1024 * 1024,
+                spillPrefix="omnistat-relay-spill",
+                name="omnistat-relay",
+            )
+
+        # samples are taken at wall-clock deadlines aligned to multiples of the interval, so
+        # all hosts in a job sample on the same time grid
+        clock = SamplingClock(interval_secs)
+
+        # pushes happen at a fixed, host-specific offset within each push period
+        push_offset_secs = push_phase(self.__hostname, push_frequency_secs)
+        logging.info("Data pushes offset by %.1f secs within each push interval" % push_offset_secs)
 
         # ---
         # main sampling loop
         try:
+            clock.wait()
+            push_deadline = next_push_time(clock.deadline, push_frequency_secs, push_offset_secs)
+            if relay_sender:
+                relay_deadline = next_push_time(clock.deadline, self.__relayForwardSecs, push_offset_secs)
             while not terminateFlagEvent.is_set():
                 start_time = time.perf_counter()
-                timestamp_msecs = int(datetime.now(timezone.utc).timestamp() * 1000.0)
-                monitor.updateAllMetrics()
-                self.getMetrics(timestamp_msecs)
+                # All values of a sample are stamped with the grid deadline rather than the time
+                # each collector was actually read: collectors are read right after the deadline,
+                # so the difference is bounded by the sampling duration, and a shared timestamp
+                # keeps samples from all hosts on the same grid and in one row of the columnar
+                # sample buffer. Per-collector read times only decide which values are new (see
+                # getMetrics), so slower or late collectors are recorded once, at the first
+                # deadline after they were read.
+                timestamp_msecs = round(clock.deadline * 1000.0)
+                monitor.updateCollectors()
+                if monitor.telemetry:
+                    serialize_start_time = time.perf_counter()
+                    self.getMetrics(timestamp_msecs, readTimes=monitor.readTimes())
+                    monitor.telemetry.observeSerialization(time.perf_counter() - serialize_start_time)
+                    monitor.telemetry.setBufferDepth(len(self.__buffer))
+                    monitor.telemetry.setSamplingOverruns(clock.overruns)
+                else:
+                    self.getMetrics(timestamp_msecs, readTimes=monitor.readTimes())
                 num_samples += 1
                 sample_duration += time.perf_counter() - start_time
 
                 # periodically push cached data to VictoriaMetrics
-                if push_check_duration > push_frequency_secs:
-                    push_check_duration = 0.0
-                    # ensure previous push thread completed...
-                    if push_thread is not None and push_thread.is_alive():
-                        logging.info("Previous metric push is still running - blocking till complete.")
-                        push_thread.join()
-                        logging.info("Resuming after previous metric push complete.")
-                    try:
-                        push_start_time = time.perf_counter()
-                        dataToPush = self.__dataVM
-                        push_thread = threading.Thread(
-                            target=push_to_victoria_metrics, args=(dataToPush, self.__victoriaURL)
-                        )
-                        push_thread.start()
-                        self.__dataVM = []
-                        num_pushes += 1
-                        push_time_accumulation += time.perf_counter() - push_start_time
-                    except:
-                        pass
+                if clock.deadline >= push_deadline:
+                    push_deadline = next_push_time(clock.deadline, push_frequency_secs, push_offset_secs)
+                    # hand over cached data to the sender thread (never blocks)
+                    push_start_time = time.perf_counter()
+                    sender.submit(self.__buffer.drain())
+                    num_pushes += 1
+                    push_time_accumulation += time.perf_counter() - push_start_time
+
+                # periodically forward data relayed from peers
+                if relay_sender and clock.deadline >= relay_deadline:
+                    relay_deadline = next_push_time(clock.deadline, self.__relayForwardSecs, push_offset_secs)
+                    batch = self.__relay.drain()
+                    if batch:
+                        relay_sender.submit(batch)
 
                 # periodically check for figure-of-merit (FOM) data
                 if fom_check_duration > self.__fomCheckFrequencySecs:
@@ -260,14 +656,12 @@ class Standalone:
                                     entry["value"],
                                     entry["timestamp_msecs"],
                                 )
-                                self.__dataVM.append(entry)
+                                self.__buffer.appendLine(entry)
                             logging.info("Registered %i sample(s) of FOM data" % len(fomData))
                             num_fom_samples += len(fomData)
                             fomData.clear()
 
-                self.sleep_microsecs(interval_microsecs)
-                # time.sleep(interval_secs)
-                push_check_duration += time.perf_counter() - start_time
+                clock.wait()
                 fom_check_duration += time.perf_counter() - start_time
 
         except KeyboardInterrupt:
@@ -279,11 +673,6 @@ class Standalone:
 
         duration_secs = time.perf_counter() - base_start_time
 
-        if push_thread is not None and push_thread.is_alive():
-            logging.info("Last metric push from polling loop is still running - blocking till complete.")
-            push_thread.join()
-            logging.info("Ready for final data dump after previous metric push complete.")
-
         # check for any remaining FOM data
         if fomData:
             with fomLock:
@@ -295,21 +684,48 @@ class Standalone:
                         entry["value"],
                         entry["timestamp_msecs"],
                     )
-                    self.__dataVM.append(entry)
+                    self.__buffer.appendLine(entry)
                 logging.info("Registered %i sample(s) of FOM data" % len(fomData))
                 num_fom_samples += len(fomData)
                 fomData.clear()
 
-        if len(self.__dataVM) > 0:
+        # stop accepting pushes from peers and forward the remaining data
+        if relay_sender:
+            self.__relayServer.close()
+            batch = self.__relay.drain()
+            if batch:
+                relay_sender.submit(batch)
+            relay_sender.close()
+
+        if self.__rollup:
+            self.__rollup.flush()
+        batch = self.__buffer.drain(final=True)
+        if len(batch) > 0:
             logging.info("Initiating final data push...")
-            push_to_victoria_metrics(self.__dataVM, self.__victoriaURL)
+            sender.submit(batch)
+
+        # deliver all pending data before shutdown
+        sender.close()
+        if sender.dropped or sender.downsampled or sender.spilled or sender.rejected:
+            logging.warning(
+                "[WARN]: Push backpressure and failures: %i data points dropped, %i downsampled, %i spilled to disk, "
+                "%i rejected" % (sender.dropped, sender.downsampled, sender.spilled, sender.rejected)
+            )
 
         logging.info("")
         logging.info("--> Sampling interval          = %.4f (secs)" % interval_secs)
         logging.info("--> Total # of samples         = %i" % num_samples)
+        if clock.overruns > 0:
+            logging.info("--> Skipped sampling deadlines = %i" % clock.overruns)
         if num_samples > 0:
             logging.info("--> Average time/sample        = %.4f (secs)" % (sample_duration / num_samples))
         logging.info("--> Total data pushes          = %i" % num_pushes)
+        if self.__capture:
+            logging.info("--> Total # of files written   = %i" % self.__capture.numFiles)
+        if self.__relay:
+            logging.info("--> Relayed data points        = %i" % self.__relay.received)
+            if self.__relay.rejected > 0:
+                logging.info("--> Deferred relay data points = %i" % self.__relay.rejected)
         if num_pushes > 0:
             logging.info("--> Average push duration      = %.4f (secs)" % (push_time_accumulation / num_pushes))
         if duration_secs >= 3600:
@@ -327,7 +743,12 @@ class Standalone:
         logging.debug("setting shutdown delivery event")
         dataDeliveredEvent.set()
         logging.debug("shutdown delivery event is set")
-        time.sleep(0.5)
+        if control:
+            # let the pending shutdown response go out
+            control.close()
+
+        # the SIGTERM below ends the process, so the ring has to be removed before it
+        monitor.closeSharedMemory()
 
         logging.info("Terminating execution...")
         logging.shutdown()
@@ -348,63 +769,92 @@ def parse_args():
     parser.add_argument("--logfile", type=str, help="redirect stdout to logfile", default=None)
     parser.add_argument("--endpoint", type=str, help="hostname of VictoriaMetrics server", default="localhost")
     parser.add_argument("--port", type=int, help="port to access VictoriaMetrics server", default=9090)
+    parser.add_argument(
+        "--relay-port", type=int, help="accept pushes from peers on this port and forward them upstream", default=None
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        help="write data to local Parquet/Arrow files instead of VictoriaMetrics",
+        default=None,
+    )
 
     return parser.parse_args()
 
 
-@app.route("/shutdown")
-def terminate():
-    """Endpoint that can be used to terminate execution"""
+def terminate(body):
+    """Endpoint that can be used to terminate execution; responds once the final data push completed"""
     logging.info("Received shutdown request")
     terminateFlagEvent.set()
+    if not dataDeliveredEvent.wait(SHUTDOWN_TIMEOUT_SECS):
+        logging.warning("[WARN]: Final data push not completed after %.0f secs" % SHUTDOWN_TIMEOUT_SECS)
+    return 200, {"message": "Shutting down..."}
 
-    # spin loop till notice recieved that last data was pushed
-    maxChecks = 0
-    if "SAMPLING_INTERVAL" in app.config:
-        interval = app.config["SAMPLING_INTERVAL"]
-    else:
-        interval = 5.0
-    wait_interval = max(1, interval / 2.0)
-    while not dataDeliveredEvent.isSet():
-        logging.debug("waiting for data delivery event...(%.2f secs)" % wait_interval)
-        maxChecks += 1
-        if maxChecks > 10:
-            break
-        time.sleep(wait_interval)
-
-    return jsonify({"message": "Shutting down..."}), 200
-
-
-@app.errorhandler(403)
-def forbidden(e):
-    return jsonify(error="Access denied"), 403
 
-
-@app.route("/fom", methods=["POST"])
-def figureOfMerit():
+def figureOfMerit(body):
     """Endpoint that can be used by user to provide application figure of merit"""
     try:
-        data = request.get_json()
+        data = json.loads(body)
         name = data.get("name")
         timestamp_msecs = int(datetime.now(timezone.utc).timestamp() * 1000.0)
         value = data.get("value")
         with fomLock:
             fomData.append({"name": name, "value": value, "timestamp_msecs": timestamp_msecs})
-        return jsonify({"status": "ok"}), 200
+        return 200, {"status": "ok"}
+
+    except Exception as e:
+        return 400, {"error": str(e)}
+
+
+def figureOfMeritBatch(body):
+    """Endpoint that can be used to provide many figure of merit samples at once
 
+    Expects a JSON object with arrays of equal length: "names" (strings), "values" (finite
+    numbers) and optionally "timestamps_msecs" (positive integers, defaults to the time of the
+    request).
+    """
+    try:
+        data = json.loads(body)
+        names = data["names"]
+        values = data["values"]
+        timestamps = data.get("timestamps_msecs")
+        if timestamps is None:
+            timestamps = [int(datetime.now(timezone.utc).timestamp() * 1000.0)] * len(names)
+        if not all(isinstance(field, list) for field in (names, values, timestamps)):
+            raise ValueError("names, values and timestamps_msecs must be arrays")
+        if not len(names) == len(values) == len(timestamps):
+            raise ValueError("names, values and timestamps_msecs must have the same length")
+
+        entries = []
+        for name, value, timestamp in zip(names, values, timestamps):
+            if not isinstance(name, str):
+                raise ValueError("Invalid name: %r" % (name,))
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError("Invalid value for %s: %s" % (name, value))
+            if isinstance(timestamp, bool) or not isinstance(timestamp, int) or timestamp <= 0:
+                raise ValueError("Invalid timestamp for %s: %r" % (name, timestamp))
+            # names are pushed as label values
+            entries.append({"name": escapeLabelValue(name), "value": value, "timestamp_msecs": timestamp})
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return 400, {"error": str(e)}
+
+    with fomLock:
+        fomData.extend(entries)
+    return 200, {"status": "ok", "samples": len(entries)}
 
 
-@app.route("/metrics")
-def heartbeat():
+def heartbeat(body):
     """Endpoint that can be used to confirm exporter is running"""
-    return jsonify({"status": "ok"}), 200
+    return 200, {"status": "ok"}
 
 
-def runFlask(config):
-    listenPort = config["omnistat.collectors"].get("port", 8001)
-    app.run(host="0.0.0.0", port=listenPort)
+ROUTES = {
+    ("GET", "/shutdown"): terminate,
+    ("POST", "/fom"): figureOfMerit,
+    ("POST", "/fom/batch"): figureOfMeritBatch,
+    ("GET", "/metrics"): heartbeat,
+}
 
 
 def main():
@@ -416,25 +866,40 @@ def main():
     monitor = Monitor(config, logFile=args.logfile)
     monitor.initMetrics()
 
-    app.config["SAMPLING_INTERVAL"] = args.interval
-
     caching = Standalone(args, config)
 
-    # Enforce network restrictions
-    @app.before_request
-    def restrict_ips():
-        allowed_ips = config["omnistat.collectors"].get("allowed_ips", "127.0.0.1")
-        if "0.0.0.0" in allowed_ips:
-            return
-        elif request.remote_addr not in allowed_ips:
-            abort(403)
+    # collectors cannot be sampled faster than the main polling loop
+    for name, interval in monitor.runtimeConfig["collector_intervals"].items():
+        if interval < args.interval:
+            logging.warning(
+                "[WARN]: %s sampling interval (%.3f secs) limited by --interval (%.3f secs)"
+                % (name, interval, args.interval)
+            )
 
-    # Launch flask app as separate thread so we can respond to remote shutdown requests
-    flask_thread = threading.Thread(target=runFlask, args=[config])
-    flask_thread.start()
+    # Serve control endpoints (shutdown, FOM) in the background, restricted to allowed IPs
+    control = ControlServer(
+        ROUTES,
+        port=config["omnistat.collectors"].get("port", 8001),
+        allowedIPs=monitor.runtimeConfig["collector_allowed_ips"],
+        unixSocket=config["omnistat.usermode"].get("control_socket", None, vars=os.environ),
+    )
+    try:
+        control.start()
+    except OSError as e:
+        logging.error("")
+        logging.error("[ERROR]: Unable to start control server: %s" % e)
+        sys.exit(1)
+
+    # Accept pushes from peers when acting as a relay
+    try:
+        caching.startRelay()
+    except OSError as e:
+        logging.error("")
+        logging.error("[ERROR]: Unable to start relay server: %s" % e)
+        sys.exit(1)
 
     # Initiate main polling loop/data collection
-    caching.polling(monitor, args.interval)
+    caching.polling(monitor, args.interval, control)
 
 
 if __name__ == "__main__":
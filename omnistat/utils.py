@@ -497,8 +497,21 @@ def execute_ssh_command_nohup(
     return False, None
 
 
+def relay_assignments(hostnames, group_size):
+    """Assign a push relay to every host
+
+    Hosts are split in contiguous groups of group_size hosts, following the order of the host list
+    (RMS host lists are usually sorted by rack), and the first host in each group relays pushes
+    from the others.
+
+    Returns:
+        dict: relay for each hostname (relays are assigned to themselves)
+    """
+    return {host: hostnames[i - i % group_size] for i, host in enumerate(hostnames)}
+
+
 def execute_ssh_parallel(
-    command: str,
+    command,
     hostnames: list[str],
     max_concurrent: int = 10,
     max_retries: int = 3,
@@ -509,11 +522,15 @@ def execute_ssh_parallel(
     """
     Spawn commands on remote servers with nohup on multiple hosts in parallel using native ssh client.
 
+    The command is either a single string run on all hosts, or a dictionary with the command for
+    each hostname (e.g. when hosts are assigned different roles).
+
      Returns:
          Dictionary of "status" and "output_filename" for each hostname
     """
 
     results = {}
+    commands = command if isinstance(command, dict) else dict.fromkeys(hostnames, command)
 
     if not os.path.exists(outputDir):
         os.makedirs(outputDir)
@@ -523,7 +540,7 @@ def execute_ssh_parallel(
             executor.submit(
                 execute_ssh_command_nohup,
                 host,
-                command,
+                commands[host],
                 max_retries,
                 retry_delay,
                 ssh_timeout,
@@ -0,0 +1,22 @@
+#!/bin/bash
+#SBATCH --job-name=test-usermode
+#SBATCH --partition=default-partition
+#SBATCH --nodes=2
+#SBATCH --nodelist=node1,node2
+
+export OMNISTAT_CONFIG=/etc/omnistat-user.config
+export OMNISTAT_DIR=/source
+
+# If source directory is not present, switch to package execution.
+if [[ ! -d $OMNISTAT_DIR ]]; then
+    export OMNISTAT_DIR=/opt/omnistat/bin
+fi
+
+. /opt/omnistat/bin/activate
+cd /jobs
+
+# Default mode now uses a push model with victoria
+
+$OMNISTAT_DIR/omnistat-usermode --start --interval 0.5
+srun sleep 2
+$OMNISTAT_DIR/omnistat-usermode --stop
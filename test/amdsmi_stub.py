@@ -0,0 +1,204 @@
+"""Stub of the amdsmi Python package, limited to the API used by the AMD SMI collector.
+
+Returns fixed values for AMDSMI_STUB_NUM_GPUS devices (default: 4) so the collector can be
+tested and benchmarked without GPUs. Like the real package, amdsmi_get_gpu_metrics_info() builds
+a new dictionary with all gpu_metrics fields on every call, and unsupported fields are reported
+as "N/A". Calls are counted in `calls`.
+
+Install it before importing the collector:
+
+    sys.modules["amdsmi"] = test.amdsmi_stub
+"""
+
+import collections
+import os
+from enum import Enum, IntEnum
+
+calls = collections.Counter()
+
+
+class AmdSmiException(Exception):
+    pass
+
+
+class AmdSmiGpuBlock(IntEnum):
+    # formatted as "AmdSmiGpuBlock.UMC" like IntEnum members before Python 3.11
+    __str__ = Enum.__str__
+
+    INVALID = 0x0
+    UMC = 0x1
+    SDMA = 0x2
+    GFX = 0x4
+    MMHUB = 0x8
+
+
+class AmdSmiRasErrState(IntEnum):
+    NONE = 0
+    DISABLED = 1
+    ENABLED = 6
+
+
+class AmdSmiTemperatureType(IntEnum):
+    EDGE = 0
+    HOTSPOT = 1
+    VRAM = 2
+    HBM_0 = 3
+    HBM_1 = 4
+    HBM_2 = 5
+    HBM_3 = 6
+
+
+class AmdSmiTemperatureMetric(IntEnum):
+    CURRENT = 0
+
+
+class AmdSmiMemoryType(IntEnum):
+    VRAM = 0
+
+
+class ProcessorHandle:
+    def __init__(self, index):
+        self.index = index
+
+
+# fields reported by an MI300-like device; "N/A" marks unsupported fields
+GPU_METRICS = {
+    "temperature_edge": "N/A",
+    "temperature_hotspot": 48,
+    "temperature_mem": 40,
+    "temperature_vrgfx": "N/A",
+    "temperature_vrsoc": 41,
+    "temperature_vrmem": "N/A",
+    "average_gfx_activity": 88,
+    "average_umc_activity": 20,
+    "average_mm_activity": "N/A",
+    "average_socket_power": "N/A",
+    "energy_accumulator": 123456789,
+    "system_clock_counter": 987654321,
+    "average_gfxclk_frequency": 2100,
+    "average_socclk_frequency": "N/A",
+    "average_uclk_frequency": 1300,
+    "average_vclk0_frequency": "N/A",
+    "average_dclk0_frequency": "N/A",
+    "average_vclk1_frequency": "N/A",
+    "average_dclk1_frequency": "N/A",
+    "current_gfxclk": "N/A",
+    "current_socclk": "N/A",
+    "current_uclk": 1300,
+    "current_vclk0": "N/A",
+    "current_dclk0": "N/A",
+    "current_vclk1": "N/A",
+    "current_dclk1": "N/A",
+    "throttle_status": "N/A",
+    "current_fan_speed": "N/A",
+    "pcie_link_width": 16,
+    "pcie_link_speed": 320,
+    "gfx_activity_acc": 1234,
+    "mem_activity_acc": 567,
+    "temperature_hbm": ["N/A"] * 4,
+    "firmware_timestamp": 5678,
+    "voltage_soc": "N/A",
+    "voltage_gfx": "N/A",
+    "voltage_mem": "N/A",
+    "indep_throttle_status": "N/A",
+    "current_socket_power": 550,
+    "vcn_activity": [10, 20, "N/A", "N/A"],
+    "jpeg_activity": [0] * 8 + ["N/A"] * 24,
+    "gfxclk_lock_status": 0,
+    "xgmi_link_width": 16,
+    "xgmi_link_speed": 32,
+    "pcie_bandwidth_acc": 0,
+    "pcie_bandwidth_inst": 0,
+    "pcie_l0_to_recov_count_acc": 0,
+    "pcie_replay_count_acc": 0,
+    "pcie_replay_rover_count_acc": 0,
+    "pcie_nak_sent_count_acc": 0,
+    "pcie_nak_rcvd_count_acc": 0,
+    "xgmi_read_data_acc": [0] * 8,
+    "xgmi_write_data_acc": [0] * 8,
+    "current_gfxclks": [2100] * 8,
+    "current_socclks": [1000] * 4,
+    "current_vclk0s": [800] * 4,
+    "current_dclk0s": [700] * 4,
+}
+
+
+def count(function):
+    def wrapper(*args):
+        calls[function.__name__] += 1
+        return function(*args)
+
+    wrapper.__name__ = function.__name__
+    return wrapper
+
+
+def amdsmi_init():
+    pass
+
+
+def amdsmi_get_lib_version():
+    return {"year": 25, "major": 3, "minor": 0, "release": 0}
+
+
+@count
+def amdsmi_get_processor_handles():
+    return [ProcessorHandle(i) for i in range(int(os.environ.get("AMDSMI_STUB_NUM_GPUS", "4")))]
+
+
+@count
+def amdsmi_get_gpu_kfd_info(device):
+    return {"kfd_id": 1000 + device.index, "node_id": device.index + 1}
+
+
+@count
+def amdsmi_get_gpu_vbios_info(device):
+    return {"part_number": "113-STUB-%i" % device.index}
+
+
+@count
+def amdsmi_get_gpu_asic_info(device):
+    return {"market_name": "Stub GPU"}
+
+
+@count
+def amdsmi_get_gpu_driver_info(device):
+    return {"driver_version": "6.10.5-stub"}
+
+
+@count
+def amdsmi_get_gpu_ecc_status(device, block):
+    return AmdSmiRasErrState.ENABLED if block == AmdSmiGpuBlock.UMC else AmdSmiRasErrState.DISABLED
+
+
+@count
+def amdsmi_get_gpu_ecc_count(device, block):
+    return {"correctable_count": device.index, "uncorrectable_count": 0, "deferred_count": 0}
+
+
+@count
+def amdsmi_get_temp_metric(device, location, metric):
+    if location == AmdSmiTemperatureType.EDGE:
+        return 40 + device.index
+    if location == AmdSmiTemperatureType.VRAM:
+        return 50 + device.index
+    raise AmdSmiException("temperature location not supported")
+
+
+@count
+def amdsmi_get_gpu_metrics_info(device):
+    return {key: list(value) if isinstance(value, list) else value for key, value in GPU_METRICS.items()}
+
+
+@count
+def amdsmi_get_gpu_memory_total(device, memoryType):
+    return 64 << 30
+
+
+@count
+def amdsmi_get_gpu_memory_usage(device, memoryType):
+    return 16 << 30
+
+
+@count
+def amdsmi_get_power_cap_info(device):
+    return {"power_cap": 750 * 1000000, "default_power_cap": 750 * 1000000}
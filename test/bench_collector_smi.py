@@ -0,0 +1,147 @@
+"""Micro-benchmark of ROCm SMI library calls against a stub library.
+
+Builds test/rocm_smi_stub.c into a temporary ROCm tree and compares:
+
+* untyped: calls resolved through the CDLL object without declared prototypes, allocating the
+  device index and output references on every call (the original collector implementation)
+* checked: calls through RSMIBindings with declared prototypes and preallocated RSMIDevice
+  arguments
+* unchecked: calls through RSMIBindings(checked=False) with the same arguments, as used by the
+  collector when sampling
+* collector: a complete ROCMSMI sample over all stub devices
+
+Usage: python -m test.bench_collector_smi [--gpus 8] [--samples 2000] [--no-gpu-metrics]
+                                         [--gpu-workers] [--latency-us 0]
+"""
+
+import argparse
+import ctypes
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+STUB_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rocm_smi_stub.c")
+
+
+def find_compiler():
+    """Return the C compiler used to build the stub library, or None if not available"""
+    return shutil.which(os.environ.get("CC", "gcc")) or shutil.which("cc")
+
+
+def build_stub(rocmPath):
+    """Build the stub SMI library as rocmPath/lib/librocm_smi64.so and return its path"""
+    compiler = find_compiler()
+    if compiler is None:
+        raise RuntimeError("no C compiler available to build %s" % STUB_SOURCE)
+    libdir = os.path.join(rocmPath, "lib")
+    os.makedirs(libdir, exist_ok=True)
+    library = os.path.join(libdir, "librocm_smi64.so")
+    subprocess.run([compiler, "-O2", "-shared", "-fPIC", "-o", library, STUB_SOURCE], check=True)
+    return library
+
+
+def unbindings_sample(lib, numGPUs, frequencies):
+    temperature = ctypes.c_int64(0)
+    power = ctypes.c_uint64(0)
+    power_type = ctypes.c_int(0)
+    value = ctypes.c_uint32(0)
+    for i in range(numGPUs):
+        device = ctypes.c_uint32(i)
+        lib.rsmi_dev_temp_metric_get(device, ctypes.c_int32(0), ctypes.c_int32(0), ctypes.byref(temperature))
+        lib.rsmi_dev_power_get(device, ctypes.byref(power), ctypes.byref(power_type))
+        lib.rsmi_dev_gpu_clk_freq_get(device, 0, ctypes.byref(frequencies))
+        lib.rsmi_dev_gpu_clk_freq_get(device, 4, ctypes.byref(frequencies))
+        lib.rsmi_dev_memory_usage_get(device, 0x0, ctypes.byref(power))
+        lib.rsmi_dev_memory_busy_percent_get(device, ctypes.byref(value))
+        lib.rsmi_dev_busy_percent_get(device, ctypes.byref(value))
+
+
+def bindings_sample(bindings, devices, smi):
+    temp_metric_get = bindings.rsmi_dev_temp_metric_get
+    power_get = bindings.rsmi_dev_power_get
+    clk_freq_get = bindings.rsmi_dev_gpu_clk_freq_get
+    memory_usage_get = bindings.rsmi_dev_memory_usage_get
+    memory_busy_get = bindings.rsmi_dev_memory_busy_percent_get
+    busy_get = bindings.rsmi_dev_busy_percent_get
+    edge = ctypes.c_uint32(0)
+    for gpu in devices:
+        temp_metric_get(gpu.device, edge, smi.RSMI_TEMP_CURRENT, gpu.temperaturePtr)
+        power_get(gpu.device, gpu.powerPtr, gpu.powerTypePtr)
+        clk_freq_get(gpu.device, smi.RSMI_CLK_TYPE_SYS, gpu.frequenciesPtr)
+        clk_freq_get(gpu.device, smi.RSMI_CLK_TYPE_MEM, gpu.frequenciesPtr)
+        memory_usage_get(gpu.device, smi.RSMI_MEM_TYPE_VRAM, gpu.vramUsedPtr)
+        memory_busy_get(gpu.device, gpu.vramBusyPtr)
+        busy_get(gpu.device, gpu.utilizationPtr)
+
+
+def timeit(function, samples):
+    """Return the mean duration of function() in microseconds"""
+    function()
+    start = time.perf_counter()
+    for _ in range(samples):
+        function()
+    return (time.perf_counter() - start) / samples * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gpus", type=int, default=8, help="number of stub devices")
+    parser.add_argument("--samples", type=int, default=2000, help="number of samples per measurement")
+    parser.add_argument("--no-gpu-metrics", action="store_true", help="disable gpu_metrics in the stub library")
+    parser.add_argument("--gpu-workers", action="store_true", help="sample GPUs concurrently in the collector")
+    parser.add_argument("--latency-us", type=int, default=0, help="latency of collector queries in the stub library")
+    args = parser.parse_args()
+
+    os.environ["RSMI_STUB_NUM_GPUS"] = str(args.gpus)
+    if args.no_gpu_metrics:
+        os.environ["RSMI_STUB_NO_GPU_METRICS"] = "1"
+
+    import omnistat.collector_smi as smi
+    from omnistat.series import SERIES
+
+    with tempfile.TemporaryDirectory() as rocmPath:
+        library = build_stub(rocmPath)
+        version = {"major": 7, "minor": 4, "patch": 0}
+
+        lib = ctypes.CDLL(library)
+        frequencies = smi.get_rsmi_frequencies_type(version)
+        untyped = timeit(lambda: unbindings_sample(lib, args.gpus, frequencies), args.samples)
+
+        devices = [smi.RSMIDevice(i, version) for i in range(args.gpus)]
+        bindings = smi.RSMIBindings(lib)
+        checked = timeit(lambda: bindings_sample(bindings, devices, smi), args.samples)
+        bindings = smi.RSMIBindings(lib, checked=False)
+        unchecked = timeit(lambda: bindings_sample(bindings, devices, smi), args.samples)
+
+        runtimeConfig = {
+            "collector_ras_ecc": True,
+            "collector_power_capping": True,
+            "collector_cu_occupancy": False,
+            "collector_gpu_workers": args.gpu_workers,
+            "collector_rocm_path": rocmPath,
+        }
+        collector = smi.ROCMSMI(runtimeConfig)
+        collector.registerMetrics()
+        if args.latency_us:
+            os.environ["RSMI_STUB_LATENCY_US"] = str(args.latency_us)
+        collector_sample = timeit(lambda: collector.updateSeries(SERIES.values), args.samples)
+
+    print("ROCm SMI stub: %i GPUs, %i samples (usecs per sample)" % (args.gpus, args.samples))
+    print("  untyped calls:    %8.1f" % untyped)
+    print("  checked calls:    %8.1f  (%.2fx)" % (checked, untyped / checked))
+    print("  unchecked calls:  %8.1f  (%.2fx)" % (unchecked, untyped / unchecked))
+    print(
+        "  collector sample: %8.1f  (gpu_metrics %s, gpu workers %s, latency %i usecs)"
+        % (
+            collector_sample,
+            "off" if args.no_gpu_metrics else "on",
+            "on" if args.gpu_workers else "off",
+            args.latency_us,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Benchmark of AMD SMI collector samples against a stub amdsmi module (test/amdsmi_stub.py).
+
+Reports the mean duration of a collector sample over all stub devices and the number of amdsmi
+calls per sample, next to a baseline reproducing the previous per-sample path: gpu_metrics
+values copied through intermediate dicts keyed by metric name, series ids looked up by formatted
+metric names, and VRAM size queried on every sample.
+
+Usage: python -m test.bench_collector_smi_v2 [--gpus 8] [--samples 5000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import test.amdsmi_stub as amdsmi_stub
+
+
+class BaselineSampler:
+    """Previous per-sample path of the AMD SMI collector, over the metrics registered by a collector"""
+
+    def __init__(self, collector, smi):
+        self.smi = smi
+        self.prefix = collector._AMDSMI__prefix
+        self.series = collector._AMDSMI__GPUMetrics
+        self.metricMapping = collector._AMDSMI__metricMapping
+        self.sourceMetricMapping = collector._AMDSMI__sourceMetricMapping
+        self.listMetricMapping = collector._AMDSMI__listMetricMapping
+        self.eccBlocks = collector._AMDSMI__eccBlocks
+        self.tempLocation = collector._AMDSMI__temp_location_index
+        self.memoryTempLocation = collector._AMDSMI__temp_memory_location_index
+        self.powerCapMonitoring = collector._AMDSMI__power_cap_monitoring
+        self.handles = [gpu.handle for gpu in collector._AMDSMI__devices]
+
+    def get_gpu_metrics(self, device):
+        simple_metrics = {}
+        source_metrics = {}
+        list_metrics = {}
+        result = self.smi.amdsmi_get_gpu_metrics_info(device)
+        for metricName, smiName in self.metricMapping.items():
+            simple_metrics[metricName] = result[smiName]
+        for metricName, smiName in self.sourceMetricMapping.items():
+            source_metrics[metricName] = result[smiName]
+        for metricName, (smiName, _) in self.listMetricMapping.items():
+            list_metrics[metricName] = result[smiName]
+        return simple_metrics, source_metrics, list_metrics
+
+    def sample(self, values):
+        smi = self.smi
+        series = self.series
+        for idx, device in enumerate(self.handles):
+            simple_metrics, source_metrics, list_metrics = self.get_gpu_metrics(device)
+            for metricName, value in simple_metrics.items():
+                values[series[self.prefix + metricName][idx]] = value
+            for metricName, value in source_metrics.items():
+                values[series[self.prefix + metricName][idx]] = value
+            for metricName, value in list_metrics.items():
+                _, value_indices = self.listMetricMapping[metricName]
+                engines = [value[x] for x in value_indices]
+                values[series[self.prefix + metricName][idx]] = sum(engines) / len(engines)
+
+            device_total_vram = smi.amdsmi_get_gpu_memory_total(device, smi.AmdSmiMemoryType.VRAM)
+            values[series["vram_total_bytes"][idx]] = device_total_vram
+            vram_used_bytes = smi.amdsmi_get_gpu_memory_usage(device, smi.AmdSmiMemoryType.VRAM)
+            values[series["vram_used_percentage"][idx]] = round(100.0 * vram_used_bytes / device_total_vram, 4)
+
+            temperature = smi.amdsmi_get_temp_metric(device, self.tempLocation, smi.AmdSmiTemperatureMetric.CURRENT)
+            values[series["temperature_celsius"][idx]] = temperature
+            if self.memoryTempLocation:
+                temperature = smi.amdsmi_get_temp_metric(
+                    device, self.memoryTempLocation, smi.AmdSmiTemperatureMetric.CURRENT
+                )
+                values[series["temperature_memory_celsius"][idx]] = temperature
+
+            for key, block in self.eccBlocks.items():
+                ecc_error_counts = smi.amdsmi_get_gpu_ecc_count(device, block)
+                values[series["ras_%s_correctable_count" % key][idx]] = ecc_error_counts["correctable_count"]
+                values[series["ras_%s_uncorrectable_count" % key][idx]] = ecc_error_counts["uncorrectable_count"]
+                values[series["ras_%s_deferred_count" % key][idx]] = ecc_error_counts["deferred_count"]
+
+            if self.powerCapMonitoring:
+                power_info = smi.amdsmi_get_power_cap_info(device)
+                values[series["power_cap_watts"][idx]] = power_info["power_cap"] / 1000000
+
+
+def timeit(function, samples):
+    """Return the mean duration of function() in microseconds, and the amdsmi calls per sample"""
+    function()
+    amdsmi_stub.calls.clear()
+    start = time.perf_counter()
+    for _ in range(samples):
+        function()
+    duration = (time.perf_counter() - start) / samples * 1e6
+    return duration, sum(amdsmi_stub.calls.values()) / samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gpus", type=int, default=8, help="number of stub devices")
+    parser.add_argument("--samples", type=int, default=5000, help="number of samples")
+    args = parser.parse_args()
+
+    os.environ["AMDSMI_STUB_NUM_GPUS"] = str(args.gpus)
+    sys.modules["amdsmi"] = amdsmi_stub
+
+    import omnistat.collector_smi_v2 as smi_v2
+    from omnistat.series import SERIES
+
+    runtimeConfig = {
+        "collector_ras_ecc": True,
+        "collector_power_capping": True,
+        "collector_cu_occupancy": False,
+        "collector_vcn": True,
+        "collector_gpu_workers": False,
+    }
+    collector = smi_v2.AMDSMI(runtimeConfig)
+    collector.registerMetrics()
+    baseline = BaselineSampler(collector, smi_v2.smi)
+
+    baseline_sample, baseline_calls = timeit(lambda: baseline.sample(SERIES.values), args.samples)
+    collector_sample, collector_calls = timeit(lambda: collector.updateSeries(SERIES.values), args.samples)
+
+    print("AMD SMI stub: %i GPUs, %i samples (usecs per sample)" % (args.gpus, args.samples))
+    print("  baseline sample:  %8.1f  (%.1f amdsmi calls)" % (baseline_sample, baseline_calls))
+    print(
+        "  collector sample: %8.1f  (%.1f amdsmi calls, %.2fx)"
+        % (collector_sample, collector_calls, baseline_sample / collector_sample)
+    )
+    print("  amdsmi calls per collector sample:")
+    amdsmi_stub.calls.clear()
+    collector.updateSeries(SERIES.values)
+    for name, count in sorted(amdsmi_stub.calls.items()):
+        print("    %-32s %6.1f" % (name, count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+/*
+ * Stub implementation of the subset of librocm_smi64 used by the Omnistat
+ * ROCm SMI collector. Returns deterministic values for a configurable number
+ * of devices so the collector can be exercised and benchmarked without GPUs.
+ *
+ * Environment variables:
+ *   RSMI_STUB_NUM_GPUS          number of devices (default: 4)
+ *   RSMI_STUB_NO_GPU_METRICS    if set, rsmi_dev_gpu_metrics_info_get() is not supported
+ *   RSMI_STUB_LATENCY_US        driver latency added to every device query (default: 0)
+ *
+ * With a latency set, the largest number of device queries in flight at the
+ * same time is recorded in stub_max_concurrent_queries.
+ *
+ * Build: gcc -O2 -shared -fPIC -o lib/librocm_smi64.so rocm_smi_stub.c
+ */
+
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+
+#define RSMI_STATUS_SUCCESS 0
+#define RSMI_STATUS_INVALID_ARGS 1
+#define RSMI_STATUS_NOT_SUPPORTED 2
+
+#define RSMI_RAS_ERR_STATE_DISABLED 1
+#define RSMI_RAS_ERR_STATE_ENABLED 6
+#define RSMI_GPU_BLOCK_UMC 0x1
+
+#define RSMI_MAX_NUM_FREQUENCIES 33
+
+typedef struct {
+    uint32_t major;
+    uint32_t minor;
+    uint32_t patch;
+    const char *build;
+} rsmi_version_t;
+
+typedef struct {
+    _Bool has_deep_sleep;
+    int32_t num_supported;
+    uint32_t current;
+    uint64_t frequency[RSMI_MAX_NUM_FREQUENCIES];
+} rsmi_frequencies_t;
+
+typedef struct {
+    uint64_t correctable_err;
+    uint64_t uncorrectable_err;
+} rsmi_error_count_t;
+
+/* leading fields of rsmi_gpu_metrics_t (format 1) */
+typedef struct {
+    uint16_t structure_size;
+    uint8_t format_revision;
+    uint8_t content_revision;
+    uint16_t temperature_edge;
+    uint16_t temperature_hotspot;
+    uint16_t temperature_mem;
+    uint16_t temperature_vrgfx;
+    uint16_t temperature_vrsoc;
+    uint16_t temperature_vrmem;
+    uint16_t average_gfx_activity;
+    uint16_t average_umc_activity;
+    uint16_t average_mm_activity;
+    uint16_t average_socket_power;
+    uint64_t energy_accumulator;
+    uint64_t system_clock_counter;
+    uint16_t average_gfxclk_frequency;
+    uint16_t average_socclk_frequency;
+    uint16_t average_uclk_frequency;
+    uint16_t average_vclk0_frequency;
+    uint16_t average_dclk0_frequency;
+    uint16_t average_vclk1_frequency;
+    uint16_t average_dclk1_frequency;
+    uint16_t current_gfxclk;
+    uint16_t current_socclk;
+    uint16_t current_uclk;
+} stub_gpu_metrics_t;
+
+/* bytes filled by rsmi_dev_gpu_metrics_info_get(), within the size of rsmi_gpu_metrics_t */
+#define STUB_GPU_METRICS_SIZE 512
+
+static uint32_t num_gpus(void) {
+    const char *value = getenv("RSMI_STUB_NUM_GPUS");
+    return value ? (uint32_t)atoi(value) : 4;
+}
+
+/* device queries are validated first: the simulated driver latency is added there */
+static int active_queries = 0;
+int stub_max_concurrent_queries = 0;
+
+static int invalid_device(uint32_t dv_ind) {
+    const char *latency = getenv("RSMI_STUB_LATENCY_US");
+    if (latency) {
+        int active = __atomic_add_fetch(&active_queries, 1, __ATOMIC_SEQ_CST);
+        int max = __atomic_load_n(&stub_max_concurrent_queries, __ATOMIC_SEQ_CST);
+        while (active > max && !__atomic_compare_exchange_n(&stub_max_concurrent_queries, &max, active, 0,
+                                                            __ATOMIC_SEQ_CST, __ATOMIC_SEQ_CST))
+            ;
+        usleep(atoi(latency));
+        __atomic_sub_fetch(&active_queries, 1, __ATOMIC_SEQ_CST);
+    }
+    return dv_ind >= num_gpus();
+}
+
+int rsmi_init(uint64_t flags) { return RSMI_STATUS_SUCCESS; }
+
+int rsmi_version_get(rsmi_version_t *version) {
+    version->major = 7;
+    version->minor = 4;
+    version->patch = 0;
+    version->build = "stub";
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_version_str_get(int component, char *ver_str, uint32_t len) {
+    snprintf(ver_str, len, "6.10.5-stub");
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_num_monitor_devices(uint32_t *num_devices) {
+    *num_devices = num_gpus();
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_guid_get(uint32_t dv_ind, uint64_t *guid) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *guid = 1000 + dv_ind;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_node_id_get(uint32_t dv_ind, uint32_t *node_id) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *node_id = dv_ind + 1;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_vbios_version_get(uint32_t dv_ind, char *vbios, uint32_t len) {
+    snprintf(vbios, len, "113-STUB-%u", dv_ind);
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_name_get(uint32_t dv_ind, char *name, size_t len) {
+    snprintf(name, len, "Stub GPU");
+    return RSMI_STATUS_SUCCESS;
+}
+
+/* edge and vram sensors only: temperature in millidegrees Celsius */
+int rsmi_dev_temp_metric_get(uint32_t dv_ind, uint32_t sensor_type, int metric, int64_t *temperature) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    if (sensor_type == 0) {
+        *temperature = (40 + dv_ind) * 1000;
+    } else if (sensor_type == 2) {
+        *temperature = (50 + dv_ind) * 1000;
+    } else {
+        *temperature = 0;
+        return RSMI_STATUS_NOT_SUPPORTED;
+    }
+    return RSMI_STATUS_SUCCESS;
+}
+
+/* power in microwatts */
+int rsmi_dev_power_get(uint32_t dv_ind, uint64_t *power, int *type) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *power = (300 + dv_ind) * 1000000ULL;
+    *type = 0;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_power_ave_get(uint32_t dv_ind, uint32_t sensor_ind, uint64_t *power) {
+    int type;
+    return rsmi_dev_power_get(dv_ind, power, &type);
+}
+
+int rsmi_dev_power_cap_get(uint32_t dv_ind, uint32_t sensor_ind, uint64_t *cap) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *cap = 750 * 1000000ULL;
+    return RSMI_STATUS_SUCCESS;
+}
+
+/* clock frequencies in Hz: 0=RSMI_CLK_TYPE_SYS, 4=RSMI_CLK_TYPE_MEM */
+int rsmi_dev_gpu_clk_freq_get(uint32_t dv_ind, int clk_type, rsmi_frequencies_t *frequencies) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    memset(frequencies, 0, sizeof(*frequencies));
+    frequencies->num_supported = 2;
+    frequencies->current = 1;
+    frequencies->frequency[0] = 500 * 1000000ULL;
+    frequencies->frequency[1] = (clk_type == 4 ? 1300 : 2100) * 1000000ULL;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_memory_total_get(uint32_t dv_ind, int mem_type, uint64_t *total) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *total = 64ULL << 30;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_memory_usage_get(uint32_t dv_ind, int mem_type, uint64_t *used) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *used = 16ULL << 30;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_memory_busy_percent_get(uint32_t dv_ind, uint32_t *busy_percent) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *busy_percent = 10 + dv_ind;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_busy_percent_get(uint32_t dv_ind, uint32_t *busy_percent) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *busy_percent = 90 + dv_ind;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_ecc_status_get(uint32_t dv_ind, int block, int *state) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    *state = block == RSMI_GPU_BLOCK_UMC ? RSMI_RAS_ERR_STATE_ENABLED : RSMI_RAS_ERR_STATE_DISABLED;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_ecc_count_get(uint32_t dv_ind, int block, rsmi_error_count_t *ec) {
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    ec->correctable_err = dv_ind;
+    ec->uncorrectable_err = 0;
+    return RSMI_STATUS_SUCCESS;
+}
+
+int rsmi_dev_gpu_metrics_info_get(uint32_t dv_ind, void *pgpu_metrics) {
+    stub_gpu_metrics_t *metrics = pgpu_metrics;
+    if (invalid_device(dv_ind))
+        return RSMI_STATUS_INVALID_ARGS;
+    if (getenv("RSMI_STUB_NO_GPU_METRICS"))
+        return RSMI_STATUS_NOT_SUPPORTED;
+
+    /* unsupported fields are set to all ones */
+    memset(pgpu_metrics, 0xFF, STUB_GPU_METRICS_SIZE);
+    metrics->structure_size = STUB_GPU_METRICS_SIZE;
+    metrics->format_revision = 1;
+    metrics->content_revision = 5;
+    metrics->temperature_edge = 40 + dv_ind;
+    metrics->temperature_mem = 50 + dv_ind;
+    metrics->average_gfx_activity = 90 + dv_ind;
+    metrics->average_umc_activity = 10 + dv_ind;
+    metrics->average_socket_power = 300 + dv_ind;
+    metrics->current_gfxclk = 2100;
+    metrics->current_uclk = 1300;
+    return RSMI_STATUS_SUCCESS;
+}
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+
+from omnistat import capture
+from omnistat.push_sender import SpilledBatch, SpillLog
+from omnistat.sample_buffer import SampleBuffer
+
+pyarrow = pytest.importorskip("pyarrow")
+
+
+def make_batch():
+    buffer = SampleBuffer(chunkSamples=2)
+    power = buffer.seriesId('power{card="0",instance="node01"} ')
+    ready = buffer.seriesId("ready ")
+    buffer.append(1700000000000, [power, ready], [100.0, 1.0])
+    buffer.append(1700000001000, [power, ready], [110.0, np.nan])
+    buffer.append(1700000002000, [power], [120.0])
+    buffer.appendLine('omnistat_fom{instance="node01",name="loss"} 0.5 1700000001500')
+    return buffer.drain()
+
+
+class TestCapture:
+    def test_batch_table(self):
+        table = capture.batchTable(make_batch())
+        assert table.schema == capture.schema()
+        rows = table.to_pylist()
+        assert [(row["name"], row["labels"], row["value"]) for row in rows] == [
+            ("power", 'card="0",instance="node01"', 100.0),
+            ("ready", "", 1.0),
+            ("power", 'card="0",instance="node01"', 110.0),
+            ("power", 'card="0",instance="node01"', 120.0),
+            ("omnistat_fom", 'instance="node01",name="loss"', 0.5),
+        ]
+        assert table.column("timestamp").cast(pyarrow.int64()).to_pylist() == [
+            1700000000000,
+            1700000000000,
+            1700000001000,
+            1700000002000,
+            1700000001500,
+        ]
+
+    def test_spilled_batch(self, tmp_path):
+        log = SpillLog(str(tmp_path), 1024 * 1024)
+        assert log.append(make_batch())
+        spilled = log.oldest()
+        assert isinstance(spilled, SpilledBatch)
+        assert capture.batchTable(spilled).to_pylist() == capture.batchTable(make_batch()).to_pylist()
+
+    @pytest.mark.parametrize("fmt", capture.FORMATS)
+    def test_write_and_read(self, tmp_path, fmt):
+        writer = capture.CaptureWriter(str(tmp_path), "node01", fmt)
+        numBytes = writer.write(make_batch())
+        assert numBytes > 0
+        assert writer.write(SampleBuffer().drain()) == 0
+        assert writer.numFiles == 1
+
+        path = tmp_path / "date=2023-11-14" / "hour=22" / ("omnistat-node01-1700000000000.%s" % fmt)
+        assert os.path.getsize(path) == numBytes
+        assert os.listdir(path.parent) == [path.name]
+
+        table = capture.read(str(tmp_path), fmt)
+        assert table.num_rows == 5
+        assert table.column("hour").to_pylist() == [22] * 5
+
+    def test_unknown_format(self, tmp_path):
+        with pytest.raises(ValueError):
+            capture.CaptureWriter(str(tmp_path), "node01", "csv")
@@ -0,0 +1,216 @@
+import errno
+import struct
+
+import pytest
+
+import omnistat.collector_gpu_metrics
+import omnistat.series
+from omnistat.collector_gpu_metrics import (
+    GPU_METRICS_LAYOUTS,
+    GPUDevice,
+    GPUMetrics,
+    kfd_gpu_ids,
+    select_fields,
+)
+from omnistat.series import SeriesTable
+
+# sizes and field offsets of gpu_metrics_v1_<content> structs in kgd_pp_interface.h
+V1_0 = (80, {"edge": 16, "hotspot": 18, "mem": 20, "gfx": 28, "umc": 30, "power": 34, "gfxclk": 54, "uclk": 58})
+V1_3 = (120, {"edge": 4, "hotspot": 6, "mem": 8, "gfx": 16, "umc": 18, "power": 22, "gfxclk": 54, "uclk": 58})
+V1_5 = (360, {"hotspot": 4, "mem": 6, "power": 10, "gfx": 12, "umc": 14, "gfxclk": 312, "uclk": 352})
+
+
+def make_blob(content, layout, **fields):
+    """Build a gpu_metrics table as read from sysfs, with unsupported fields set to all ones"""
+    size, offsets = layout
+    blob = bytearray(b"\xff" * size)
+    struct.pack_into("<HBB", blob, 0, size, 1, content)
+    for name, value in fields.items():
+        struct.pack_into("<H", blob, offsets[name], value)
+    return bytes(blob)
+
+
+MI250_BLOB = make_blob(3, V1_3, edge=35, hotspot=38, mem=45, gfx=97, umc=12, power=310, gfxclk=1700, uclk=1600)
+MI300_BLOB = make_blob(5, V1_5, hotspot=48, mem=40, gfx=88, umc=20, power=550, gfxclk=2100, uclk=1300)
+
+
+def make_card(drm, card, blob, vram_total=64 << 30, vram_used=16 << 30, **files):
+    device = drm / ("card%i" % card) / "device"
+    device.mkdir(parents=True)
+    (device / "gpu_metrics").write_bytes(blob)
+    (device / "mem_info_vram_total").write_text("%i\n" % vram_total)
+    (device / "mem_info_vram_used").write_text("%i\n" % vram_used)
+    (device / "vbios_version").write_text("113-D65201-042\n")
+    (device / "product_name").write_text("AMD Instinct Stub\n")
+    for name, value in files.items():
+        (device / name).write_text("%s\n" % value)
+    return device
+
+
+@pytest.fixture
+def series_table(monkeypatch):
+    table = SeriesTable()
+    monkeypatch.setattr(omnistat.series, "SERIES", table)
+    monkeypatch.setattr(omnistat.collector_gpu_metrics, "SERIES", table)
+    return table
+
+
+def sample(collector, table):
+    collector.updateSeries(table.values)
+    return dict(zip(table.seriesKeys(), table.values[: len(table)].tolist()))
+
+
+class TestLayouts:
+    def test_offsets(self):
+        for content, (size, offsets) in [(0, V1_0), (3, V1_3), (5, V1_5)]:
+            dtype = GPU_METRICS_LAYOUTS[(1, content)]
+            assert dtype.itemsize == size
+            assert dtype.fields["current_uclk"][1] == offsets["uclk"]
+            assert dtype.fields["average_umc_activity"][1] == offsets["umc"]
+        # revision 0 starts with system_clock_counter, and has a 32-bit energy_accumulator
+        v1_0 = GPU_METRICS_LAYOUTS[(1, 0)]
+        assert v1_0.fields["system_clock_counter"][1] == 8
+        assert v1_0.fields["temperature_edge"][1] == V1_0[1]["edge"]
+        assert v1_0.fields["energy_accumulator"][0].itemsize == 4
+        assert GPU_METRICS_LAYOUTS[(1, 1)].itemsize == 96
+        assert GPU_METRICS_LAYOUTS[(1, 4)].itemsize == 288
+        assert GPU_METRICS_LAYOUTS[(1, 4)].fields["current_gfxclk"][1] == 240
+
+    def test_select_fields(self):
+        assert select_fields(MI250_BLOB) == {
+            "temperature_celsius": ("temperature_edge", None, "edge"),
+            "temperature_memory_celsius": ("temperature_mem", None, "vram"),
+            "average_socket_power_watts": ("average_socket_power", None, None),
+            "sclk_clock_mhz": ("current_gfxclk", 0, None),
+            "mclk_clock_mhz": ("current_uclk", None, None),
+            "vram_busy_percentage": ("average_umc_activity", None, None),
+            "utilization_percentage": ("average_gfx_activity", None, None),
+        }
+        selection = select_fields(MI300_BLOB)
+        assert selection["temperature_celsius"] == ("temperature_hotspot", None, "junction")
+        assert selection["average_socket_power_watts"] == ("curr_socket_power", None, None)
+
+
+class TestCollector:
+    def test_sample(self, tmp_path, series_table):
+        make_card(tmp_path, 1, MI300_BLOB)
+        make_card(tmp_path, 0, MI300_BLOB)
+        (tmp_path / "card0-DP-1").mkdir()
+        collector = GPUMetrics(drmPath=str(tmp_path), kfdNodesPath=str(tmp_path / "kfd"))
+        collector.registerMetrics()
+        values = sample(collector, series_table)
+
+        assert values["rocm_num_gpus"] == 2
+        assert values['rocm_temperature_celsius{card="1",location="junction"}'] == 48
+        assert values['rocm_temperature_memory_celsius{card="1",location="vram"}'] == 40
+        assert values['rocm_average_socket_power_watts{card="1"}'] == 550
+        assert values['rocm_sclk_clock_mhz{card="1"}'] == 2100
+        assert values['rocm_mclk_clock_mhz{card="1"}'] == 1300
+        assert values['rocm_vram_busy_percentage{card="1"}'] == 20
+        assert values['rocm_utilization_percentage{card="1"}'] == 88
+        assert values['rocm_vram_total_bytes{card="1"}'] == 64 << 30
+        assert values['rocm_vram_used_percentage{card="1"}'] == 25.0
+
+    def test_sample_v1_0(self, tmp_path, series_table):
+        blob = make_blob(0, V1_0, edge=30, hotspot=33, mem=41, gfx=75, umc=9, power=220, gfxclk=1500, uclk=1000)
+        make_card(tmp_path, 0, blob)
+        collector = GPUMetrics(drmPath=str(tmp_path), kfdNodesPath=str(tmp_path / "kfd"))
+        collector.registerMetrics()
+        values = sample(collector, series_table)
+
+        assert values['rocm_temperature_celsius{card="0",location="edge"}'] == 30
+        assert values['rocm_temperature_memory_celsius{card="0",location="vram"}'] == 41
+        assert values['rocm_average_socket_power_watts{card="0"}'] == 220
+        assert values['rocm_sclk_clock_mhz{card="0"}'] == 1500
+        assert values['rocm_mclk_clock_mhz{card="0"}'] == 1000
+        assert values['rocm_utilization_percentage{card="0"}'] == 75
+
+    def test_reread(self, tmp_path, series_table):
+        device = make_card(tmp_path, 0, MI250_BLOB)
+        collector = GPUMetrics(drmPath=str(tmp_path), kfdNodesPath=str(tmp_path / "kfd"))
+        collector.registerMetrics()
+        assert sample(collector, series_table)['rocm_utilization_percentage{card="0"}'] == 97
+
+        # files stay open and are read again in place
+        with open(device / "gpu_metrics", "r+b") as f:
+            f.write(make_blob(3, V1_3, edge=36, gfx=50))
+        with open(device / "mem_info_vram_used", "r+") as f:
+            f.write("%i\n" % (32 << 30))
+        values = sample(collector, series_table)
+        assert values['rocm_utilization_percentage{card="0"}'] == 50
+        assert values['rocm_temperature_celsius{card="0",location="edge"}'] == 36
+        assert values['rocm_vram_used_percentage{card="0"}'] == 50.0
+
+        # tables with a different revision are ignored
+        (device / "gpu_metrics").write_bytes(MI300_BLOB)
+        assert sample(collector, series_table)['rocm_utilization_percentage{card="0"}'] == 50
+
+    def test_text_fallback(self, tmp_path, series_table):
+        blob = make_blob(3, V1_3, edge=35, power=300, gfxclk=1700, uclk=1600)
+        make_card(tmp_path, 0, blob, gpu_busy_percent=42)
+        collector = GPUMetrics(drmPath=str(tmp_path), kfdNodesPath=str(tmp_path / "kfd"))
+        collector.registerMetrics()
+        values = sample(collector, series_table)
+        assert values['rocm_utilization_percentage{card="0"}'] == 42
+        assert "rocm_vram_busy_percentage" not in series_table.families()
+
+    def test_open_error(self, tmp_path, series_table, caplog):
+        blob = make_blob(3, V1_3, edge=35, power=300, gfxclk=1700, uclk=1600)
+        make_card(tmp_path, 0, blob, gpu_busy_percent=42)
+        make_card(tmp_path, 1, blob)
+        (tmp_path / "card1" / "device" / "mem_info_vram_used").unlink()
+        collector = GPUMetrics(drmPath=str(tmp_path), kfdNodesPath=str(tmp_path / "kfd"))
+        collector.registerMetrics()
+
+        # text files missing on any card skip the metric, or the VRAM use of that card
+        assert "Skipping utilization_percentage: unable to open gpu_busy_percent" in caplog.text
+        assert "Skipping VRAM use of card1: unable to open mem_info_vram_used" in caplog.text
+        values = sample(collector, series_table)
+        assert "rocm_utilization_percentage" not in series_table.families()
+        assert values['rocm_vram_used_percentage{card="0"}'] == 25.0
+        assert values['rocm_vram_total_bytes{card="1"}'] == 64 << 30
+        assert values['rocm_temperature_celsius{card="1",location="edge"}'] == 35
+
+    def test_unsupported_revision(self, tmp_path, series_table):
+        make_card(tmp_path, 0, make_blob(3, V1_3)[:2] + bytes([2, 1]) + make_blob(3, V1_3)[4:])
+        make_card(tmp_path, 1, MI250_BLOB[:100])
+        collector = GPUMetrics(drmPath=str(tmp_path), kfdNodesPath=str(tmp_path / "kfd"))
+        collector.registerMetrics()
+        assert sample(collector, series_table) == {"rocm_num_gpus": 0}
+
+    def test_read_error(self, tmp_path, series_table, monkeypatch, caplog):
+        make_card(tmp_path, 0, MI300_BLOB)
+        make_card(tmp_path, 1, MI300_BLOB)
+        read, close = GPUDevice.read, GPUDevice.close
+        closed = []
+
+        def failingRead(device):
+            if device.card == 0:
+                raise OSError(errno.EIO, "Input/output error")
+            return read(device)
+
+        def recordClose(device):
+            closed.append(device.card)
+            close(device)
+
+        monkeypatch.setattr(GPUDevice, "read", failingRead)
+        monkeypatch.setattr(GPUDevice, "close", recordClose)
+        collector = GPUMetrics(drmPath=str(tmp_path), kfdNodesPath=str(tmp_path / "kfd"))
+        collector.registerMetrics()
+
+        # devices that cannot be read are closed and skipped
+        assert closed == [0]
+        assert "Skipping card0: unable to read gpu_metrics" in caplog.text
+        values = sample(collector, series_table)
+        assert values["rocm_num_gpus"] == 1
+        assert values['rocm_utilization_percentage{card="0"}'] == 88
+
+
+def test_kfd_gpu_ids(tmp_path):
+    for node, (minor, gpuId) in enumerate([(None, 0), (128, 45678), (129, 12345)]):
+        path = tmp_path / str(node)
+        path.mkdir()
+        (path / "gpu_id").write_text("%i\n" % gpuId)
+        properties = "cpu_cores_count 64\n" if minor is None else "drm_render_minor %i\n" % minor
+        (path / "properties").write_text(properties)
+    assert kfd_gpu_ids(str(tmp_path)) == {128: 45678, 129: 12345}
@@ -0,0 +1,66 @@
+import pytest
+
+import omnistat.collector_network
+import omnistat.series
+from omnistat.collector_network import NETWORK
+from omnistat.series import SeriesTable
+
+
+def write(path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("%s\n" % value)
+
+
+@pytest.fixture
+def series_table(monkeypatch):
+    table = SeriesTable()
+    monkeypatch.setattr(omnistat.series, "SERIES", table)
+    monkeypatch.setattr(omnistat.collector_network, "SERIES", table)
+    return table
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    """Fake /sys/class tree with one device of every class"""
+    write(tmp_path / "net/lo/statistics/rx_bytes", 999)
+    write(tmp_path / "net/eth0/statistics/rx_bytes", 1000)
+    write(tmp_path / "net/eth0/statistics/tx_bytes", 2000)
+
+    # CXI telemetry is binned by packet size, reported as "<count>@<timestamp>"
+    telemetry = tmp_path / "cxi/cxi0/device/telemetry"
+    write(telemetry / "hni_rx_ok_27", "10@1700000000.123")
+    write(telemetry / "hni_rx_ok_64", "3@1700000000.123")
+    write(telemetry / "hni_rx_ok_8192_to_max", "2@1700000000.123")
+    write(telemetry / "hni_tx_ok_36_to_63", "5@1700000000.123")
+
+    # infiniband counters are reported in units of 4 bytes
+    counters = tmp_path / "infiniband/mlx5_0/ports/1/counters"
+    write(counters / "port_rcv_data", 100)
+    write(counters / "port_xmit_data", 250)
+    return tmp_path
+
+
+def sample(collector, table):
+    collector.updateSeries(table.values)
+    return dict(zip(table.seriesKeys(), table.values[: len(table)].tolist()))
+
+
+def test_device_classes(sysfs, series_table):
+    collector = NETWORK(sysfsPath=str(sysfs))
+    collector.registerMetrics()
+    values = sample(collector, series_table)
+
+    assert values == {
+        'omnistat_network_rx_bytes{device_class="net",interface="eth0"}': 1000,
+        'omnistat_network_tx_bytes{device_class="net",interface="eth0"}': 2000,
+        'omnistat_network_rx_bytes{device_class="cxi",interface="cxi0"}': 10 * 27 + 3 * 64 + 2 * 8192,
+        'omnistat_network_tx_bytes{device_class="cxi",interface="cxi0"}': 5 * 36,
+        'omnistat_network_rx_bytes{device_class="infiniband",interface="mlx5_0:1"}': 400,
+        'omnistat_network_tx_bytes{device_class="infiniband",interface="mlx5_0:1"}': 1000,
+    }
+
+    write(sysfs / "cxi/cxi0/device/telemetry/hni_tx_ok_36_to_63", "6@1700000001.456")
+    write(sysfs / "infiniband/mlx5_0/ports/1/counters/port_rcv_data", 101)
+    values = sample(collector, series_table)
+    assert values['omnistat_network_tx_bytes{device_class="cxi",interface="cxi0"}'] == 6 * 36
+    assert values['omnistat_network_rx_bytes{device_class="infiniband",interface="mlx5_0:1"}'] == 404
@@ -0,0 +1,151 @@
+import ctypes
+
+import pytest
+
+import omnistat.collector_smi
+import omnistat.series
+from omnistat.collector_smi import (
+    ROCMSMI,
+    RSMI_GPU_METRICS_BUFFER_SIZE,
+    RSMI_GPU_METRICS_INVALID_16,
+    RSMIBindings,
+    RSMIDevice,
+    get_rsmi_gpu_metrics_type,
+    gpu_metrics_decoders,
+)
+from omnistat.series import SeriesTable
+from test.bench_collector_smi import build_stub, find_compiler
+
+
+def make_gpu_metrics(**fields):
+    metrics = get_rsmi_gpu_metrics_type({"major": 7, "minor": 0, "patch": 0})
+    ctypes.memset(ctypes.byref(metrics), 0xFF, ctypes.sizeof(metrics))
+    for name, value in fields.items():
+        if isinstance(value, list):
+            getattr(metrics, name)[: len(value)] = value
+        else:
+            setattr(metrics, name, value)
+    return metrics
+
+
+class TestGPUMetrics:
+    def test_layout(self):
+        assert get_rsmi_gpu_metrics_type({"major": 6, "minor": 0, "patch": 0}) is None
+        metrics = get_rsmi_gpu_metrics_type({"major": 7, "minor": 0, "patch": 0})
+        layout = type(metrics)
+        # offsets in rsmi_gpu_metrics_t (rocm_smi.h)
+        assert layout.energy_accumulator.offset == 24
+        assert layout.throttle_status.offset == 68
+        assert layout.temperature_hbm.offset == 88
+        assert layout.current_socket_power.offset == 120
+        assert layout.current_gfxclks.offset == 312
+        assert ctypes.sizeof(metrics) == RSMI_GPU_METRICS_BUFFER_SIZE
+
+    def test_decoders(self):
+        metrics = make_gpu_metrics(
+            temperature_hotspot=45,
+            temperature_hbm=[40, 41, 42, 43],
+            current_socket_power=550,
+            current_gfxclks=[2100],
+            current_uclk=1300,
+            average_umc_activity=12,
+            average_gfx_activity=97,
+        )
+        decoders = gpu_metrics_decoders(metrics, "junction", "hbm_2")
+        assert {metric: decode(metrics) for metric, decode in decoders.items()} == {
+            "temperature_celsius": 45,
+            "temperature_memory_celsius": 42,
+            "average_socket_power_watts": 550,
+            "sclk_clock_mhz": 2100,
+            "mclk_clock_mhz": 1300,
+            "vram_busy_percentage": 12,
+            "utilization_percentage": 97,
+        }
+
+    def test_unsupported_fields(self):
+        metrics = make_gpu_metrics(temperature_edge=30, average_socket_power=300, current_gfxclk=1500)
+        decoders = gpu_metrics_decoders(metrics, "edge", None)
+        assert set(decoders) == {"temperature_celsius", "average_socket_power_watts", "sclk_clock_mhz"}
+        assert metrics.current_uclk == RSMI_GPU_METRICS_INVALID_16
+
+
+@pytest.fixture
+def stub_rocm(tmp_path, monkeypatch):
+    if find_compiler() is None:
+        pytest.skip("no C compiler available to build the stub SMI library")
+    build_stub(str(tmp_path))
+    monkeypatch.setenv("RSMI_STUB_NUM_GPUS", "2")
+    table = SeriesTable()
+    monkeypatch.setattr(omnistat.series, "SERIES", table)
+    monkeypatch.setattr(omnistat.collector_smi, "SERIES", table)
+    return str(tmp_path)
+
+
+def make_collector(rocmPath, gpu_workers=False):
+    runtimeConfig = {
+        "collector_ras_ecc": True,
+        "collector_power_capping": True,
+        "collector_cu_occupancy": False,
+        "collector_gpu_workers": gpu_workers,
+        "collector_rocm_path": rocmPath,
+    }
+    collector = ROCMSMI(runtimeConfig)
+    collector.registerMetrics()
+    return collector
+
+
+def sample(rocmPath, gpu_workers=False):
+    collector = make_collector(rocmPath, gpu_workers)
+    collector.updateSeries(omnistat.series.SERIES.values)
+    table = omnistat.series.SERIES
+    return dict(zip(table.seriesKeys(), table.values[: len(table)].tolist()))
+
+
+class TestStubLibrary:
+    def test_bindings(self, stub_rocm):
+        library = ctypes.CDLL(stub_rocm + "/lib/librocm_smi64.so")
+        checked = RSMIBindings(library)
+        unchecked = RSMIBindings(library, checked=False)
+        assert checked.rsmi_dev_busy_percent_get is not unchecked.rsmi_dev_busy_percent_get
+        assert unchecked.rsmi_dev_busy_percent_get.argtypes is None
+
+        gpu = RSMIDevice(1, {"major": 7, "minor": 4, "patch": 0})
+        for bindings in (checked, unchecked):
+            gpu.utilization.value = 0
+            assert bindings.rsmi_dev_busy_percent_get(gpu.device, gpu.utilizationPtr) == 0
+            assert gpu.utilization.value == 91
+        with pytest.raises(ctypes.ArgumentError):
+            checked.rsmi_dev_busy_percent_get(gpu.device, gpu.powerPtr)
+
+    @pytest.mark.parametrize("gpu_metrics", [True, False])
+    @pytest.mark.parametrize("gpu_workers", [False, True])
+    def test_sample(self, stub_rocm, monkeypatch, gpu_metrics, gpu_workers):
+        if not gpu_metrics:
+            monkeypatch.setenv("RSMI_STUB_NO_GPU_METRICS", "1")
+        values = sample(stub_rocm, gpu_workers)
+        assert values["rocm_num_gpus"] == 2
+        assert values['rocm_temperature_celsius{card="1",location="edge"}'] == 41
+        assert values['rocm_temperature_memory_celsius{card="1",location="vram"}'] == 51
+        assert values['rocm_average_socket_power_watts{card="1"}'] == 301
+        assert values['rocm_sclk_clock_mhz{card="1"}'] == 2100
+        assert values['rocm_mclk_clock_mhz{card="1"}'] == 1300
+        assert values['rocm_vram_total_bytes{card="1"}'] == 64 << 30
+        assert values['rocm_vram_used_percentage{card="1"}'] == 25.0
+        assert values['rocm_vram_busy_percentage{card="1"}'] == 11
+        assert values['rocm_utilization_percentage{card="1"}'] == 91
+        assert values['rocm_power_cap_watts{card="1"}'] == 750
+        assert values['rocm_ras_umc_correctable_count{card="1"}'] == 1
+        assert values['rocm_ras_umc_uncorrectable_count{card="1"}'] == 0
+
+    def test_gpu_workers(self, stub_rocm, monkeypatch):
+        monkeypatch.setenv("RSMI_STUB_NUM_GPUS", "4")
+        monkeypatch.setenv("RSMI_STUB_NO_GPU_METRICS", "1")
+        collector = make_collector(stub_rocm, gpu_workers=True)
+        values = omnistat.series.SERIES.values
+
+        # with a driver latency, queries to different GPUs are in flight at the same time
+        monkeypatch.setenv("RSMI_STUB_LATENCY_US", "5000")
+        collector.updateSeries(values)
+        library = ctypes.CDLL(stub_rocm + "/lib/librocm_smi64.so")
+        assert ctypes.c_int.in_dll(library, "stub_max_concurrent_queries").value > 1
+        assert values[: len(omnistat.series.SERIES)].tolist().count(750) == 4
@@ -0,0 +1,76 @@
+import importlib
+import sys
+
+import pytest
+
+import omnistat.series
+import test.amdsmi_stub as amdsmi_stub
+from omnistat.series import SeriesTable
+
+
+@pytest.fixture
+def stub_amdsmi(monkeypatch):
+    """Import the AMD SMI collector against the stub amdsmi module, with a private series table"""
+    monkeypatch.setenv("AMDSMI_STUB_NUM_GPUS", "2")
+    monkeypatch.setitem(sys.modules, "amdsmi", amdsmi_stub)
+    monkeypatch.delitem(sys.modules, "omnistat.collector_smi_v2", raising=False)
+    module = importlib.import_module("omnistat.collector_smi_v2")
+    table = SeriesTable()
+    monkeypatch.setattr(omnistat.series, "SERIES", table)
+    monkeypatch.setattr(module, "SERIES", table)
+    amdsmi_stub.calls.clear()
+    yield module, table
+    sys.modules.pop("omnistat.collector_smi_v2", None)
+
+
+def make_collector(module, gpu_workers=False):
+    runtimeConfig = {
+        "collector_ras_ecc": True,
+        "collector_power_capping": True,
+        "collector_cu_occupancy": False,
+        "collector_vcn": True,
+        "collector_gpu_workers": gpu_workers,
+    }
+    collector = module.AMDSMI(runtimeConfig)
+    collector.registerMetrics()
+    return collector
+
+
+def sample(collector, table):
+    collector.updateSeries(table.values)
+    return dict(zip(table.seriesKeys(), table.values[: len(table)].tolist()))
+
+
+@pytest.mark.parametrize("gpu_workers", [False, True])
+def test_sample(stub_amdsmi, gpu_workers):
+    module, table = stub_amdsmi
+    collector = make_collector(module, gpu_workers)
+    values = sample(collector, table)
+
+    assert values["rocm_num_gpus"] == 2
+    for card in range(2):
+        assert values['rocm_temperature_celsius{card="%i",location="edge"}' % card] == 40 + card
+        assert values['rocm_temperature_memory_celsius{card="%i",location="vram"}' % card] == 50 + card
+        assert values['rocm_utilization_percentage{card="%i"}' % card] == 88
+        assert values['rocm_vram_busy_percentage{card="%i"}' % card] == 20
+        assert values['rocm_sclk_clock_mhz{card="%i",source="average_gfxclk_frequency"}' % card] == 2100
+        assert values['rocm_mclk_clock_mhz{card="%i",source="average_uclk_frequency"}' % card] == 1300
+        assert values['rocm_average_socket_power_watts{card="%i",source="current_socket_power"}' % card] == 550
+        assert values['rocm_average_decoder_utilization_percentage{card="%i"}' % card] == 15
+        assert values['rocm_vram_total_bytes{card="%i"}' % card] == 64 << 30
+        assert values['rocm_vram_used_percentage{card="%i"}' % card] == 25.0
+        assert values['rocm_ras_umc_correctable_count{card="%i"}' % card] == card
+        assert values['rocm_power_cap_watts{card="%i"}' % card] == 750
+
+
+def test_static_values(stub_amdsmi):
+    module, table = stub_amdsmi
+    collector = make_collector(module)
+
+    # VRAM size is queried once per GPU at registration, and samples only query dynamic values
+    assert amdsmi_stub.calls["amdsmi_get_gpu_memory_total"] == 2
+    assert sample(collector, table)['rocm_vram_total_bytes{card="1"}'] == 64 << 30
+    amdsmi_stub.calls.clear()
+    sample(collector, table)
+    assert amdsmi_stub.calls["amdsmi_get_gpu_memory_total"] == 0
+    assert amdsmi_stub.calls["amdsmi_get_gpu_metrics_info"] == 2
@@ -0,0 +1,113 @@
+import http.client
+import json
+import socket
+import threading
+import time
+
+import pytest
+
+from omnistat.control_server import ControlServer
+
+
+def request(port, method, path, body=b"", path_or_addr=None):
+    if path_or_addr:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path_or_addr)
+    else:
+        sock = socket.create_connection(("127.0.0.1", port))
+    with sock:
+        sock.sendall(
+            b"%s %s HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\nContent-Length: %i\r\n\r\n%s"
+            % (method.encode(), path.encode(), len(body), body)
+        )
+        response = b""
+        while True:
+            data = sock.recv(4096)
+            if not data:
+                break
+            response += data
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+@pytest.fixture
+def release():
+    return threading.Event()
+
+
+@pytest.fixture
+def server(tmp_path, release):
+    def echo(body):
+        return 200, json.loads(body)
+
+    def wait(body):
+        release.wait(5)
+        return 200, {"message": "done"}
+
+    routes = {
+        ("GET", "/metrics"): lambda body: (200, {"status": "ok"}),
+        ("POST", "/echo"): echo,
+        ("GET", "/wait"): wait,
+    }
+    server = ControlServer(routes, port=0, host="127.0.0.1", unixSocket=str(tmp_path / "control.sock"))
+    server.start()
+    yield server
+    release.set()
+    server.close()
+
+
+class TestControlServer:
+    def test_routes(self, server):
+        assert request(server.port, "GET", "/metrics") == (200, {"status": "ok"})
+        assert request(server.port, "POST", "/echo", b'{"name": "fom", "value": 1.5}') == (
+            200,
+            {"name": "fom", "value": 1.5},
+        )
+        assert request(server.port, "GET", "/echo")[0] == 405
+        assert request(server.port, "GET", "/missing")[0] == 404
+        # handler failures are reported to the client
+        assert request(server.port, "POST", "/echo", b"not json")[0] == 500
+
+    def test_persistent_connection(self, server):
+        connection = http.client.HTTPConnection("127.0.0.1", server.port)
+        sockets = set()
+        for i in range(3):
+            connection.request("POST", "/echo", body=json.dumps({"i": i}))
+            response = connection.getresponse()
+            assert json.loads(response.read()) == {"i": i}
+            sockets.add(connection.sock)
+        assert len(sockets) == 1
+        connection.close()
+
+    def test_unix_socket(self, server, tmp_path):
+        path = str(tmp_path / "control.sock")
+        assert request(None, "GET", "/metrics", path_or_addr=path) == (200, {"status": "ok"})
+
+    def test_blocking_handler(self, server, release):
+        # a blocked handler does not prevent other requests from being served
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(wait=request(server.port, "GET", "/wait")))
+        thread.start()
+        time.sleep(0.1)
+        assert request(server.port, "GET", "/metrics")[0] == 200
+        release.set()
+        thread.join(5)
+        assert result["wait"] == (200, {"message": "done"})
+
+    def test_forbidden(self):
+        server = ControlServer({("POST", "/echo"): lambda body: (200, {})}, port=0, allowedIPs=("10.0.0.1",))
+        server.start()
+        try:
+            # the connection is closed without reading the request or waiting for the announced body
+            with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+                sock.sendall(b"POST /echo HTTP/1.1\r\nHost: localhost\r\nContent-Length: 10000000\r\n\r\n")
+                try:
+                    assert sock.recv(4096) == b""
+                except ConnectionResetError:
+                    pass
+        finally:
+            server.close()
+
+    def test_bind_error(self, server):
+        with pytest.raises(OSError):
+            ControlServer({}, port=server.port, host="127.0.0.1").start()
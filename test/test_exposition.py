@@ -0,0 +1,67 @@
+import gzip
+
+import pytest
+
+from omnistat import exposition
+from omnistat.series import SeriesGauge, SeriesTable
+
+
+@pytest.fixture
+def table():
+    table = SeriesTable()
+    seriesId = SeriesGauge("rocm_utilization_percentage", "GPU use (%)", ["card"], table=table).series(card=0)
+    table.values[seriesId] = 42
+    return table
+
+
+class TestNegotiation:
+    def test_format(self):
+        assert exposition.negotiateFormat(None) == exposition.TEXT
+        assert exposition.negotiateFormat("text/plain;version=0.0.4;q=0.5,*/*;q=0.1") == exposition.TEXT
+        accept = "application/openmetrics-text;version=1.0.0;q=0.5,text/plain;version=0.0.4;q=0.4"
+        assert exposition.negotiateFormat(accept) == exposition.OPENMETRICS
+        assert exposition.negotiateFormat("application/openmetrics-text;q=0") == exposition.TEXT
+
+    def test_format_quality(self):
+        accept = "application/openmetrics-text;version=1.0.0;q=0.3,text/plain;version=0.0.4;q=0.8"
+        assert exposition.negotiateFormat(accept) == exposition.TEXT
+        assert exposition.negotiateFormat("application/openmetrics-text;q=0.5,*/*;q=0.5") == exposition.TEXT
+        assert exposition.negotiateFormat("application/openmetrics-text;q=0.5,*/*;q=0.2") == exposition.OPENMETRICS
+        # default Accept header sent by Prometheus
+        accept = (
+            "application/openmetrics-text;version=1.0.0;q=0.5,application/openmetrics-text;version=0.0.1;q=0.4,"
+            "text/plain;version=0.0.4;q=0.3,*/*;q=0.2"
+        )
+        assert exposition.negotiateFormat(accept) == exposition.OPENMETRICS
+
+    def test_encoding(self):
+        assert exposition.negotiateEncoding(None) == exposition.IDENTITY
+        assert exposition.negotiateEncoding("gzip") == exposition.GZIP
+        assert exposition.negotiateEncoding("deflate, gzip;q=0.5") == exposition.GZIP
+        assert exposition.negotiateEncoding("gzip;q=0") == exposition.IDENTITY
+        assert exposition.negotiateEncoding("br") == exposition.IDENTITY
+
+    def test_zstd_preferred(self, monkeypatch):
+        monkeypatch.setattr(exposition, "zstandard", object())
+        assert exposition.negotiateEncoding("gzip, zstd") == exposition.ZSTD
+        assert exposition.negotiateEncoding("gzip, zstd;q=0.5") == exposition.GZIP
+        monkeypatch.setattr(exposition, "zstandard", None)
+        assert exposition.negotiateEncoding("zstd") == exposition.IDENTITY
+
+
+class TestRender:
+    def test_text(self, table):
+        body = exposition.render(exposition.TEXT, table).decode()
+        assert 'rocm_utilization_percentage{card="0"} 42.0\n' in body
+        assert "# EOF" not in body
+
+    def test_openmetrics(self, table):
+        body = exposition.render(exposition.OPENMETRICS, table).decode()
+        assert 'rocm_utilization_percentage{card="0"} 42.0\n' in body
+        assert body.endswith("# EOF\n")
+        assert body.count("# EOF") == 1
+
+    def test_gzip(self, table):
+        body = exposition.render(exposition.TEXT, table)
+        assert gzip.decompress(exposition.encode(body, exposition.GZIP)) == body
+        assert exposition.encode(body, exposition.IDENTITY) is body
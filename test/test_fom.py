@@ -0,0 +1,121 @@
+import json
+import socket
+
+import pytest
+
+import omnistat.fom
+import omnistat.standalone
+from omnistat.control_server import ControlServer
+from omnistat.fom import Reporter
+
+
+@pytest.fixture
+def fom_data(monkeypatch):
+    data = []
+    monkeypatch.setattr(omnistat.standalone, "fomData", data)
+    return data
+
+
+@pytest.fixture
+def server(tmp_path, fom_data):
+    server = ControlServer(
+        {("POST", "/fom/batch"): omnistat.standalone.figureOfMeritBatch},
+        port=0,
+        host="127.0.0.1",
+        unixSocket=str(tmp_path / "control.sock"),
+    )
+    server.start()
+    yield server
+    server.close()
+
+
+class TestBatchEndpoint:
+    def test_batch(self, fom_data):
+        body = b'{"names": ["a", "b"], "values": [1, 2.5], "timestamps_msecs": [1000, 2000]}'
+        assert omnistat.standalone.figureOfMeritBatch(body) == (200, {"status": "ok", "samples": 2})
+        assert fom_data == [
+            {"name": "a", "value": 1.0, "timestamp_msecs": 1000},
+            {"name": "b", "value": 2.5, "timestamp_msecs": 2000},
+        ]
+
+    def test_invalid_batch(self, fom_data):
+        assert omnistat.standalone.figureOfMeritBatch(b'{"names": ["a"], "values": [1, 2]}')[0] == 400
+        assert omnistat.standalone.figureOfMeritBatch(b'{"names": ["a"], "values": ["x"]}')[0] == 400
+        assert fom_data == []
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            # strings are not zipped character by character
+            b'{"names": "ab", "values": [1, 2]}',
+            b'{"names": {"a": 1}, "values": [1]}',
+            b'{"names": [1], "values": [1]}',
+            b'{"names": ["a"], "values": [NaN]}',
+            b'{"names": ["a"], "values": [Infinity]}',
+            b'{"names": ["a"], "values": ["-inf"]}',
+            b'{"names": ["a"], "values": [1], "timestamps_msecs": [1.5]}',
+            b'{"names": ["a"], "values": [1], "timestamps_msecs": [-1000]}',
+            b'{"names": ["a"], "values": [1], "timestamps_msecs": ["1000"]}',
+            b'{"names": ["a"], "values": [1], "timestamps_msecs": [true]}',
+            b'{"names": ["a", "b"], "values": [1, 2], "timestamps_msecs": [1000]}',
+        ],
+    )
+    def test_rejected_batch(self, fom_data, body):
+        assert omnistat.standalone.figureOfMeritBatch(body)[0] == 400
+        assert fom_data == []
+
+    def test_escaped_names(self, fom_data):
+        # names cannot close the label value and inject other series
+        name = 'a"} injected 1 1000\nother{name="b'
+        body = json.dumps({"names": [name], "values": [1], "timestamps_msecs": [1000]})
+        assert omnistat.standalone.figureOfMeritBatch(body)[0] == 200
+        assert fom_data[0]["name"] == 'a\\"} injected 1 1000\\nother{name=\\"b'
+
+
+class TestReporter:
+    def test_report_tcp(self, server, fom_data):
+        reporter = Reporter(url="http://127.0.0.1:%i" % server.port, flushInterval=60, batchSize=4)
+        for i in range(10):
+            reporter.report("throughput", float(i), timestamp=100 + i)
+        assert reporter.flush()
+        reporter.close()
+
+        assert reporter.sent == 10
+        assert [entry["value"] for entry in fom_data] == [float(i) for i in range(10)]
+        assert fom_data[0]["timestamp_msecs"] == 100000
+
+    def test_report_unix_socket(self, server, fom_data, tmp_path):
+        reporter = Reporter(socketPath=str(tmp_path / "control.sock"), flushInterval=60)
+        reporter.report("loss", 0.5)
+        reporter.close()
+        assert [entry["name"] for entry in fom_data] == ["loss"]
+
+    def test_oldest_dropped(self, monkeypatch):
+        monkeypatch.setattr(omnistat.fom, "MAX_PENDING", 4)
+        reporter = Reporter(url="http://127.0.0.1:1", flushInterval=60)
+        delivered = []
+        reporter.send = lambda batch: False
+        for i in range(5):
+            reporter.report("step", float(i))
+        assert not reporter.flush()
+
+        # samples reported while the exporter is unavailable push out the oldest ones
+        reporter.report("step", 5.0)
+        reporter.report("step", 6.0)
+        assert not reporter.flush()
+        reporter.send = lambda batch: delivered.extend(batch) or True
+        assert reporter.flush()
+        assert [value for _, value, _ in delivered] == [3.0, 4.0, 5.0, 6.0]
+        reporter.close()
+
+    def test_exporter_unavailable(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        reporter = Reporter(url="http://127.0.0.1:%i" % port, flushInterval=60, timeout=0.5)
+        reporter.report("loss", 0.5)
+        # samples are kept for a later attempt
+        assert not reporter.flush()
+        assert not reporter.flush()
+        assert reporter.sent == 0
+        reporter.close()
@@ -0,0 +1,361 @@
+import configparser
+import gzip
+import threading
+import time
+
+import pytest
+from prometheus_client import REGISTRY, Gauge
+
+import omnistat.monitor
+import omnistat.series
+from omnistat.collector_base import Collector
+from omnistat.collector_rms import RMSJob
+from omnistat.monitor import Monitor
+from omnistat.series import SeriesGauge, SeriesTable
+from omnistat.shm_ring import RingReader
+
+
+class SleepyCollector(Collector):
+    """Collector with a configurable update duration, used to exercise deadlines."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.updates = 0
+        self.release = threading.Event()
+
+    def registerMetrics(self):
+        pass
+
+    def updateMetrics(self):
+        if self.delay:
+            self.release.wait(self.delay)
+        self.updates += 1
+
+
+class SeriesCollector(Collector):
+    """Collector publishing through the series table."""
+
+    supportsSeries = True
+
+    def __init__(self):
+        self.updates = 0
+
+    def registerMetrics(self):
+        self.__seriesId = SeriesGauge("test_series_value", "test value", labelnames=["card"]).series(card=0)
+
+    def updateMetrics(self):
+        raise AssertionError("series collectors are sampled through updateSeries()")
+
+    def updateSeries(self, values):
+        self.updates += 1
+        values[self.__seriesId] = self.updates
+
+
+class MidUpdateCollector(Collector):
+    """Collector that can be paused halfway through an update, after writing its first value."""
+
+    supportsSeries = True
+
+    def __init__(self):
+        self.updates = 0
+        self.paused = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def registerMetrics(self):
+        gauge = SeriesGauge("test_pair_value", "test value", labelnames=["index"])
+        self.__seriesIds = [gauge.series(index=0), gauge.series(index=1)]
+        self.__gauge = Gauge("test_legacy_pair_value", "test value", labelnames=["index"])
+
+    def updateMetrics(self):
+        self.updates += 1
+        self.__gauge.labels(index=0).set(self.updates)
+        self.paused.set()
+        self.release.wait()
+        self.__gauge.labels(index=1).set(self.updates)
+
+    def updateSeries(self, values):
+        self.updates += 1
+        values[self.__seriesIds[0]] = self.updates
+        self.paused.set()
+        self.release.wait()
+        values[self.__seriesIds[1]] = self.updates
+
+
+class LegacyMidUpdateCollector(MidUpdateCollector):
+    """Same collector, publishing through prometheus_client gauges only."""
+
+    supportsSeries = False
+
+
+class SlowRMSJob(RMSJob):
+    """Resource manager collector with a job query that can be stalled, like a slow squeue."""
+
+    def __init__(self):
+        super().__init__(jobDetection={"mode": "file-based", "file": None, "stepfile": None})
+        self.jobId = "1000"
+        self.querying = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def querySlurmJob(self, timeout=1, exit_on_error=False, mode="squeue"):
+        self.querying.set()
+        self.release.wait()
+        return {
+            "RMS_JOB_ID": self.jobId,
+            "RMS_JOB_USER": "user",
+            "RMS_JOB_PARTITION": "gpu",
+            "RMS_JOB_NUM_NODES": "1",
+            "RMS_JOB_BATCHMODE": "1",
+            "RMS_STEP_ID": "0",
+            "RMS_TYPE": "sbatch",
+        }
+
+
+def make_config(**options):
+    config = configparser.ConfigParser()
+    config["omnistat.collectors"] = {
+        "enable_rocm_smi": "False",
+        "enable_network": "False",
+    }
+    config["omnistat.collectors"].update(options)
+    return config
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    # Monitor registers its own metrics in the default registry; drop them
+    # after every test to avoid duplicated time series.
+    existing = set(REGISTRY._collector_to_names)
+    yield
+    for collector in set(REGISTRY._collector_to_names) - existing:
+        REGISTRY.unregister(collector)
+
+
+@pytest.fixture(autouse=True)
+def clean_series(monkeypatch):
+    table = SeriesTable()
+    monkeypatch.setattr(omnistat.series, "SERIES", table)
+    monkeypatch.setattr(omnistat.monitor, "SERIES", table)
+
+
+def init_monitor(config, collectors):
+    monitor = Monitor(config)
+    monitor._Monitor__collectors.update(collectors)
+    monitor.initMetrics()
+    return monitor
+
+
+class TestParallelCollectors:
+    def test_serial_by_default(self):
+        fast = SleepyCollector()
+        monitor = init_monitor(make_config(), {"fast": fast})
+        monitor.updateAllMetrics()
+        assert fast.updates == 2
+
+    def test_deadline_exceeded(self):
+        fast = SleepyCollector()
+        slow = SleepyCollector()
+        config = make_config(enable_parallel_collectors="True", collector_timeout_secs="0.05")
+        monitor = init_monitor(config, {"fast": fast, "slow": slow})
+        slow.delay = 5.0
+
+        start = time.perf_counter()
+        output = monitor.updateAllMetrics().decode()
+        assert time.perf_counter() - start < 1.0
+        assert 'omnistat_collector_deadline_exceeded{collector="slow"} 1.0' in output
+        assert 'omnistat_collector_deadline_exceeded{collector="fast"} 0.0' in output
+
+        # The outstanding update is not resubmitted while it is still running.
+        monitor.updateAllMetrics()
+        assert slow.updates == 1
+        assert fast.updates == 3
+
+        slow.release.set()
+        time.sleep(0.1)
+        output = monitor.updateAllMetrics().decode()
+        assert 'omnistat_collector_deadline_exceeded{collector="slow"} 0.0' in output
+
+    @pytest.mark.parametrize("collectorType", [MidUpdateCollector, LegacyMidUpdateCollector])
+    def test_late_collector_not_exposed_mid_update(self, collectorType):
+        collector = collectorType()
+        config = make_config(enable_parallel_collectors="True", collector_timeout_secs="0.05")
+        monitor = init_monitor(config, {"slow": collector})
+        name = "test_pair_value" if collectorType is MidUpdateCollector else "test_legacy_pair_value"
+        assert '%s{index="1"} 1.0' % name in monitor.renderMetrics().decode()
+
+        # the update stalls after writing its first value, and the scrape must not show it
+        collector.release.clear()
+        collector.paused.clear()
+        output = monitor.updateAllMetrics().decode()
+        assert collector.paused.is_set()
+        assert 'omnistat_collector_deadline_exceeded{collector="slow"} 1.0' in output
+        assert '%s{index="0"} 1.0' % name in output
+        assert '%s{index="1"} 1.0' % name in output
+
+        # once complete, the whole update is published
+        collector.release.set()
+        time.sleep(0.1)
+        output = monitor.renderMetrics().decode()
+        assert '%s{index="0"} 2.0' % name in output
+        assert '%s{index="1"} 2.0' % name in output
+
+    def test_late_rms_query(self):
+        collector = SlowRMSJob()
+        config = make_config(enable_parallel_collectors="True", collector_timeout_secs="0.05")
+        monitor = init_monitor(config, {"rms": collector})
+        assert 'jobid="1000"' in monitor.renderMetrics().decode()
+
+        # the job in the last complete update stays published while the next query is stalled
+        collector.release.clear()
+        collector.querying.clear()
+        collector.jobId = "2000"
+        output = monitor.updateAllMetrics().decode()
+        assert collector.querying.is_set()
+        assert 'omnistat_collector_deadline_exceeded{collector="rms"} 1.0' in output
+        assert 'rmsjob_info{batchflag="1",jobid="1000"' in output
+
+        collector.release.set()
+        time.sleep(0.1)
+        output = monitor.renderMetrics().decode()
+        assert 'jobid="2000"' in output
+        assert 'jobid="1000"' not in output
+
+    def test_per_collector_deadline(self):
+        config = make_config(enable_parallel_collectors="True", collector_timeout_secs="0.05", slow_timeout_secs="2.0")
+        slow = SleepyCollector(delay=0.2)
+        monitor = init_monitor(config, {"slow": slow})
+        assert monitor.runtimeConfig["collector_timeouts"] == {"slow": 2.0}
+
+        output = monitor.updateAllMetrics().decode()
+        assert 'omnistat_collector_deadline_exceeded{collector="slow"} 0.0' in output
+        assert slow.updates == 2
+
+
+class TestCollectorIntervals:
+    def test_interval_config(self):
+        config = make_config(rms_interval_secs="30", network_interval_secs="0.5")
+        monitor = Monitor(config)
+        assert monitor.runtimeConfig["collector_intervals"] == {"rms": 30.0, "network": 0.5}
+
+    def test_background_interval_not_a_collector(self, caplog):
+        config = make_config(enable_background_sampling="True", background_interval_secs="0.5")
+        monitor = init_monitor(config, {"fast": SleepyCollector()})
+        assert monitor.runtimeConfig["collector_intervals"] == {}
+        assert monitor.runtimeConfig["collector_background_interval_secs"] == 0.5
+        assert "background" not in caplog.text
+
+    def test_slow_collector_skipped(self):
+        fast = SleepyCollector()
+        slow = SleepyCollector()
+        config = make_config(slow_interval_secs="0.2")
+        monitor = init_monitor(config, {"fast": fast, "slow": slow})
+
+        for i in range(5):
+            monitor.updateAllMetrics()
+        assert fast.updates == 6
+        assert slow.updates == 1
+
+        time.sleep(0.25)
+        monitor.updateAllMetrics()
+        assert slow.updates == 2
+
+
+class TestSelfTelemetry:
+    def test_collector_durations(self):
+        config = make_config(enable_self_telemetry="True")
+        monitor = init_monitor(config, {"fast": SleepyCollector()})
+        # startup samples are not timed: two updates are needed for two duration observations
+        monitor.updateAllMetrics()
+        output = monitor.updateAllMetrics().decode()
+
+        assert 'omnistat_self_collector_duration_seconds_count{collector="fast"} 2.0' in output
+        assert "omnistat_self_resident_memory_bytes " in output
+        assert "omnistat_self_serialization_seconds " in output
+
+
+class TestSeriesCollectors:
+    def test_update_series(self):
+        collector = SeriesCollector()
+        monitor = init_monitor(make_config(), {"series": collector, "fast": SleepyCollector()})
+        output = monitor.updateAllMetrics().decode()
+        assert collector.updates == 2
+        assert 'test_series_value{card="0"} 2.0' in output
+
+    def test_collector_ownership(self):
+        monitor = init_monitor(make_config(), {"fast": SleepyCollector(), "series": SeriesCollector()})
+        assert monitor.collectorSeries() == {"fast": (0, 0), "series": (0, 1)}
+        assert "omnistat_collector_deadline_exceeded" not in monitor.collectorFamilies()
+
+        before = monitor.readTimes()
+        assert set(before) == {"fast", "series"}
+        monitor.updateCollectors()
+        assert monitor.readTimes()["series"] >= before["series"]
+
+
+class TestBackgroundSampling:
+    def test_snapshot(self):
+        collector = SleepyCollector()
+        config = make_config(enable_background_sampling="True", background_interval_secs="0.05")
+        monitor = init_monitor(config, {"fast": collector})
+        monitor.startSampler()
+        try:
+            first = monitor.snapshot()
+            assert collector.updates == 2
+            time.sleep(0.3)
+            # snapshots are replaced, never modified in place
+            assert monitor.snapshot() is not first
+            assert collector.updates > 3
+        finally:
+            monitor.stopSampler()
+
+        updates = collector.updates
+        time.sleep(0.1)
+        assert collector.updates == updates
+
+    def test_snapshot_survives_failures(self):
+        collector = SleepyCollector()
+        config = make_config(enable_background_sampling="True", background_interval_secs="0.05")
+        monitor = init_monitor(config, {"fast": collector})
+        monitor.startSampler()
+        try:
+            first = monitor.snapshot()
+            collector.updateMetrics = lambda: 1 / 0
+            time.sleep(0.2)
+            assert monitor.snapshot() is first
+        finally:
+            monitor.stopSampler()
+
+    def test_encoded_snapshot_cache(self):
+        collector = SleepyCollector()
+        config = make_config(enable_background_sampling="True", background_interval_secs="60")
+        monitor = init_monitor(config, {"fast": collector})
+        monitor.startSampler()
+        try:
+            # every format is rendered by the sampler, and scrapes never modify a published snapshot
+            snapshot = monitor.snapshot()
+            assert set(snapshot.bodies) == {"text", "openmetrics"}
+            body = monitor.snapshotBody("text", "gzip")
+            assert monitor.snapshotBody("text", "gzip") is body
+            assert gzip.decompress(body) == monitor.snapshotBody()
+            assert monitor.snapshotBody("openmetrics") is snapshot.bodies["openmetrics"]
+            assert monitor.snapshotBody("openmetrics").endswith(b"# EOF\n")
+            assert set(snapshot.bodies) == {"text", "openmetrics"}
+        finally:
+            monitor.stopSampler()
+
+
+class TestSharedMemoryRing:
+    def test_publish(self, tmp_path):
+        path = str(tmp_path / "ring")
+        config = make_config(enable_shm_ring="True", shm_ring_path=path, shm_ring_samples="8")
+        monitor = init_monitor(config, {"series": SeriesCollector()})
+        monitor.updateCollectors()
+
+        reader = RingReader(path)
+        assert reader.keys == ['test_series_value{card="0"}']
+        timestamps, values = reader.latest(8)
+        assert values.tolist() == [[1.0], [2.0]]
+
+        monitor.closeSharedMemory()
+        assert not (tmp_path / "ring").exists()
@@ -0,0 +1,70 @@
+import importlib.metadata
+import sys
+
+import pytest
+
+from omnistat import plugins
+from omnistat.collector_base import Collector
+
+
+class DummyCollector(Collector):
+    def __init__(self, runtimeConfig=None):
+        self.runtimeConfig = runtimeConfig
+
+    def registerMetrics(self):
+        pass
+
+    def updateMetrics(self):
+        pass
+
+
+def make_runtime_config(**flags):
+    runtimeConfig = {"collector_enable_flags": flags}
+    for plugin in plugins.BUILTIN_PLUGINS:
+        runtimeConfig["collector_enable_%s" % plugin.name] = False
+    runtimeConfig["collector_contrib_enable_kmsg"] = False
+    return runtimeConfig
+
+
+@pytest.fixture
+def entry_points(monkeypatch):
+    entryPoints = []
+
+    def fake_entry_points():
+        return importlib.metadata.EntryPoints(entryPoints)
+
+    monkeypatch.setattr(importlib.metadata, "entry_points", fake_entry_points)
+    return entryPoints
+
+
+def add_entry_point(entry_points, name, value):
+    entry_points.append(importlib.metadata.EntryPoint(name=name, value=value, group=plugins.ENTRY_POINT_GROUP))
+
+
+class TestPlugins:
+    def test_disabled_plugins_not_imported(self, entry_points, monkeypatch):
+        # other tests may have imported built-in collectors already
+        monkeypatch.delitem(sys.modules, "omnistat.collector_smi", raising=False)
+        add_entry_point(entry_points, "missing", "omnistat_missing_package.collector:Missing")
+        collectors, costs = plugins.loadCollectors(make_runtime_config(missing=False))
+        assert collectors == {}
+        assert "omnistat.collector_smi" not in sys.modules
+        assert "omnistat_missing_package" not in sys.modules
+
+    def test_third_party_plugin(self, entry_points):
+        add_entry_point(entry_points, "dummy", "test.test_plugins:DummyCollector")
+        runtimeConfig = make_runtime_config(dummy=True)
+        collectors, costs = plugins.loadCollectors(runtimeConfig)
+        assert isinstance(collectors["dummy"], DummyCollector)
+        assert collectors["dummy"].runtimeConfig is runtimeConfig
+        assert set(costs["dummy"]) == {"import", "init"}
+
+    def test_builtin_names_reserved(self, entry_points):
+        add_entry_point(entry_points, "network", "test.test_plugins:DummyCollector")
+        assert plugins.enabledPlugins(make_runtime_config(network=True)) == []
+
+    def test_unknown_plugin(self, entry_points):
+        add_entry_point(entry_points, "missing", "omnistat_missing_package.collector:Missing")
+        with pytest.raises(SystemExit) as e:
+            plugins.loadCollectors(make_runtime_config(missing=True))
+        assert e.value.code == 4
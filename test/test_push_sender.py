@@ -0,0 +1,225 @@
+import threading
+import time
+
+import pytest
+
+import omnistat.push_sender
+from omnistat.push_sender import PushError, PushSender
+from omnistat.sample_buffer import SampleBuffer
+
+
+class BlockingPush:
+    """Push function that blocks until released, recording delivered lines."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.pushed = []
+
+    def __call__(self, batch):
+        self.started.set()
+        self.release.wait(5)
+        self.pushed.append(list(batch.lines()))
+
+
+class FlakyPush:
+    """Push function that fails while the endpoint is down, recording delivered lines."""
+
+    def __init__(self, retryAfter=None):
+        self.down = True
+        self.retryAfter = retryAfter
+        self.attempts = []
+        self.pushed = []
+
+    def __call__(self, batch):
+        self.attempts.append(time.monotonic())
+        if self.down:
+            raise PushError("endpoint down", self.retryAfter)
+        self.pushed.append(list(batch.lines()))
+
+
+class RejectingPush:
+    """Push function that rejects batches starting at the given timestamps, and fails while the
+    endpoint is down, recording delivered lines."""
+
+    def __init__(self, rejected, down=False):
+        self.rejected = rejected
+        self.down = down
+        self.attempts = 0
+        self.pushed = []
+
+    def __call__(self, batch):
+        self.attempts += 1
+        if self.down:
+            raise PushError("endpoint down")
+        lines = list(batch.lines())
+        if int(lines[0].split()[-1]) in self.rejected:
+            raise PushError("request rejected (400)", retryable=False)
+        self.pushed.append(lines)
+
+
+def make_batch(buffer, start, numSamples=4):
+    seriesId = buffer.seriesId("metric ")
+    for i in range(start, start + numSamples):
+        buffer.append(i, [seriesId], [float(i)])
+    return buffer.drain()
+
+
+@pytest.fixture
+def buffer():
+    return SampleBuffer()
+
+
+class TestPushSender:
+    def test_submit_does_not_block(self, buffer):
+        push = BlockingPush()
+        sender = PushSender(push, queueSize=1)
+        sender.submit(make_batch(buffer, 0))
+        assert push.started.wait(1)
+
+        # the first batch is in flight; the queue holds one more and the oldest is then dropped
+        sender.submit(make_batch(buffer, 4))
+        sender.submit(make_batch(buffer, 8))
+        assert sender.dropped == 4
+
+        push.release.set()
+        sender.close()
+        assert [len(lines) for lines in push.pushed] == [4, 4]
+        assert push.pushed[1][0] == "metric 8.0 8"
+
+    def test_downsample(self, buffer):
+        push = BlockingPush()
+        sender = PushSender(push, queueSize=1, policy="downsample")
+        sender.submit(make_batch(buffer, 0))
+        assert push.started.wait(1)
+        sender.submit(make_batch(buffer, 4))
+        sender.submit(make_batch(buffer, 8))
+
+        push.release.set()
+        sender.close()
+        assert sender.downsampled == 2
+        assert push.pushed[1] == ["metric 4.0 4", "metric 6.0 6"] + ["metric %i.0 %i" % (i, i) for i in range(8, 12)]
+
+    def test_spill(self, buffer, tmp_path):
+        push = BlockingPush()
+        sender = PushSender(push, queueSize=1, policy="spill", spillDir=str(tmp_path))
+        sender.submit(make_batch(buffer, 0))
+        assert push.started.wait(1)
+        sender.submit(make_batch(buffer, 4))
+        sender.submit(make_batch(buffer, 8))
+
+        push.release.set()
+        sender.close()
+        assert sender.spilled == 4
+        # spilled data is older and pushed before the queued batch
+        assert [lines[0] for lines in push.pushed] == ["metric 0.0 0", "metric 4.0 4", "metric 8.0 8"]
+        assert list(tmp_path.iterdir()) == []
+
+    def test_spill_off_sampling_thread(self, buffer, tmp_path, monkeypatch):
+        writers = []
+        append = omnistat.push_sender.SpillLog.append
+
+        def recordAppend(log, batch):
+            writers.append(threading.current_thread().name)
+            return append(log, batch)
+
+        monkeypatch.setattr(omnistat.push_sender.SpillLog, "append", recordAppend)
+        push = BlockingPush()
+        sender = PushSender(push, queueSize=1, policy="spill", spillDir=str(tmp_path))
+        sender.submit(make_batch(buffer, 0))
+        assert push.started.wait(1)
+
+        # with the queue full, submit only hands evicted batches over to the sender thread
+        for start in range(4, 44, 4):
+            sender.submit(make_batch(buffer, start))
+        assert writers == []
+        assert list(tmp_path.iterdir()) == []
+
+        push.release.set()
+        sender.close()
+        assert sender.spilled == 36
+        assert set(writers) == {"omnistat-sender"}
+        assert [lines[0] for lines in push.pushed] == ["metric %i.0 %i" % (i, i) for i in range(0, 44, 4)]
+
+    def test_invalid_policy(self):
+        with pytest.raises(ValueError):
+            PushSender(lambda batch: None, policy="block")
+
+    def test_failed_push_replayed(self, buffer, tmp_path, monkeypatch):
+        monkeypatch.setattr(omnistat.push_sender, "RETRY_DELAY_MIN", 0.01)
+        push = FlakyPush()
+        sender = PushSender(push, spillDir=str(tmp_path))
+        sender.submit(make_batch(buffer, 0))
+        sender.submit(make_batch(buffer, 4))
+        deadline = time.time() + 2
+        while sender.spilled < 8 and time.time() < deadline:
+            time.sleep(0.01)
+        assert sender.pending == 8
+        assert len(list(tmp_path.glob("*.gz"))) == 2
+
+        # the endpoint recovers: spilled batches are replayed in order after a backoff
+        push.down = False
+        deadline = time.time() + 2
+        while len(push.pushed) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        sender.submit(make_batch(buffer, 8))
+        sender.close()
+        assert [lines[0] for lines in push.pushed] == ["metric 0.0 0", "metric 4.0 4", "metric 8.0 8"]
+        assert sender.dropped == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_spill_log_size_cap(self, buffer, tmp_path):
+        push = FlakyPush()
+        sender = PushSender(push, queueSize=3, spillDir=str(tmp_path), spillMaxBytes=1)
+        for start in (0, 4, 8):
+            sender.submit(make_batch(buffer, start))
+        sender.close()
+        # only the most recent segment is kept
+        assert sender.dropped == 8
+        assert sender.pending == 4
+        assert len(list(tmp_path.glob("*.gz"))) == 1
+
+    def test_retry_after(self, buffer, tmp_path):
+        push = FlakyPush(retryAfter=0.2)
+        sender = PushSender(push, spillDir=str(tmp_path))
+        sender.submit(make_batch(buffer, 0))
+        deadline = time.time() + 2
+        while len(push.attempts) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        push.down = False
+        sender.close()
+        # attempts are spaced by the delay requested by the server (plus jitter)
+        gaps = [b - a for a, b in zip(push.attempts, push.attempts[1:3])]
+        assert all(0.2 <= gap < 0.4 for gap in gaps)
+        assert push.pushed == [["metric %i.0 %i" % (i, i) for i in range(4)]]
+
+    def test_rejected_push_discarded(self, buffer, tmp_path):
+        push = RejectingPush(rejected={0})
+        sender = PushSender(push, queueSize=3, spillDir=str(tmp_path))
+        for start in (0, 4, 8):
+            sender.submit(make_batch(buffer, start))
+        sender.close()
+        # the rejected batch is discarded right away instead of holding back newer batches
+        assert push.attempts == 3
+        assert [lines[0] for lines in push.pushed] == ["metric 4.0 4", "metric 8.0 8"]
+        assert sender.rejected == 4
+        assert sender.spilled == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_rejected_replay_discarded(self, buffer, tmp_path, monkeypatch):
+        monkeypatch.setattr(omnistat.push_sender, "RETRY_DELAY_MIN", 0.01)
+        push = RejectingPush(rejected={0}, down=True)
+        sender = PushSender(push, spillDir=str(tmp_path))
+        sender.submit(make_batch(buffer, 0))
+        deadline = time.time() + 2
+        while sender.spilled < 4 and time.time() < deadline:
+            time.sleep(0.01)
+
+        # the spilled batch is rejected when replayed: it is removed from the spill log
+        push.down = False
+        sender.submit(make_batch(buffer, 4))
+        sender.close()
+        assert [lines[0] for lines in push.pushed] == ["metric 4.0 4"]
+        assert sender.rejected == 4
+        assert sender.pending == 0
+        assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,54 @@
+import gzip
+import http
+
+import pytest
+
+from omnistat.relay import Relay, countLines
+from omnistat.utils import relay_assignments
+
+
+def compressed(lines):
+    return gzip.compress(("\n".join(lines) + "\n").encode())
+
+
+class TestRelay:
+    def test_count_lines(self):
+        body = compressed(["a 1 1000", "b 2 1000"]) + compressed(["c 3 1000"])
+        assert countLines(body) == 3
+        with pytest.raises(Exception):
+            countLines(body[:-4])
+
+    def test_accept_and_drain(self):
+        relay = Relay()
+        assert relay.drain() is None
+        assert relay.accept(compressed(["a 1 1000", "b 2 1000"])) == (http.HTTPStatus.NO_CONTENT, None)
+        # uncompressed bodies are compressed on arrival
+        assert relay.accept(b"c 3 1000\n")[0] == http.HTTPStatus.NO_CONTENT
+        assert relay.accept(b"\x1f\x8bnot gzip")[0] == http.HTTPStatus.BAD_REQUEST
+        assert len(relay) == 3
+
+        batch = relay.drain()
+        assert len(batch) == 3
+        assert list(batch.lines()) == ["a 1 1000", "b 2 1000", "c 3 1000"]
+        assert gzip.decompress(b"".join(batch.bodies)) == b"a 1 1000\nb 2 1000\nc 3 1000\n"
+        assert len(relay) == 0
+        assert relay.drain() is None
+
+    def test_full(self):
+        body = compressed(["a 1 1000"])
+        relay = Relay(maxBytes=len(body))
+        assert relay.accept(body)[0] == http.HTTPStatus.NO_CONTENT
+        assert relay.accept(body)[0] == http.HTTPStatus.SERVICE_UNAVAILABLE
+        assert (relay.received, relay.rejected) == (1, 1)
+        relay.drain()
+        assert relay.accept(body)[0] == http.HTTPStatus.NO_CONTENT
+
+    def test_assignments(self):
+        hosts = ["node%02i" % i for i in range(5)]
+        assert relay_assignments(hosts, 2) == {
+            "node00": "node00",
+            "node01": "node00",
+            "node02": "node02",
+            "node03": "node02",
+            "node04": "node04",
+        }
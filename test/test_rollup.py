@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from omnistat.rollup import Rollup, rollupKey, windowSuffix
+from omnistat.sample_buffer import SampleBuffer
+
+
+def rollup_lines(buffer):
+    return sorted(buffer.drain().lines())
+
+
+class TestRollup:
+    def test_names(self):
+        assert windowSuffix(1000) == "1s"
+        assert windowSuffix(250) == "250ms"
+        assert rollupKey('power{card="0"} ', "max", "1s") == 'power:max_1s{card="0"} '
+        assert rollupKey("power ", "max", "1s") == "power:max_1s "
+
+    def test_window_stats(self):
+        buffer = SampleBuffer()
+        rollup = Rollup(buffer, 1000)
+        power = rollup.seriesId('power{card="0"} ')
+        # samples at 250..1000 belong to the window ending at 1000
+        for timestamp, value in [(250, 100.0), (500, 400.0), (750, np.nan), (1000, 200.0), (1250, 50.0)]:
+            rollup.append(timestamp, [power], [value])
+        rollup.flush()
+
+        assert rollup_lines(buffer) == sorted(
+            [
+                'power:min_1s{card="0"} 100.0 1000',
+                'power:max_1s{card="0"} 400.0 1000',
+                'power:mean_1s{card="0"} 233.33333333333334 1000',
+                'power:last_1s{card="0"} 200.0 1000',
+                'power:count_1s{card="0"} 3.0 1000',
+                'power:min_1s{card="0"} 50.0 2000',
+                'power:max_1s{card="0"} 50.0 2000',
+                'power:mean_1s{card="0"} 50.0 2000',
+                'power:last_1s{card="0"} 50.0 2000',
+                'power:count_1s{card="0"} 1.0 2000',
+            ]
+        )
+
+    def test_raw_subset(self):
+        buffer = SampleBuffer()
+        rollup = Rollup(buffer, 500, stats=("max",), rawPrefixes=("rmsjob_",))
+        ids = [rollup.seriesId('rmsjob_info{jobid="1"} '), rollup.seriesId("power ")]
+        for timestamp in (100, 200, 300):
+            rollup.append(timestamp, ids, [1.0, float(timestamp)])
+        rollup.flush()
+
+        lines = rollup_lines(buffer)
+        assert "power:max_500ms 300.0 500" in lines
+        assert 'rmsjob_info:max_500ms{jobid="1"} 1.0 500' in lines
+        assert ['rmsjob_info{jobid="1"} 1.0 %i' % t for t in (100, 200, 300)] == [
+            line for line in lines if line.startswith("rmsjob_info{")
+        ]
+        assert not any(line.startswith("power ") for line in lines)
+
+    def test_invalid_stat(self):
+        with pytest.raises(ValueError):
+            Rollup(SampleBuffer(), 1000, stats=("median",))
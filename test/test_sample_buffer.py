@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from omnistat.sample_buffer import SampleBuffer, SealedChunk
+
+
+class TestSealedChunk:
+    def test_roundtrip(self):
+        timestamps = np.array([1000, 1010, 1020, 1031, 1040], dtype=np.int64)
+        values = np.array([[1.0, np.nan], [1.5, 2.0], [1.5, -0.25], [np.inf, 2.0], [3e100, np.nan]])
+        decoded_timestamps, decoded_values = SealedChunk(timestamps, values).decode()
+        assert np.array_equal(decoded_timestamps, timestamps)
+        assert np.array_equal(decoded_values, values, equal_nan=True)
+
+    @pytest.mark.parametrize("numSamples", [1, 2])
+    def test_short_chunks(self, numSamples):
+        timestamps = np.arange(numSamples, dtype=np.int64) * 10 + 5
+        values = np.ones((numSamples, 3))
+        decoded_timestamps, decoded_values = SealedChunk(timestamps, values).decode()
+        assert np.array_equal(decoded_timestamps, timestamps)
+        assert np.array_equal(decoded_values, values)
+
+    def test_compression(self):
+        # regular cadence and constant values compress to a small fraction of the raw size
+        timestamps = np.arange(512, dtype=np.int64) * 10
+        values = np.tile(np.arange(100, dtype=np.float64), (512, 1))
+        chunk = SealedChunk(timestamps, values)
+        assert chunk.nbytes < (timestamps.nbytes + values.nbytes) / 50
+
+
+class TestSampleBuffer:
+    def test_render(self):
+        buffer = SampleBuffer(chunkSamples=4)
+        a = buffer.seriesId('a{card="0"} ')
+        for i in range(6):
+            ids = [a]
+            values = [float(i)]
+            if i >= 3:
+                # new series registered in the middle of a chunk
+                ids.append(buffer.seriesId("b "))
+                values.append(np.nan if i == 4 else 2.0)
+            buffer.append(1000 + i, ids, values)
+        buffer.appendLine('omnistat_fom{name="x"} 1 1005')
+        assert len(buffer) == 9
+
+        lines = list(buffer.drain().lines())
+        assert lines[:3] == ['a{card="0"} 0.0 1000', 'a{card="0"} 1.0 1001', 'a{card="0"} 2.0 1002']
+        assert lines[3:5] == ['a{card="0"} 3.0 1003', "b 2.0 1003"]
+        assert lines[5] == 'a{card="0"} 4.0 1004'
+        assert lines[-1] == 'omnistat_fom{name="x"} 1 1005'
+        assert len(lines) == 9
+
+        assert len(buffer) == 0
+        assert list(buffer.drain().lines()) == []
+
+    def test_flat_memory(self):
+        buffer = SampleBuffer()
+        ids = np.array([buffer.seriesId("metric%i " % i) for i in range(64)])
+        values = np.arange(64, dtype=np.float64)
+        buffer.append(0, ids, values)
+        initial = buffer.nbytes
+        for i in range(1, 20000):
+            buffer.append(i * 10, ids, values)
+        assert buffer.nbytes < 2 * initial
+        assert len(buffer) == 20000 * 64
+
+
+def parse_lines(lines):
+    points = {}
+    for line in lines:
+        key, value, timestamp = line.rsplit(" ", 2)
+        points.setdefault(key + " ", []).append((int(timestamp), float(value)))
+    return {key: sorted(series) for key, series in points.items()}
+
+
+class TestChangeFilter:
+    def test_change_points(self):
+        buffer = SampleBuffer(chunkSamples=4, heartbeat_millisecs=1000)
+        static = buffer.seriesId("static ")
+        step = buffer.seriesId("step ")
+        for i, value in enumerate([1, 1, 1, 2, 2, 2, 2, 2, 3, 3]):
+            buffer.append(i * 100, [static, step], [5.0, float(value)])
+        lines = list(buffer.drain().lines())
+        # first sample, closing point before each change, and first sample after it
+        assert lines == ["static 5.0 0", "step 1.0 0", "step 1.0 200", "step 2.0 300", "step 2.0 700", "step 3.0 800"]
+
+        for i in range(10, 25):
+            buffer.append(i * 100, [static, step], [5.0, 3.0])
+        points = parse_lines(buffer.drain(final=True).lines())
+        # one sample per heartbeat window, plus the final sample
+        assert points["static "] == [(1000, 5.0), (2000, 5.0), (2400, 5.0)]
+
+    def test_reconstruction(self):
+        rng = np.random.default_rng(0)
+        buffer = SampleBuffer(chunkSamples=16, heartbeat_millisecs=500)
+        keys = ["s%i " % i for i in range(4)]
+        seriesIds = [buffer.seriesId(key) for key in keys]
+
+        expected = {key: [] for key in keys}
+        values = np.zeros(4)
+        lines = []
+        for i in range(300):
+            changed = rng.random(4) < 0.05
+            values[changed] = rng.integers(0, 3, np.count_nonzero(changed))
+            # the last series is only sampled every third time
+            sampled = values.copy()
+            if i % 3:
+                sampled[3] = np.nan
+            buffer.append(i * 10, seriesIds, sampled)
+            for key, value in zip(keys, sampled):
+                if not np.isnan(value):
+                    expected[key].append((i * 10, value))
+            if i % 70 == 69:
+                lines.extend(buffer.drain().lines())
+        lines.extend(buffer.drain(final=True).lines())
+
+        points = parse_lines(lines)
+        assert len(lines) < 300 * 4 / 4
+        for key in keys:
+            kept = points[key]
+            assert kept[-1] == expected[key][-1]
+            assert max(b[0] - a[0] for a, b in zip(kept, kept[1:])) <= 500 + 30
+            # a step function through the kept samples reproduces every original sample
+            for timestamp, value in expected[key]:
+                index = np.searchsorted([t for t, _ in kept], timestamp, side="right") - 1
+                assert kept[index][1] == value
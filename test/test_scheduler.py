@@ -0,0 +1,79 @@
+import time
+
+import pytest
+
+from omnistat.scheduler import SamplingClock, TimerWheel, tickResolution
+
+
+class TestTimerWheel:
+    def test_multi_rate(self):
+        wheel = TimerWheel(resolution=0.01, numSlots=16)
+        wheel.add("fast", 0.01, 0.0)
+        wheel.add("slow", 0.05, 0.0)
+
+        fired = {"fast": 0, "slow": 0}
+        for i in range(1, 101):
+            for key in wheel.advance(i * 0.01 + 0.001):
+                fired[key] += 1
+
+        assert fired == {"fast": 100, "slow": 20}
+
+    def test_period_longer_than_wheel(self):
+        wheel = TimerWheel(resolution=1.0, numSlots=8)
+        wheel.add("rare", 30.0, 0.0)
+
+        fired = [t for t in range(1, 91) if wheel.advance(t + 0.5)]
+        assert fired == [30, 60, 90]
+
+    def test_stall_fires_once(self):
+        wheel = TimerWheel(resolution=1.0, numSlots=8)
+        wheel.add("a", 2.0, 0.0)
+
+        assert wheel.advance(1.5) == []
+        # Skip many occurrences: the entry fires once and keeps its cadence.
+        assert wheel.advance(101.5) == ["a"]
+        assert wheel.advance(102.5) == ["a"]
+        assert wheel.advance(103.5) == []
+        assert wheel.advance(104.5) == ["a"]
+
+    def test_coprime_periods(self):
+        # periods that are not multiples of each other fire at their exact rate
+        assert tickResolution([2.0, 3.0]) == 1.0
+        assert tickResolution([0.5, 0.75]) == 0.25
+        wheel = TimerWheel(resolution=tickResolution([2.0, 3.0]), numSlots=8)
+        wheel.add("a", 2.0, 0.0)
+        wheel.add("b", 3.0, 0.0)
+
+        fired = {"a": [], "b": []}
+        for t in range(1, 25):
+            for key in wheel.advance(t + 0.5):
+                fired[key].append(t)
+        assert fired == {"a": list(range(2, 25, 2)), "b": list(range(3, 25, 3))}
+
+    def test_invalid_resolution(self):
+        with pytest.raises(ValueError):
+            TimerWheel(resolution=0)
+
+
+class TestSamplingClock:
+    def test_aligned_deadlines(self):
+        clock = SamplingClock(0.02)
+        deadlines = [clock.wait() for _ in range(5)]
+        for deadline in deadlines:
+            assert round(deadline * 1000) % 20 == 0
+        assert [round((b - a) * 1000) for a, b in zip(deadlines, deadlines[1:])] == [20] * 4
+        assert time.time() >= deadlines[-1]
+        assert clock.overruns == 0
+
+    def test_overruns_skipped(self):
+        clock = SamplingClock(0.02)
+        first = clock.wait()
+        time.sleep(0.065)
+        second = clock.wait()
+        # deadlines at +20, +40 and +60 ms were missed
+        assert clock.overruns == 3
+        assert round((second - first) * 1000) == 80
+
+    def test_invalid_interval(self):
+        with pytest.raises(ValueError):
+            SamplingClock(0)
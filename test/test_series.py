@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from omnistat.series import SeriesGauge, SeriesTable
+
+
+class TestSeriesTable:
+    def test_exposition(self):
+        table = SeriesTable()
+        gauge = SeriesGauge("rocm_temperature_celsius", "Temperature (C)", ["card", "location"], table=table)
+        card0 = gauge.series(card=0, location="edge")
+        card1 = gauge.series(card=1, location="edge")
+        scalar = SeriesGauge("rocm_num_gpus", "# of GPUS available on host", table=table).series()
+
+        table.values[card0] = 41.0
+        table.values[scalar] = 2
+        output = table.exposition().decode()
+
+        assert "# TYPE rocm_temperature_celsius gauge" in output
+        assert 'rocm_temperature_celsius{card="0",location="edge"} 41.0\n' in output
+        assert "rocm_num_gpus 2.0\n" in output
+        # series without values are omitted
+        assert 'card="1"' not in output
+
+        table.values[card1] = 40.5
+        assert 'rocm_temperature_celsius{card="1",location="edge"} 40.5\n' in table.exposition().decode()
+
+    def test_import_lines(self):
+        table = SeriesTable()
+        rx = SeriesGauge("omnistat_network_rx_bytes", "rx", ["device_class", "interface"], table=table)
+        tx = SeriesGauge("omnistat_network_tx_bytes", "tx", ["device_class", "interface"], table=table)
+        table.values[rx.series(device_class="net", interface="eth0")] = 10
+        table.values[tx.series(device_class="net", interface="eth0")] = 20
+
+        lines = table.importLines('instance="node01"', 1000)
+        assert lines == [
+            'omnistat_network_rx_bytes{instance="node01",device_class="net",interface="eth0"} 10.0 1000',
+            'omnistat_network_tx_bytes{instance="node01",device_class="net",interface="eth0"} 20.0 1000',
+        ]
+        assert len(table.importLines('instance="node01"', 2000, prefix="omnistat_network_tx")) == 1
+
+    def test_growth_preserves_values(self):
+        table = SeriesTable(capacity=2)
+        gauge = SeriesGauge("metric", "description", ["index"], table=table)
+        ids = [gauge.series(index=i) for i in range(10)]
+        for i in ids[:2]:
+            table.values[i] = i
+        assert len(table) == 10
+        assert len(table.values) >= 10
+        assert table.values[1] == 1
+        assert np.isnan(table.values[9])
+
+    def test_label_escaping(self):
+        table = SeriesTable()
+        seriesId = SeriesGauge("metric", "description", ["name"], table=table).series(name='a"b\\c')
+        table.values[seriesId] = 1
+        assert 'metric{name="a\\"b\\\\c"} 1.0' in table.exposition().decode()
+
+    def test_invalid_registration(self):
+        table = SeriesTable()
+        gauge = SeriesGauge("metric", "description", ["card"], table=table)
+        with pytest.raises(ValueError):
+            SeriesGauge("metric", "description", table=table)
+        with pytest.raises(ValueError):
+            gauge.series(gpu=0)
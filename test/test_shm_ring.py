@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from omnistat.shm_ring import HEADER_DTYPE, RingReader, RingWriter, slotDtype
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "omnistat_metrics")
+
+
+class TestSharedMemoryRing:
+    def test_latest(self, path):
+        writer = RingWriter(path, capacity=4)
+        writer.create(['power{card="0"}', 'power{card="1"}'])
+        reader = RingReader(path)
+        assert reader.keys == ['power{card="0"}', 'power{card="1"}']
+
+        timestamps, values = reader.latest(2)
+        assert len(timestamps) == 0
+        assert values.shape == (0, 2)
+
+        for i in range(6):
+            writer.publish(100.0 + i, [i, np.nan])
+
+        timestamps, values = reader.latest(3)
+        assert timestamps.tolist() == [103.0, 104.0, 105.0]
+        assert values[:, reader.index('power{card="0"}')].tolist() == [3.0, 4.0, 5.0]
+        assert np.isnan(values[:, 1]).all()
+
+        # at most one ring worth of samples is available
+        timestamps, _ = reader.latest(10)
+        assert timestamps.tolist() == [102.0, 103.0, 104.0, 105.0]
+
+    def test_torn_slot_discarded(self, path):
+        writer = RingWriter(path, capacity=4)
+        writer.create(["a"])
+        for i in range(3):
+            writer.publish(float(i), [i])
+        reader = RingReader(path)
+
+        # a slot being rewritten has an odd sequence number and is skipped
+        header = np.memmap(path, dtype=HEADER_DTYPE, mode="r", shape=(1,))
+        slots = np.memmap(path, dtype=slotDtype(1), mode="r+", offset=int(header["dataOffset"][0]), shape=(4,))
+        slots["sequence"][1] = 2 * 1 + 1
+        slots.flush()
+        timestamps, values = reader.latest(3)
+        assert timestamps.tolist() == [0.0, 2.0]
+        assert values.tolist() == [[0.0], [2.0]]
+
+    def test_recreated(self, path):
+        writer = RingWriter(path, capacity=4)
+        writer.create(["a"])
+        writer.publish(1.0, [1.0])
+        reader = RingReader(path)
+
+        writer.create(["a", "b"])
+        writer.publish(2.0, [2.0, 3.0])
+        timestamps, values = reader.latest()
+        assert reader.keys == ["a", "b"]
+        assert timestamps.tolist() == [2.0]
+        assert values.tolist() == [[2.0, 3.0]]
+
+        writer.remove()
+        reader.close()
+
+    def test_not_a_ring(self, path):
+        with open(path, "wb") as f:
+            f.write(b"\0" * 128)
+        with pytest.raises(ValueError):
+            RingReader(path)
@@ -0,0 +1,323 @@
+import argparse
+import configparser
+import gzip
+import http.client
+import http.server
+import os
+import threading
+import time
+import types
+
+import pytest
+from prometheus_client import REGISTRY, Gauge
+
+import omnistat.series
+import omnistat.standalone
+from omnistat import capture
+from omnistat.control_server import MAX_BODY_BYTES, ControlServer
+from omnistat.push_sender import PushError
+from omnistat.relay import IMPORT_PATH, RELAY_MAX_BYTES, Relay
+from omnistat.series import SeriesGauge, SeriesTable
+from omnistat.standalone import (
+    Standalone,
+    gzip_lines,
+    next_push_time,
+    push_phase,
+    push_to_victoria_metrics,
+)
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    existing = set(REGISTRY._collector_to_names)
+    yield
+    for collector in set(REGISTRY._collector_to_names) - existing:
+        REGISTRY.unregister(collector)
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = SeriesTable()
+    monkeypatch.setattr(omnistat.series, "SERIES", table)
+    monkeypatch.setattr(omnistat.standalone, "SERIES", table)
+    return table
+
+
+def make_standalone(monkeypatch, output_dir=None, relay_port=None, **options):
+    monkeypatch.setattr(
+        omnistat.standalone.requests.Session, "get", lambda self, url: types.SimpleNamespace(status_code=200)
+    )
+    args = argparse.Namespace(
+        interval=0.01, pushinterval=1, endpoint="localhost", port=9090, output_dir=output_dir, relay_port=relay_port
+    )
+    config = configparser.ConfigParser()
+    config["omnistat.usermode"] = options
+    return Standalone(args, config)
+
+
+@pytest.fixture
+def standalone(monkeypatch):
+    return make_standalone(monkeypatch)
+
+
+def buffered_lines(standalone, names):
+    # the default registry also includes process and platform metrics from the client library
+    lines = standalone._Standalone__buffer.drain().lines()
+    return [line for line in lines if line.startswith(names)]
+
+
+class TestGetMetrics:
+    def test_sample_lines(self, standalone, table):
+        gauge = SeriesGauge("rocm_utilization_percentage", "GPU use (%)", ["card"])
+        seriesId = gauge.series(card=0)
+        info = Gauge("rmsjob_info", "job info", ["jobid"])
+        info.labels(jobid="42").set(1)
+
+        table.values[seriesId] = 10
+        standalone.getMetrics(1000)
+        table.values[seriesId] = 20
+        standalone.getMetrics(2000)
+
+        lines = buffered_lines(standalone, ("rmsjob_info", "rocm_"))
+        labels = standalone._Standalone__labelDefaults
+        instance = standalone._Standalone__instanceLabel
+        assert 'rmsjob_info{%s,jobid="42"} 1.0 1000' % instance in lines
+        assert 'rocm_utilization_percentage{%s,card="0"} 10.0 1000' % labels in lines
+        assert 'rocm_utilization_percentage{%s,card="0"} 20.0 2000' % labels in lines
+        assert len(lines) == 4
+
+    def test_new_series(self, standalone, table):
+        gauge = SeriesGauge("omnistat_network_rx_bytes", "rx", ["interface"])
+        table.values[gauge.series(interface="eth0")] = 1
+        standalone.getMetrics(1000)
+        table.values[gauge.series(interface="eth1")] = 2
+        standalone.getMetrics(2000)
+
+        lines = buffered_lines(standalone, "omnistat_network")
+        assert len(lines) == 3
+        assert lines[-1].endswith('interface="eth1"} 2.0 2000')
+
+    def test_stale_collectors_skipped(self, standalone, table):
+        gpu = SeriesGauge("rocm_utilization_percentage", "GPU use (%)", ["card"]).series(card=0)
+        info = Gauge("rmsjob_info", "job info", ["jobid"])
+        info.labels(jobid="42").set(1)
+        standalone.setCollectorOwners({"rmsjob_info": "rms"}, {"rocm_smi": (0, 1)})
+
+        table.values[gpu] = 10
+        standalone.getMetrics(1000, readTimes={"rocm_smi": 0.9, "rms": 0.9})
+        table.values[gpu] = 20
+        # rms was not read again: its values are not repeated under the new timestamp
+        standalone.getMetrics(2000, readTimes={"rocm_smi": 1.9, "rms": 0.9})
+
+        lines = buffered_lines(standalone, ("rmsjob_info", "rocm_"))
+        assert [line.rsplit(" ", 1)[1] for line in lines] == ["1000", "1000", "2000"]
+        assert lines[-1].startswith("rocm_utilization_percentage")
+
+    def test_rollups(self, monkeypatch, table):
+        standalone = make_standalone(monkeypatch, rollup_window_secs="0.02", rollup_stats="max,mean")
+        power = SeriesGauge("rocm_average_socket_power_watts", "power (W)", ["card"]).series(card=0)
+        for timestamp, value in [(10, 100), (20, 300), (30, 50)]:
+            table.values[power] = value
+            standalone.getMetrics(timestamp)
+
+        lines = buffered_lines(standalone, "rocm_")
+        labels = standalone._Standalone__labelDefaults
+        assert lines == [
+            'rocm_average_socket_power_watts:max_20ms{%s,card="0"} 300.0 20' % labels,
+            'rocm_average_socket_power_watts:mean_20ms{%s,card="0"} 200.0 20' % labels,
+        ]
+
+    def test_output_dir(self, monkeypatch, table, tmp_path):
+        pytest.importorskip("pyarrow")
+        standalone = make_standalone(monkeypatch, output_dir=str(tmp_path), output_format="arrow")
+        power = SeriesGauge("rocm_average_socket_power_watts", "power (W)", ["card"]).series(card=0)
+        for timestamp, value in [(1000, 100), (2000, 300)]:
+            table.values[power] = value
+            standalone.getMetrics(timestamp)
+        standalone.pushMetrics(standalone._Standalone__buffer.drain())
+
+        rows = capture.read(str(tmp_path), "arrow").to_pylist()
+        rows = [row for row in rows if row["name"] == "rocm_average_socket_power_watts"]
+        assert [row["value"] for row in rows] == [100.0, 300.0]
+        assert rows[0]["labels"] == standalone._Standalone__labelDefaults + ',card="0"'
+
+
+class VictoriaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+    status = 204
+    headers = {}
+
+    def do_POST(self):
+        body = b""
+        if self.headers.get("Transfer-Encoding") == "chunked":
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                chunk = self.rfile.read(size)
+                self.rfile.readline()
+                if size == 0:
+                    break
+                body += chunk
+        else:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+        VictoriaHandler.requests.append((self.path, dict(self.headers), body, self.client_address))
+        self.send_response(VictoriaHandler.status)
+        for name, value in VictoriaHandler.headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        VictoriaHandler.requests.append((self.path, dict(self.headers), None, self.client_address))
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def victoria():
+    VictoriaHandler.requests = []
+    VictoriaHandler.status = 204
+    VictoriaHandler.headers = {}
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), VictoriaHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield "http://127.0.0.1:%i" % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+class TestPush:
+    def test_gzip_lines(self):
+        lines = ["metric%i 1.0 1000" % i for i in range(100000)]
+        stats = {"raw": 0, "compressed": 0}
+        compressed = b"".join(gzip_lines(iter(lines), stats))
+        assert gzip.decompress(compressed).decode() == "\n".join(lines) + "\n"
+        assert stats["compressed"] == len(compressed)
+        assert stats["compressed"] < stats["raw"]
+
+    def test_push(self, victoria):
+        lines = ['rocm_utilization_percentage{card="%i"} 1.0 1000' % i for i in range(8)]
+        numBytes = push_to_victoria_metrics(lines, victoria)
+
+        path, headers, body, client = VictoriaHandler.requests[0]
+        assert path == "/api/v1/import/prometheus"
+        assert headers["Content-Encoding"] == "gzip"
+        assert gzip.decompress(body).decode().splitlines() == lines
+        assert numBytes == len(body)
+        # backfill notifications reuse the same connection
+        assert [request[0] for request in VictoriaHandler.requests[1:]] == [
+            "/internal/resetRollupResultCache",
+            "/internal/force_flush",
+        ]
+        assert {request[3] for request in VictoriaHandler.requests} == {client}
+
+    def test_overloaded(self, victoria):
+        VictoriaHandler.status = 429
+        VictoriaHandler.headers = {"Retry-After": "7"}
+        with pytest.raises(PushError) as error:
+            push_to_victoria_metrics(["metric 1.0 1000"], victoria)
+        assert error.value.retryAfter == 7.0
+        # no backfill notifications after a rejected push
+        assert len(VictoriaHandler.requests) == 1
+
+        VictoriaHandler.headers = {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}
+        with pytest.raises(PushError) as error:
+            push_to_victoria_metrics(["metric 1.0 1000"], victoria)
+        # dates in the past still defer the next attempt by the minimum delay
+        assert error.value.retryAfter == 1.0
+        assert error.value.retryable
+
+    def test_rejected(self, victoria):
+        # invalid or oversized requests are not retried
+        for status in (400, 413):
+            VictoriaHandler.status = status
+            with pytest.raises(PushError) as error:
+                push_to_victoria_metrics(["metric 1.0 1000"], victoria)
+            assert not error.value.retryable
+
+        # server errors are retried
+        VictoriaHandler.status = 500
+        assert push_to_victoria_metrics(["metric 1.0 1000"], victoria) is None
+
+
+class TestRelay:
+    def test_relay_push(self, victoria):
+        relay = Relay()
+        server = ControlServer(relay.routes, port=0)
+        server.start()
+        try:
+            url = "http://127.0.0.1:%i" % server.port
+            peers = [['rocm_utilization_percentage{instance="node%i"} 1.0 1000' % i] for i in range(3)]
+            for lines in peers:
+                assert push_to_victoria_metrics(lines, url) > 0
+        finally:
+            server.close()
+
+        batch = relay.drain()
+        assert len(batch) == 3
+        numBytes = push_to_victoria_metrics(None, victoria, bodies=batch.bodies)
+        path, headers, body, client = VictoriaHandler.requests[0]
+        assert path == "/api/v1/import/prometheus"
+        assert numBytes == len(body)
+        assert gzip.decompress(body).decode().splitlines() == [line for lines in peers for line in lines]
+
+    def test_large_push(self):
+        # a peer relaying for others may push more than the default body limit
+        relay = Relay()
+        server = ControlServer(relay.routes, port=0, bodyLimits=relay.bodyLimits)
+        server.start()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", server.port)
+            connection.request("POST", IMPORT_PATH, body=gzip.compress(os.urandom(MAX_BODY_BYTES + 1024), 0))
+            assert connection.getresponse().status == 204
+            connection.close()
+
+            # larger bodies are rejected from their Content-Length, without being read
+            for path, length in [(IMPORT_PATH, RELAY_MAX_BYTES + 1), ("/ready", MAX_BODY_BYTES + 1)]:
+                connection = http.client.HTTPConnection("127.0.0.1", server.port)
+                connection.putrequest("POST", path)
+                connection.putheader("Content-Length", str(length))
+                connection.endheaders()
+                assert connection.getresponse().status == 400
+                connection.close()
+        finally:
+            server.close()
+
+        assert len(relay) > 0
+
+
+class TestPushSchedule:
+    def test_phase(self):
+        assert push_phase("node001", 300) == push_phase("node001", 300)
+        phases = [push_phase("node%04i" % i, 300) for i in range(1000)]
+        assert all(0 <= phase < 300 for phase in phases)
+        # hosts are spread across the push period
+        counts = [sum(1 for phase in phases if 30 * i <= phase < 30 * (i + 1)) for i in range(10)]
+        assert min(counts) > 50
+
+    def test_next_push_time(self):
+        assert next_push_time(1000.0, 300, 42.5) == 1242.5
+        assert next_push_time(1242.5, 300, 42.5) == 1542.5
+
+
+class TestControlEndpoints:
+    def test_figure_of_merit(self, monkeypatch):
+        monkeypatch.setattr(omnistat.standalone, "fomData", [])
+        assert omnistat.standalone.figureOfMerit(b'{"name": "throughput", "value": 12.5}') == (200, {"status": "ok"})
+        assert omnistat.standalone.fomData[0]["value"] == 12.5
+        assert omnistat.standalone.figureOfMerit(b"{")[0] == 400
+
+    def test_shutdown_waits_for_delivery(self, monkeypatch):
+        monkeypatch.setattr(omnistat.standalone, "terminateFlagEvent", threading.Event())
+        monkeypatch.setattr(omnistat.standalone, "dataDeliveredEvent", threading.Event())
+        timer = threading.Timer(0.1, omnistat.standalone.dataDeliveredEvent.set)
+        timer.start()
+        start = time.monotonic()
+        assert omnistat.standalone.terminate(b"")[0] == 200
+        # returns as soon as the final push completed
+        assert 0.1 <= time.monotonic() - start < 1.0
+        assert omnistat.standalone.terminateFlagEvent.is_set()